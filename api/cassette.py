@@ -0,0 +1,212 @@
+"""Record and replay provider HTTP traffic.
+
+In record mode every request a ProviderClient sends, and the response it
+gets back, is kept and written on exit to a cassette: gzip-compressed
+JSON Lines, one interaction per line. In replay mode the client answers
+from the cassette instead of the network, so seed and ingest scripts and
+tests run offline, deterministically and in seconds.
+
+Interactions are matched on provider, method, endpoint, query parameters
+and a digest of the request body, with API keys left out, so a cassette
+recorded against the stand-in server (benchmarks/fake_providers.py)
+replays against the real base URLs too. A request made several times is
+answered with its recorded responses in order, the last one repeating.
+An unrecorded request raises CassetteMiss rather than going out. API
+keys and request headers are never written to the cassette.
+
+While a cassette is active the shared response cache is bypassed, so
+what is recorded and replayed does not depend on local cache state.
+
+Configuration:
+    PROVIDER_CASSETTE_MODE   'record' or 'replay'; unset for live traffic
+    PROVIDER_CASSETTE_PATH   cassette file (default benchmarks/cassettes/providers.jsonl.gz)
+"""
+
+import atexit
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from http import HTTPStatus
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from api.response_cache import SECRET_PARAMS
+
+logger = logging.getLogger(__name__)
+
+RECORD = 'record'
+REPLAY = 'replay'
+MODES = (RECORD, REPLAY)
+
+DEFAULT_PATH = os.path.join('benchmarks', 'cassettes', 'providers.jsonl.gz')
+
+# Request headers that change the response, and response headers callers read
+MATCH_HEADERS = ('If-None-Match', 'If-Modified-Since')
+RESPONSE_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Retry-After')
+
+
+class CassetteMiss(requests.RequestException):
+    """Raised in replay mode for a request the cassette has no response for."""
+
+
+class Cassette:
+    """Recorded provider interactions, in record or replay mode."""
+
+    def __init__(self, path=DEFAULT_PATH, mode=REPLAY, load=True):
+        """
+        Args:
+            path: Cassette file; read in replay mode, (over)written by save() in record mode
+            mode: RECORD or REPLAY
+            load: Read the file in replay mode; False replays an empty cassette
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}; expected one of {MODES}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._interactions = []
+        self._responses = defaultdict(list)
+        self._played = defaultdict(int)
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+
+        if mode == REPLAY and load:
+            with gzip.open(path, 'rt', encoding='utf-8') as cassette_file:
+                for line in cassette_file:
+                    if line.strip():
+                        interaction = json.loads(line)
+                        self._responses[interaction['key']].append(interaction['response'])
+
+    @property
+    def replaying(self):
+        return self.mode == REPLAY
+
+    def play(self, client, method, path, kwargs):
+        """Return the recorded response for a request as a requests.Response.
+
+        Raises:
+            CassetteMiss: no response was recorded for the request
+        """
+        key, request = self._match(client, method, path, kwargs)
+        with self._lock:
+            responses = self._responses.get(key)
+            if not responses:
+                self.misses += 1
+                raise CassetteMiss(f"No recorded response for {method} {request['endpoint']} "
+                                   f"({client.name}) in {self.path}")
+            index = min(self._played[key], len(responses) - 1)
+            self._played[key] += 1
+            self.replayed += 1
+        return _build_response(responses[index], client.url(path))
+
+    def record(self, client, method, path, kwargs, response):
+        """Keep a request and the response it got, for save()."""
+        key, request = self._match(client, method, path, kwargs)
+        recorded = {
+            'status': response.status_code,
+            'headers': {name: response.headers[name] for name in RESPONSE_HEADERS
+                        if name in response.headers},
+            'body': response.content.decode('utf-8', errors='replace'),
+        }
+        with self._lock:
+            self._interactions.append({'key': key, 'request': request, 'response': recorded})
+            self.recorded += 1
+
+    def save(self):
+        """Write the recorded interactions, replacing the cassette file."""
+        with self._lock:
+            interactions = list(self._interactions)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with gzip.open(temporary, 'wt', encoding='utf-8') as cassette_file:
+            for interaction in interactions:
+                cassette_file.write(json.dumps(interaction, separators=(',', ':')) + '\n')
+        os.replace(temporary, self.path)
+        logger.info(f"Recorded {len(interactions)} provider interactions to {self.path}")
+
+    def stats(self):
+        """Return the mode and record/replay counters."""
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'path': self.path,
+                'recorded': self.recorded,
+                'replayed': self.replayed,
+                'misses': self.misses
+            }
+
+    def _match(self, client, method, path, kwargs):
+        """Return (key, request summary) identifying a request across runs."""
+        url = client.url(path)
+        endpoint = url[len(client.base_url):] if url.startswith(client.base_url) else url
+        params = {name: str(value) for name, value in (kwargs.get('params') or {}).items()
+                  if name not in SECRET_PARAMS}
+        headers = kwargs.get('headers') or {}
+        request = {
+            'provider': client.name,
+            'method': method.upper(),
+            'endpoint': endpoint,
+            'params': params,
+            'body': _body_digest(kwargs),
+            'headers': {name: headers[name] for name in MATCH_HEADERS if headers.get(name)},
+        }
+        key = hashlib.sha256(json.dumps(request, sort_keys=True).encode('utf-8')).hexdigest()
+        return key, request
+
+
+def _body_digest(kwargs):
+    """Return a digest of the request body, so large uploads key compactly."""
+    if kwargs.get('json') is not None:
+        body = json.dumps(kwargs['json'], sort_keys=True).encode('utf-8')
+    elif kwargs.get('data') is not None:
+        body = kwargs['data'] if isinstance(kwargs['data'], bytes) else str(kwargs['data']).encode('utf-8')
+    else:
+        return None
+    return hashlib.sha256(body).hexdigest()
+
+
+def _build_response(recorded, url):
+    response = requests.Response()
+    response.status_code = recorded['status']
+    response.headers = CaseInsensitiveDict(recorded['headers'])
+    response._content = recorded['body'].encode('utf-8')
+    response.encoding = 'utf-8'
+    response.url = url
+    try:
+        response.reason = HTTPStatus(recorded['status']).phrase
+    except ValueError:
+        response.reason = None
+    return response
+
+
+_default_cassette = None
+_default_lock = threading.Lock()
+
+
+def default_cassette():
+    """Return the shared cassette configured from the environment, or None for live traffic."""
+    global _default_cassette
+    mode = os.environ.get('PROVIDER_CASSETTE_MODE')
+    if not mode:
+        return None
+    with _default_lock:
+        if _default_cassette is None:
+            path = os.environ.get('PROVIDER_CASSETTE_PATH', DEFAULT_PATH)
+            try:
+                _default_cassette = Cassette(path, mode.lower())
+            except (OSError, ValueError, KeyError) as e:
+                # Never fall back to live traffic when a cassette was asked for:
+                # replay an empty one, so every request fails with CassetteMiss
+                logger.error(f"Provider cassette unavailable, replaying nothing: {e}")
+                _default_cassette = Cassette(path, REPLAY, load=False)
+            if _default_cassette.mode == RECORD:
+                atexit.register(_default_cassette.save)
+        return _default_cassette
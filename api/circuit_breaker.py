@@ -0,0 +1,197 @@
+"""Circuit breakers for the external plant data providers.
+
+Each provider gets one breaker per process. While closed, calls go
+through and their outcomes are kept for a sliding time window. When
+enough of the recent calls failed, or were too slow, the breaker opens
+and every call fails at once with CircuitOpenError instead of waiting
+for a timeout. After a cool-down it lets a single trial call through
+(half-open): success closes it again, failure reopens it.
+
+Routes ask is_available(provider) before optional provider calls, so
+they can go straight to local data while a provider is down.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+WINDOW = 60  # seconds of call outcomes considered
+MIN_CALLS = 5
+FAILURE_RATE = 0.5
+SLOW_CALL_SECONDS = 5.0
+SLOW_CALL_RATE = 0.8
+OPEN_SECONDS = 30
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """A provider call was skipped because its breaker is open."""
+
+    def __init__(self, provider, retry_after):
+        super().__init__(f"{provider} is unavailable; retrying in {retry_after:.0f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker driven by error rate and latency."""
+
+    def __init__(self, name, window=WINDOW, min_calls=MIN_CALLS, failure_rate=FAILURE_RATE,
+                 slow_call_seconds=SLOW_CALL_SECONDS, slow_call_rate=SLOW_CALL_RATE,
+                 open_seconds=OPEN_SECONDS, clock=time.monotonic):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes = deque()  # (finished_at, failed, slow)
+        self._state = CLOSED
+        self._opened_at = None
+        self._trial_in_flight = False
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def is_available(self):
+        """Return True if a call would be let through right now."""
+        with self._lock:
+            state = self._current_state()
+            return state == CLOSED or (state == HALF_OPEN and not self._trial_in_flight)
+
+    def allow(self):
+        """Claim permission for one call; the caller must then record its outcome.
+
+        Raises:
+            CircuitOpenError: the breaker is open, or its trial call is in flight
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self.rejected += 1
+            retry_after = max(0.0, self.open_seconds - (self._clock() - self._opened_at))
+        raise CircuitOpenError(self.name, retry_after)
+
+    def release(self):
+        """Give back a permission from allow() for a call that was never made."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self, duration):
+        """Record a call that got a response, slow or not."""
+        self._record(False, duration >= self.slow_call_seconds)
+
+    def record_failure(self, duration=0.0):
+        """Record a call that errored, timed out or got a server error."""
+        self._record(True, duration >= self.slow_call_seconds)
+
+    def _record(self, failed, slow):
+        with self._lock:
+            now = self._clock()
+            state = self._current_state()
+            if state == HALF_OPEN:
+                if failed or slow:
+                    self._open(now, 'trial call failed')
+                else:
+                    logger.info(f"Circuit for {self.name} closed")
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                return
+            if state == OPEN:
+                return
+
+            self._outcomes.append((now, failed, slow))
+            while self._outcomes and self._outcomes[0][0] <= now - self.window:
+                self._outcomes.popleft()
+
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for _, failed, _ in self._outcomes if failed)
+            slow_calls = sum(1 for _, _, slow in self._outcomes if slow)
+            if failures / calls >= self.failure_rate:
+                self._open(now, f"{failures}/{calls} calls failed")
+            elif slow_calls / calls >= self.slow_call_rate:
+                self._open(now, f"{slow_calls}/{calls} calls took over {self.slow_call_seconds}s")
+
+    def _open(self, now, reason):
+        logger.warning(f"Circuit for {self.name} opened: {reason}")
+        self._state = OPEN
+        self._opened_at = now
+        self._trial_in_flight = False
+        self._outcomes.clear()
+        self.opened += 1
+
+    def reset(self):
+        """Close the breaker and forget recent outcomes."""
+        with self._lock:
+            self._state = CLOSED
+            self._outcomes.clear()
+            self._trial_in_flight = False
+
+    def stats(self):
+        """Return the state and counters for monitoring."""
+        with self._lock:
+            state = self._current_state()
+            calls = len(self._outcomes)
+            return {
+                'state': state,
+                'recent_calls': calls,
+                'recent_failures': sum(1 for _, failed, _ in self._outcomes if failed),
+                'recent_slow_calls': sum(1 for _, _, slow in self._outcomes if slow),
+                'times_opened': self.opened,
+                'rejected': self.rejected,
+                'retry_after': (max(0.0, self.open_seconds - (self._clock() - self._opened_at))
+                                if state == OPEN else 0.0)
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name, **options):
+    """Return the shared breaker for a provider, creating it on first use."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name, **options)
+            _breakers[name] = breaker
+        return breaker
+
+
+def is_available(name):
+    """Return True unless the provider's breaker is open."""
+    return get_breaker(name).is_available()
+
+
+def breaker_stats():
+    """Return the state of every breaker, keyed by provider."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
@@ -0,0 +1,99 @@
+"""Asyncio fan-out over the provider clients, with a sync bridge for Flask views.
+
+Provider calls are blocking requests calls made through the shared,
+pooled ProviderClients (with their cache, breaker, rate limiter and
+single-flight layers). call() starts one on a shared thread pool and
+returns an awaitable at once; gather() awaits several under one shared
+deadline, so a page that needs several providers or detail endpoints
+waits roughly as long as the slowest call instead of the sum. fan_out()
+runs a whole fan-out from synchronous code such as a Flask view.
+
+Calls that miss the deadline are reported as failed and left to finish
+in the background, where their responses still fill the response cache.
+
+Configuration:
+    PROVIDER_FANOUT_DEADLINE  seconds to wait for a fan-out (default 8)
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEADLINE = float(os.environ.get('PROVIDER_FANOUT_DEADLINE', 8))
+MAX_WORKERS = 16
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='provider-fanout')
+
+
+def call(fn, *args, **kwargs):
+    """Start a blocking provider call on the shared pool and return an awaitable.
+
+    The call is submitted immediately, so work done before awaiting it
+    overlaps with the request. Must be called with an event loop running.
+    """
+    loop = asyncio.get_running_loop()
+    # Keep the caller's context, e.g. its rate limit priority
+    context = contextvars.copy_context()
+    return loop.run_in_executor(_executor, functools.partial(context.run, fn, *args, **kwargs))
+
+
+async def gather(calls, timeout=DEFAULT_DEADLINE):
+    """Await named calls under one shared deadline.
+
+    Args:
+        calls: Dict of name -> awaitable, e.g. from call()
+        timeout: Seconds to wait for all of them together
+
+    Returns:
+        Tuple of (results, failed): results maps each name that finished
+        to its return value; failed maps each name that raised or missed
+        the deadline to its exception
+    """
+    futures = {name: asyncio.ensure_future(awaitable) for name, awaitable in calls.items()}
+    if futures:
+        await asyncio.wait(futures.values(), timeout=timeout)
+
+    results, failed = {}, {}
+    for name, future in futures.items():
+        if not future.done():
+            future.cancel()
+            failed[name] = asyncio.TimeoutError(f"{name} missed the {timeout}s deadline")
+        elif future.exception() is not None:
+            failed[name] = future.exception()
+        else:
+            results[name] = future.result()
+    for name, error in failed.items():
+        logger.warning(f"Fan-out call {name} failed: {error}")
+    return results, failed
+
+
+def run(coroutine):
+    """Run a coroutine to completion from synchronous code."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    coroutine.close()
+    raise RuntimeError("run() cannot be used inside a running event loop; await the coroutine instead")
+
+
+def fan_out(calls, timeout=DEFAULT_DEADLINE):
+    """Run blocking provider calls concurrently from synchronous code.
+
+    Args:
+        calls: Dict of name -> zero-argument callable
+        timeout: Seconds to wait for all of them together
+
+    Returns:
+        Tuple of (results, failed) as from gather()
+    """
+    async def run_calls():
+        return await gather({name: call(fn) for name, fn in calls.items()}, timeout)
+
+    return run(run_calls())
+
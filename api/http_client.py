@@ -0,0 +1,318 @@
+"""Shared, pooled HTTP clients for the plant data providers.
+
+Every provider module talks to its API through one ProviderClient per
+provider. Each client keeps a requests.Session with its own keep-alive
+connection pool, so repeated calls reuse an open TCP/TLS connection
+instead of paying a new handshake every time. Connect and read timeouts
+are always set, so a hung provider cannot hold a Flask worker forever,
+and the retry policy for connection failures and transient 5xx errors
+lives here rather than in each module. Every request first passes the
+provider's circuit breaker (see api.circuit_breaker), then takes a token
+from its rate limiter (see api.rate_limit). Concurrent identical GETs
+share one request (see api.single_flight). With a cassette configured,
+traffic is recorded or replayed instead (see api.cassette).
+"""
+
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from api.cassette import default_cassette
+from api.circuit_breaker import get_breaker
+from api.rate_limit import BATCH, default_limiter, rate_limit_mode
+from api.response_cache import default_cache, make_key
+from api.single_flight import SingleFlight, default_lock_dir, process_lock
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) seconds; connect slightly above a 3s TCP retransmit window
+DEFAULT_TIMEOUT = (3.05, 15)
+DEFAULT_RETRIES = 2
+DEFAULT_POOL_SIZE = 10
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Query parameters and headers that carry a provider API key
+KEY_PARAMS = ('key', 'token', 'api_key')
+KEY_HEADERS = ('Api-Key',)
+
+PROVIDER_BASE_URLS = {
+    'perenual': 'https://perenual.com/api/v2',
+    'trefle': 'https://trefle.io/api/v1',
+    'plant_id': 'https://api.plant.id/v2',
+}
+
+
+def build_retry(retries=DEFAULT_RETRIES):
+    """Return the retry policy shared by all providers.
+
+    Connection failures are retried for every method, since the request
+    never reached the provider. 5xx responses are only retried for GETs,
+    so a paid identification POST is never sent twice. Read timeouts are
+    not retried at all: a hung provider would otherwise hold the worker
+    for several full read timeouts, and they surface as requests'
+    Timeout. Failed statuses are returned rather than raised, leaving
+    raise_for_status() to the caller as before.
+    """
+    return Retry(
+        total=retries,
+        connect=retries,
+        read=False,
+        status=retries,
+        backoff_factor=0.5,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+
+
+class ProviderClient:
+    """HTTP client for one provider, with pooling, timeouts and retries."""
+
+    def __init__(self, name, base_url, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                 pool_size=DEFAULT_POOL_SIZE, headers=None, cache=None, limiter=None,
+                 breaker=None, lock_dir=None, cassette=None):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.breaker = breaker or get_breaker(name)
+        self.flights = SingleFlight()
+        self.lock_dir = default_lock_dir() if lock_dir is None else lock_dir
+        self._cache = cache
+        self._limiter = limiter
+        self._cassette = cassette
+
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=build_retry(retries))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def url(self, path):
+        """Return the absolute URL for a path under the provider's base URL."""
+        if path.startswith(('http://', 'https://')):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    @property
+    def limiter(self):
+        """The shared rate limiter, or None when limiting is disabled."""
+        if self._limiter is None:
+            return default_limiter()
+        return self._limiter or None
+
+    @property
+    def cassette(self):
+        """The record/replay cassette, or None for live traffic."""
+        if self._cassette is None:
+            return default_cassette()
+        return self._cassette or None
+
+    def request(self, method, path, **kwargs):
+        """Send a request, applying the default timeout unless one is given.
+
+        Connection errors, timeouts and 5xx responses count against the
+        provider's circuit breaker; so do responses slower than its
+        slow-call threshold. A replaying cassette answers without any of
+        that, or the network.
+
+        Raises:
+            api.circuit_breaker.CircuitOpenError: the provider's breaker is open
+            api.rate_limit.RateLimited: no token was available
+            api.cassette.CassetteMiss: replaying, and the request was not recorded
+            All are requests.RequestException, so callers need no new handling.
+        """
+        cassette = self.cassette
+        if cassette is not None and cassette.replaying:
+            return cassette.play(self, method, path, kwargs)
+
+        kwargs.setdefault('timeout', self.timeout)
+        limiter = self.limiter
+        api_key = self._api_key(kwargs.get('params'), kwargs.get('headers'))
+        self.breaker.allow()
+        if limiter is not None:
+            try:
+                limiter.acquire(self.name, api_key)
+            except Exception:
+                # No call was made; release a half-open trial without judging it
+                self.breaker.release()
+                raise
+
+        start = time.monotonic()
+        try:
+            response = self.session.request(method, self.url(path), **kwargs)
+        except requests.exceptions.RequestException:
+            self.breaker.record_failure(time.monotonic() - start)
+            raise
+        if response.status_code >= 500:
+            self.breaker.record_failure(time.monotonic() - start)
+        else:
+            self.breaker.record_success(time.monotonic() - start)
+        if cassette is not None:
+            cassette.record(self, method, path, kwargs, response)
+
+        if response.status_code == 429 and limiter is not None:
+            limiter.backoff(self.name, api_key, _retry_after(response))
+        return response
+
+    def _api_key(self, params, headers):
+        for name in KEY_PARAMS:
+            if isinstance(params, dict) and params.get(name):
+                return str(params[name])
+        for name in KEY_HEADERS:
+            value = (headers or {}).get(name) or self.session.headers.get(name)
+            if value:
+                return value
+        return None
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    @property
+    def cache(self):
+        """The persistent response cache, or None when it is disabled.
+
+        The shared cache is bypassed while a cassette records or replays.
+        """
+        if self._cache is None:
+            return None if self.cassette is not None else default_cache()
+        return self._cache or None
+
+    def get_json(self, path, params=None, ttl=None, revalidate=False, **kwargs):
+        """GET a JSON body, through the persistent response cache if `ttl` is set.
+
+        A fresh cached body is returned without a request. A stale one is
+        returned at once while a background request refreshes it, or with
+        revalidate=True is refreshed before returning. Refreshes send the
+        stored ETag / Last-Modified, so an unchanged resource costs a 304
+        instead of a download. Misses and errors behave exactly like
+        get() followed by raise_for_status(). Concurrent misses for the
+        same request share a single call, and with a lock directory so do
+        misses in other processes.
+        """
+        cache = self.cache if ttl else None
+        stale_body = None
+        if cache is not None:
+            cached = cache.get(self.name, path, params)
+            if cached is not None and (cached.fresh or not revalidate):
+                if not cached.fresh:
+                    cache.refresh(self.name, path, params,
+                                  lambda: self._refresh_json(path, params, ttl, cache, kwargs,
+                                                             cached.body))
+                return cached.body
+            if cached is not None:
+                stale_body = cached.body
+
+        key = make_key(self.name, path, params)
+        return self.flights.do(key, lambda: self._fetch_shared(key, path, params, ttl, cache, kwargs,
+                                                               stale_body))
+
+    def _fetch_shared(self, key, path, params, ttl, cache, kwargs, stale_body=None):
+        if cache is None or not self.lock_dir:
+            return self._fetch_json(path, params, ttl, cache, kwargs, stale_body)
+        with process_lock(self.lock_dir, key):
+            # Another process may have fetched it while we waited for the lock
+            cached = cache.get(self.name, path, params, record=False)
+            if cached is not None and cached.fresh:
+                self.flights.record_shared()
+                return cached.body
+            return self._fetch_json(path, params, ttl, cache, kwargs, stale_body)
+
+    def _fetch_json(self, path, params, ttl, cache, kwargs, stale_body=None):
+        """Fetch and cache a JSON body; conditionally when a stale body is on hand."""
+        conditional = False
+        if stale_body is not None:
+            etag, last_modified = cache.validators(self.name, path, params)
+            if etag or last_modified:
+                headers = dict(kwargs.get('headers') or {})
+                if etag:
+                    headers['If-None-Match'] = etag
+                if last_modified:
+                    headers['If-Modified-Since'] = last_modified
+                kwargs = dict(kwargs, headers=headers)
+                conditional = True
+
+        response = self.get(path, params=params, **kwargs)
+        if conditional:
+            cache.record_revalidation(response.status_code == 304)
+            if response.status_code == 304:
+                # Unchanged upstream: keep the stored body and restart its TTL
+                cache.touch(self.name, path, params, ttl)
+                return stale_body
+        response.raise_for_status()
+        body = response.json()
+        if cache is not None:
+            cache.set(self.name, path, params, body, ttl, etag=response.headers.get('ETag'),
+                      last_modified=response.headers.get('Last-Modified'))
+        return body
+
+    def _refresh_json(self, path, params, ttl, cache, kwargs, stale_body=None):
+        # Background refreshes must not eat the tokens reserved for users
+        with rate_limit_mode(BATCH, block=False):
+            return self._fetch_json(path, params, ttl, cache, kwargs, stale_body)
+
+    def close(self):
+        """Close pooled connections."""
+        self.session.close()
+
+
+def _retry_after(response):
+    """Return the Retry-After header in seconds, if it is given as a number."""
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, ValueError):
+        return None
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def base_url_for(name, base_url=None):
+    """Return a provider's base URL, letting <NAME>_BASE_URL override it.
+
+    The override points a provider at a stand-in such as
+    benchmarks/fake_providers.py, e.g. TREFLE_BASE_URL=http://127.0.0.1:8700/trefle.
+    """
+    return os.environ.get(f"{name.upper()}_BASE_URL") or base_url or PROVIDER_BASE_URLS[name]
+
+
+def get_client(name, base_url=None, **options):
+    """Return the shared client for a provider, creating it on first use.
+
+    Args:
+        name: Provider name, e.g. 'perenual', 'trefle' or 'plant_id'
+        base_url: Base URL, defaulting to PROVIDER_BASE_URLS[name]; see base_url_for()
+        options: ProviderClient options, used only when the client is created
+    """
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            client = ProviderClient(name, base_url_for(name, base_url), **options)
+            _clients[name] = client
+        return client
+
+
+def coalescing_stats():
+    """Return single-flight counters for every shared client, keyed by provider."""
+    with _clients_lock:
+        clients = list(_clients.values())
+    return {client.name: client.flights.stats() for client in clients}
+
+
+def close_clients():
+    """Close and forget every shared client."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
@@ -0,0 +1,91 @@
+"""Cache of Plant.id identifications keyed by the image's content hash.
+
+Users often retry with the same photo. Each identification is a paid
+Plant.id call taking seconds, so the raw response and its mapped result
+are kept per SHA-256 of the image bytes, in their own bounded SQLite
+file (a ResponseCache without a stale window). An identical upload is
+then answered from disk in milliseconds.
+
+Configuration:
+    IDENTIFICATION_CACHE_PATH      cache file (default .cache/identifications.sqlite3)
+    IDENTIFICATION_CACHE_TTL_DAYS  how long an identification is reused (default 30)
+    IDENTIFICATION_CACHE_MAX_MB    size bound in megabytes (default 64)
+    IDENTIFICATION_CACHE_DISABLED  set to 1 to always call Plant.id
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+
+from api.response_cache import DAY, ResponseCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join('.cache', 'identifications.sqlite3')
+DEFAULT_TTL = 30 * DAY
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def hash_image(image_data):
+    """Return the SHA-256 hex digest of the image bytes."""
+    return hashlib.sha256(image_data).hexdigest()
+
+
+class IdentificationCache:
+    """Raw and mapped identification results keyed by image hash."""
+
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES, **options):
+        self.ttl = ttl
+        self.store = ResponseCache(path, max_bytes=max_bytes, stale_ttl=0, **options)
+
+    @staticmethod
+    def _params(image_hash, modifiers, plant_details):
+        # The requested modifiers and details change the response, so they are part of the key
+        return {
+            'sha256': image_hash,
+            'modifiers': ','.join(modifiers or []),
+            'plant_details': ','.join(plant_details or [])
+        }
+
+    def get(self, image_hash, modifiers=None, plant_details=None):
+        """Return (result, plant_data) for an image, or None if not cached."""
+        cached = self.store.get('plant_id', '/identify',
+                                self._params(image_hash, modifiers, plant_details))
+        if cached is None:
+            return None
+        return cached.body['result'], cached.body['plant_data']
+
+    def set(self, image_hash, result, plant_data, modifiers=None, plant_details=None):
+        """Store a raw Plant.id response and its mapped result."""
+        self.store.set('plant_id', '/identify', self._params(image_hash, modifiers, plant_details),
+                       {'result': result, 'plant_data': plant_data}, self.ttl)
+
+    def stats(self):
+        """Return hit counters and the cache size for monitoring."""
+        return self.store.stats()
+
+
+_default_cache = None
+_default_failed = False
+_default_lock = threading.Lock()
+
+
+def default_identification_cache():
+    """Return the shared cache configured from the environment, or None if disabled."""
+    global _default_cache, _default_failed
+    if os.environ.get('IDENTIFICATION_CACHE_DISABLED') == '1':
+        return None
+    with _default_lock:
+        if _default_cache is None and not _default_failed:
+            try:
+                _default_cache = IdentificationCache(
+                    path=os.environ.get('IDENTIFICATION_CACHE_PATH', DEFAULT_PATH),
+                    ttl=float(os.environ.get('IDENTIFICATION_CACHE_TTL_DAYS', 30)) * DAY,
+                    max_bytes=int(float(os.environ.get('IDENTIFICATION_CACHE_MAX_MB', 64)) * 1024 * 1024)
+                )
+            except (OSError, sqlite3.Error) as e:
+                logger.error(f"Identification cache unavailable: {e}")
+                _default_failed = True
+        return _default_cache
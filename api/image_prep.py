@@ -0,0 +1,97 @@
+"""Shrink uploaded photos before they are sent to Plant.id.
+
+Phone photos are often 10MB or more, and Plant.id takes them base64
+encoded inside one JSON body, a third larger again. The API gains
+nothing from more than a couple of thousand pixels per edge, so each
+upload is decoded once, turned upright from its EXIF orientation (the
+orientation tag is dropped on re-encoding), downscaled to a maximum
+edge and re-encoded as JPEG or WebP. Images that cannot be decoded are
+sent unchanged and left for the API to reject.
+
+Configuration:
+    PLANT_ID_MAX_EDGE      longest edge in pixels sent to Plant.id (default 1500)
+    PLANT_ID_IMAGE_QUALITY encoder quality, 1-95 (default 85)
+    PLANT_ID_IMAGE_FORMAT  JPEG or WEBP (default JPEG)
+    PLANT_ID_IMAGE_PREP_DISABLED  set to 1 to send original uploads
+"""
+
+import base64
+import io
+import logging
+import os
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_EDGE = 1500
+DEFAULT_QUALITY = 85
+DEFAULT_FORMAT = 'JPEG'
+FORMATS = ('JPEG', 'WEBP')
+EXIF_ORIENTATION = 0x0112
+
+
+def read_image(image_file):
+    """Return the bytes of a file object, file path or bytes."""
+    if hasattr(image_file, 'read'):
+        image_data = image_file.read()
+        image_file.seek(0)
+        return image_data
+    if isinstance(image_file, str):
+        with open(image_file, 'rb') as f:
+            return f.read()
+    return image_file
+
+
+def prepare_image(image_data, max_edge=None, quality=None, image_format=None):
+    """Return image bytes ready to send to Plant.id.
+
+    Args:
+        image_data: The uploaded image bytes
+        max_edge: Longest edge in pixels, defaulting to PLANT_ID_MAX_EDGE
+        quality: Encoder quality, defaulting to PLANT_ID_IMAGE_QUALITY
+        image_format: 'JPEG' or 'WEBP', defaulting to PLANT_ID_IMAGE_FORMAT
+
+    Returns:
+        The re-encoded image, or the original bytes if preparation is
+        disabled, the image cannot be decoded, or re-encoding a small
+        upright image would not make it smaller
+    """
+    if os.environ.get('PLANT_ID_IMAGE_PREP_DISABLED') == '1':
+        return image_data
+    max_edge = max_edge or int(os.environ.get('PLANT_ID_MAX_EDGE', DEFAULT_MAX_EDGE))
+    quality = quality or int(os.environ.get('PLANT_ID_IMAGE_QUALITY', DEFAULT_QUALITY))
+    image_format = (image_format or os.environ.get('PLANT_ID_IMAGE_FORMAT', DEFAULT_FORMAT)).upper()
+    if image_format not in FORMATS:
+        logger.warning(f"Unsupported image format {image_format}, using {DEFAULT_FORMAT}")
+        image_format = DEFAULT_FORMAT
+
+    try:
+        with Image.open(io.BytesIO(image_data)) as image:
+            original_size = image.size
+            # JPEG decoding can downscale by up to 8x on the fly, far cheaper than a resize
+            image.draft('RGB', (max_edge, max_edge))
+            rotated = image.getexif().get(EXIF_ORIENTATION, 1) != 1
+            upright = ImageOps.exif_transpose(image)
+            if upright.mode != 'RGB':
+                upright = upright.convert('RGB')
+            upright.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+            buffer = io.BytesIO()
+            upright.save(buffer, image_format, quality=quality)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning(f"Could not prepare image for upload, sending it unchanged: {e}")
+        return image_data
+
+    prepared = buffer.getvalue()
+    resized = max(original_size) > max_edge
+    if not resized and not rotated and len(prepared) >= len(image_data):
+        return image_data
+    logger.debug(f"Prepared image {original_size} {len(image_data)} bytes -> "
+                 f"{upright.size} {len(prepared)} bytes")
+    return prepared
+
+
+def encode_image(image_file, **options):
+    """Read, prepare and base64-encode an image for a Plant.id request body."""
+    return base64.b64encode(prepare_image(read_image(image_file), **options)).decode('ascii')
@@ -5,6 +5,8 @@ Integration with the Perenual API to fetch real plant data.
 import os
 import requests
 import logging
+from api.http_client import get_client
+from api.response_cache import HOUR, DAY
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -14,8 +16,21 @@ logger = logging.getLogger(__name__)
 API_KEY = os.environ.get('PERENUAL_API_KEY')
 BASE_URL = "https://perenual.com/api/v2"
 
-def get_plant_list(page=1, size=20, edible=0):
-    """Fetch plant list from the Perenual API."""
+# Pooled keep-alive connections with timeouts and retries
+client = get_client('perenual', BASE_URL)
+
+# How long responses stay fresh in the persistent response cache
+LIST_TTL = 12 * HOUR
+SEARCH_TTL = DAY
+DETAILS_TTL = 7 * DAY
+CARE_GUIDE_TTL = 7 * DAY
+
+def get_plant_list(page=1, size=20, edible=0, revalidate=False):
+    """Fetch plant list from the Perenual API.
+
+    With revalidate=True a stale cached page is checked with the provider
+    (a conditional request) before returning, rather than served as is.
+    """
     try:
         params = {
             "key": API_KEY,
@@ -23,9 +38,7 @@ def get_plant_list(page=1, size=20, edible=0):
             "size": size,
             "edible": edible
         }
-        response = requests.get(f"{BASE_URL}/species-list", params=params)
-        response.raise_for_status()
-        return response.json()
+        return client.get_json("/species-list", params=params, ttl=LIST_TTL, revalidate=revalidate)
     except requests.exceptions.RequestException as e:
         logger.error(f"Error fetching plant list: {e}")
         return {"data": []}  # Return empty data on error
@@ -34,9 +47,7 @@ def get_plant_details(plant_id):
     """Fetch plant details from the Perenual API."""
     try:
         params = {"key": API_KEY}
-        response = requests.get(f"{BASE_URL}/species/details/{plant_id}", params=params)
-        response.raise_for_status()
-        return response.json()
+        return client.get_json(f"/species/details/{plant_id}", params=params, ttl=DETAILS_TTL)
     except requests.exceptions.RequestException as e:
         logger.error(f"Error fetching plant details: {e}")
         return {}  # Return empty object on error
@@ -48,18 +59,14 @@ def search_plants(query):
             "key": API_KEY,
             "q": query
         }
-        response = requests.get(f"{BASE_URL}/species-list", params=params)
-        response.raise_for_status()
-        return response.json()
+        return client.get_json("/species-list", params=params, ttl=SEARCH_TTL)
     except requests.exceptions.RequestException as e:
         logger.error(f"Error searching plants: {e}")
         return {"data": []}  # Return empty data on error
 def get_care_guide(plant_id):
     """Fetch care guide from the Perenual API."""
     try:
-        response = requests.get(f"{BASE_URL}/plants/{plant_id}/care", headers=headers)
-        response.raise_for_status()
-        return response.json()
+        return client.get_json(f"/plants/{plant_id}/care", params={"key": API_KEY}, ttl=CARE_GUIDE_TTL)
     except requests.exceptions.RequestException as e:
         logger.error(f"Error fetching care guide: {e}")
         return {"data": []}  # Return empty data on error
@@ -2,9 +2,10 @@
 
 import os
 import requests
-import base64
 import logging
 from dotenv import load_dotenv
+from api.http_client import get_client
+from api.image_prep import encode_image
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -17,6 +18,10 @@ load_dotenv()
 PLANT_ID_API_KEY = os.environ.get('PLANT_ID_API_KEY')
 BASE_URL = 'https://api.plant.id/v2'
 
+# Shared with identification; assessments get a longer read timeout
+client = get_client('plant_id', BASE_URL)
+ASSESSMENT_TIMEOUT = (3.05, 30)
+
 def assess_health(image_path):
     """
     Assess plant health from an image using the Plant.id API.
@@ -27,39 +32,14 @@ def assess_health(image_path):
     Returns:
         JSON response from the API
     """
-    if not PLANT_ID_API_KEY:
-        logger.error("Plant.id API key not found in environment variables")
-        return {"error": "API key not configured"}
-    
     try:
-        # Read and encode the image
-        with open(image_path, 'rb') as file:
-            image_data = file.read()
-        base64_image = base64.b64encode(image_data).decode('utf-8')
-        
-        # Prepare data for the API
-        data = {
-            'images': [base64_image],
-            'modifiers': ["crops_fast"],
-            'disease_details': ["description", "treatment", "classification"],
-        }
-        
-        # Make API request
-        headers = {
-            'Content-Type': 'application/json',
-            'Api-Key': PLANT_ID_API_KEY
-        }
-        
-        response = requests.post(f"{BASE_URL}/health_assessment", json=data, headers=headers)
-        response.raise_for_status()
-        
-        return response.json()
+        # Read, downscale and encode the image
+        base64_image = encode_image(image_path)
     except FileNotFoundError:
         logger.error(f"Image file not found: {image_path}")
         return {"error": f"Image file not found: {image_path}"}
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error assessing plant health: {e}")
-        return {"error": str(e)}
+    
+    return assess_health_encoded(base64_image)
 
 def assess_health_from_binary(image_binary):
     """
@@ -68,6 +48,19 @@ def assess_health_from_binary(image_binary):
     Args:
         image_binary: Binary image data
     
+    Returns:
+        JSON response from the API
+    """
+    # Downscale and encode the binary image data
+    return assess_health_encoded(encode_image(image_binary))
+
+def assess_health_encoded(base64_image):
+    """
+    Assess plant health from an image already prepared by api.image_prep.encode_image.
+    
+    Args:
+        base64_image: Base64-encoded image data
+    
     Returns:
         JSON response from the API
     """
@@ -76,9 +69,6 @@ def assess_health_from_binary(image_binary):
         return {"error": "API key not configured"}
     
     try:
-        # Encode the binary image data
-        base64_image = base64.b64encode(image_binary).decode('utf-8')
-        
         # Prepare data for the API
         data = {
             'images': [base64_image],
@@ -92,7 +82,8 @@ def assess_health_from_binary(image_binary):
             'Api-Key': PLANT_ID_API_KEY
         }
         
-        response = requests.post(f"{BASE_URL}/health_assessment", json=data, headers=headers)
+        response = client.post("/health_assessment", json=data, headers=headers,
+                               timeout=ASSESSMENT_TIMEOUT)
         response.raise_for_status()
         
         return response.json()
@@ -4,8 +4,12 @@ import os
 import requests
 import base64
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
+from api.circuit_breaker import is_available
+from api.http_client import get_client
+from api.identification_cache import default_identification_cache, hash_image
+from api.image_prep import encode_image, prepare_image, read_image
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -14,16 +18,31 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# Identification uploads and analyses an image, so allow a longer read
+IDENTIFY_TIMEOUT = (3.05, 30)
+
+# Identify and health assessment together may each take a full read timeout
+PIPELINE_DEADLINE = sum(IDENTIFY_TIMEOUT) + 5
+
 class PlantDotIDAPI:
     """Service class for identifying plants using Plant.id API (paid service)."""
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, cache=None):
         self.base_url = "https://api.plant.id/v2"
         self.api_key = api_key or os.getenv('PLANT_ID_API_KEY')
+        self.client = get_client('plant_id', self.base_url)
+        self._cache = cache
         
         if not self.api_key:
             raise ValueError("Plant.id API key is required. Set PLANT_ID_API_KEY environment variable.")
     
+    @property
+    def cache(self):
+        """The identification cache, or None when it is disabled."""
+        if self._cache is None:
+            return default_identification_cache()
+        return self._cache or None
+    
     def identify_plant(self, image_file, modifiers: List[str] = None, 
                       plant_details: List[str] = None) -> Optional[Dict]:
         """
@@ -37,23 +56,48 @@ class PlantDotIDAPI:
         Returns:
             Dict containing identification results or None
         """
+        result, _ = self.identify_and_map(image_file, modifiers, plant_details)
+        return result
+    
+    def identify_and_map(self, image_file, modifiers: List[str] = None,
+                         plant_details: List[str] = None,
+                         encoded_image: str = None) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """
+        Identify a plant and map the result, reusing earlier results for identical images.
+        
+        The same image bytes with the same modifiers and details are only
+        sent to Plant.id once per cache TTL.
+        
+        Args:
+            image_file: File object or file path or bytes
+            modifiers: List of modifiers like ['crops_fast', 'similar_images']
+            plant_details: List of details to include
+            encoded_image: The image already prepared by api.image_prep.encode_image,
+                so a caller sending it elsewhere too only encodes it once
+        
+        Returns:
+            Tuple of (raw result, mapped result from map_identification_result);
+            (None, None) if the API call failed
+        """
         if modifiers is None:
             modifiers = ["crops_fast", "similar_images"]
         
         if plant_details is None:
             plant_details = ["common_names", "url", "description", "taxonomy", "rank", "gbif_id"]
         
-        # Prepare image data
-        if hasattr(image_file, 'read'):
-            image_data = image_file.read()
-            image_file.seek(0)
-        elif isinstance(image_file, str):
-            with open(image_file, 'rb') as f:
-                image_data = f.read()
-        else:
-            image_data = image_file
+        image_data = read_image(image_file)
+        
+        cache = self.cache
+        image_hash = hash_image(image_data)
+        if cache is not None:
+            cached = cache.get(image_hash, modifiers, plant_details)
+            if cached is not None:
+                logger.info(f"Identification cache hit for image {image_hash[:12]}")
+                return cached
         
-        encoded_image = base64.b64encode(image_data).decode('ascii')
+        # Cached by the original bytes, so a hit skips the decode and re-encode
+        if encoded_image is None:
+            encoded_image = base64.b64encode(prepare_image(image_data)).decode('ascii')
         
         data = {
             "images": [encoded_image],
@@ -67,12 +111,18 @@ class PlantDotIDAPI:
         }
         
         try:
-            response = requests.post(f"{self.base_url}/identify", json=data, headers=headers)
+            response = self.client.post("/identify", json=data, headers=headers,
+                                        timeout=IDENTIFY_TIMEOUT)
             response.raise_for_status()
-            return response.json()
+            result = response.json()
         except requests.exceptions.RequestException as e:
             logger.error(f"Error identifying plant with Plant.id: {e}")
-            return None
+            return None, None
+        
+        plant_data = map_identification_result(result)
+        if cache is not None:
+            cache.set(image_hash, result, plant_data, modifiers, plant_details)
+        return result, plant_data
 
 
 def identify_plant(image_path: str) -> Dict:
@@ -101,6 +151,84 @@ def identify_plant(image_path: str) -> Dict:
         return {"error": str(e)}
 
 
+def identify_and_map_plant(image_path: str) -> Tuple[Dict, Optional[Dict]]:
+    """
+    Identify a plant from an image and map the result, served from cache for repeat uploads.
+    
+    Args:
+        image_path: Path to the uploaded image file
+        
+    Returns:
+        Tuple of (raw result or error dict, mapped plant data or None)
+    """
+    try:
+        plant_id_key = os.getenv('PLANT_ID_API_KEY')
+        if not plant_id_key:
+            return {"error": "No plant identification API keys configured"}, None
+        
+        with open(image_path, 'rb') as f:
+            image_data = f.read()
+        
+        # A cached identification is served even while Plant.id is down
+        result, plant_data = PlantDotIDAPI(plant_id_key).identify_and_map(image_data)
+        if result is None:
+            if not is_available('plant_id'):
+                return {"error": "Plant identification is temporarily unavailable. "
+                                 "Please try again in a few minutes."}, None
+            return {"error": "Plant.id could not identify the image"}, None
+        return result, plant_data
+    except Exception as e:
+        logger.error(f"Error in plant identification: {str(e)}")
+        return {"error": str(e)}, None
+
+
+def identify_and_assess_plant(image_path: str) -> Tuple[Dict, Optional[Dict], Dict]:
+    """
+    Identify a plant and assess its health from one upload.
+    
+    The image is read and prepared once, and the identify and
+    health_assessment calls run concurrently, so the pair takes about
+    as long as the slower call rather than both in turn.
+    
+    Args:
+        image_path: Path to the uploaded image file
+        
+    Returns:
+        Tuple of (raw identification result or error dict, mapped plant
+        data or None, raw health assessment or error dict)
+    """
+    from api.fanout import fan_out
+    from api.plant_health import assess_health_encoded
+    
+    try:
+        plant_id_key = os.getenv('PLANT_ID_API_KEY')
+        if not plant_id_key:
+            error = {"error": "No plant identification API keys configured"}
+            return error, None, error
+        
+        image_data = read_image(image_path)
+        encoded_image = encode_image(image_data)
+        api = PlantDotIDAPI(plant_id_key)
+        
+        fetched, _ = fan_out({
+            'identify': lambda: api.identify_and_map(image_data, encoded_image=encoded_image),
+            'health': lambda: assess_health_encoded(encoded_image)
+        }, timeout=PIPELINE_DEADLINE)
+        
+        result, plant_data = fetched.get('identify') or (None, None)
+        if result is None:
+            if not is_available('plant_id'):
+                result = {"error": "Plant identification is temporarily unavailable. "
+                                   "Please try again in a few minutes."}
+            else:
+                result = {"error": "Plant.id could not identify the image"}
+        health_result = fetched.get('health') or {"error": "Health assessment did not complete"}
+        return result, plant_data, health_result
+    except Exception as e:
+        logger.error(f"Error in plant identification and health assessment: {str(e)}")
+        return {"error": str(e)}, None, {"error": str(e)}
+
+
 def map_identification_result(identification_result: Dict) -> Optional[Dict]:
     """
     Map the API identification result to a format expected by the Flask app.
@@ -123,6 +251,7 @@ def map_identification_result(identification_result: Dict) -> Optional[Dict]:
                 'confidence_score': suggestion.get('probability', 0),
                 'family': plant_details.get('taxonomy', {}).get('family', ''),
                 'genus': plant_details.get('taxonomy', {}).get('genus', ''),
+                'gbif_id': plant_details.get('gbif_id'),
                 'api_source': 'plant_id'
             }
         
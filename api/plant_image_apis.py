@@ -1,4 +1,8 @@
-import requests
+from api.http_client import get_client
+from api.response_cache import DAY
+
+# Perenual's unversioned species list, not the v2 API under the shared client's base URL
+SPECIES_LIST_URL = "https://perenual.com/api/species-list"
 
 class PlantImageFetcher:
     def __init__(self, trefle_key=None, plantid_key=None, perenual_key=None, plantnet_key=None):
@@ -6,14 +10,15 @@ class PlantImageFetcher:
         self.plantid_key = plantid_key
         self.perenual_key = perenual_key
         self.plantnet_key = plantnet_key
+        self.perenual_client = get_client('perenual')
 
     def get_image_from_perenual(self, query):
-        r = requests.get(
-            f"https://perenual.com/api/species-list",
+        data = self.perenual_client.get_json(
+            SPECIES_LIST_URL,
             params={"key": self.perenual_key, "q": query},
+            ttl=DAY,
             timeout=5
         )
-        data = r.json()
         if data.get("data"):
             return data["data"][0].get("default_image", {}).get("original_url")
 
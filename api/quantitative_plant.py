@@ -1,8 +1,12 @@
 """Module for interacting with the Trefle API for quantitative plant data."""
 
 import os
+import contextvars
 import requests
 import logging
+from contextlib import contextmanager
+from api.http_client import get_client
+from api.response_cache import HOUR, DAY
 from dotenv import load_dotenv
 
 # Set up logging
@@ -16,6 +20,39 @@ load_dotenv()
 TREFLE_API_KEY = os.environ.get('TREFLE_API_KEY')
 BASE_URL = 'https://trefle.io/api/v1'
 
+# Error returned while no API key is set, which no retry will fix
+NOT_CONFIGURED = "API key not configured"
+
+# Pooled keep-alive connections with timeouts and retries
+client = get_client('trefle', BASE_URL)
+
+# How long responses stay fresh in the persistent response cache
+LIST_TTL = 12 * HOUR
+SEARCH_TTL = DAY
+DETAILS_TTL = 7 * DAY
+
+# Plant details already fetched in the current request or import, by plant ID
+_details_memo = contextvars.ContextVar('trefle_details_memo', default=None)
+
+@contextmanager
+def details_memo():
+    """
+    Reuse Trefle plant details fetched within this block.
+    
+    Every get_plant_details() call inside the block, including those made
+    by get_growth_data() and by fan-out workers started from it, fetches
+    each plant at most once. Usable as a decorator; nested blocks share
+    the outer memo.
+    """
+    if _details_memo.get() is not None:
+        yield
+        return
+    token = _details_memo.set({})
+    try:
+        yield
+    finally:
+        _details_memo.reset(token)
+
 def get_plant_list(page=1, limit=20):
     """
     Get a list of plants from the Trefle API.
@@ -29,20 +66,17 @@ def get_plant_list(page=1, limit=20):
     """
     if not TREFLE_API_KEY:
         logger.error("Trefle API key not found in environment variables")
-        return {"error": "API key not configured"}
+        return {"error": NOT_CONFIGURED}
     
     try:
-        url = f"{BASE_URL}/plants"
+        url = "/plants"
         params = {
             'token': TREFLE_API_KEY,
             'page': page,
             'limit': limit
         }
         
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        
-        return response.json()
+        return client.get_json(url, params=params, ttl=LIST_TTL)
     except requests.exceptions.RequestException as e:
         logger.error(f"Error fetching plant list: {e}")
         return {"error": str(e)}
@@ -59,21 +93,27 @@ def get_plant_details(plant_id):
     """
     if not TREFLE_API_KEY:
         logger.error("Trefle API key not found in environment variables")
-        return {"error": "API key not configured"}
+        return {"error": NOT_CONFIGURED}
+    
+    memo = _details_memo.get()
+    if memo is not None and str(plant_id) in memo:
+        return memo[str(plant_id)]
     
     try:
-        url = f"{BASE_URL}/plants/{plant_id}"
+        url = f"/plants/{plant_id}"
         params = {
             'token': TREFLE_API_KEY
         }
         
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        
-        return response.json()
+        plant_details = client.get_json(url, params=params, ttl=DETAILS_TTL)
     except requests.exceptions.RequestException as e:
         logger.error(f"Error fetching plant details: {e}")
         return {"error": str(e)}
+    
+    # Only successful lookups are reused; a failure is retried on the next call
+    if memo is not None and 'data' in plant_details:
+        memo[str(plant_id)] = plant_details
+    return plant_details
 
 def search_plants(query):
     """
@@ -87,40 +127,39 @@ def search_plants(query):
     """
     if not TREFLE_API_KEY:
         logger.error("Trefle API key not found in environment variables")
-        return {"error": "API key not configured"}
+        return {"error": NOT_CONFIGURED}
     
     try:
-        url = f"{BASE_URL}/plants/search"
+        url = "/plants/search"
         params = {
             'token': TREFLE_API_KEY,
             'q': query
         }
         
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        
-        return response.json()
+        return client.get_json(url, params=params, ttl=SEARCH_TTL)
     except requests.exceptions.RequestException as e:
         logger.error(f"Error searching plants: {e}")
         return {"error": str(e)}
 
-def get_growth_data(plant_id):
+def get_growth_data(plant_id, plant_details=None):
     """
     Get growth data for a specific plant.
     
     Args:
         plant_id: Trefle plant ID
+        plant_details: Response from get_plant_details() for this plant if
+            the caller already has it; fetched otherwise
     
     Returns:
         Dictionary with growth data
     """
-    if not TREFLE_API_KEY:
+    if plant_details is None and not TREFLE_API_KEY:
         logger.error("Trefle API key not found in environment variables")
-        return {"error": "API key not configured"}
+        return {"error": NOT_CONFIGURED}
     
     try:
         # Get plant details which include growth data
-        plant_data = get_plant_details(plant_id)
+        plant_data = plant_details if plant_details is not None else get_plant_details(plant_id)
         
         if 'data' not in plant_data or not plant_data['data']:
             return {"error": "No data found"}
@@ -161,6 +200,24 @@ def get_growth_data(plant_id):
         logger.error(f"Error fetching growth data: {e}")
         return {"error": str(e)}
 
+def map_common_names(plant_details):
+    """
+    Extract vernacular names by language from a Trefle plant details response.
+    
+    Args:
+        plant_details: Response from get_plant_details()
+    
+    Returns:
+        Dictionary mapping language codes to lists of names
+    """
+    data = (plant_details or {}).get('data') or {}
+    common_names = (data.get('main_species') or {}).get('common_names') or {}
+    names = {language: list(language_names)
+             for language, language_names in common_names.items() if language_names}
+    if data.get('common_name'):
+        names.setdefault('en', []).append(data['common_name'])
+    return names
+
 def map_growth_data_to_model(growth_data):
     """
     Map Trefle API growth data to our PlantCareDetails model structure.
@@ -0,0 +1,308 @@
+"""Per-provider, per-API-key token-bucket rate limiting with daily quotas.
+
+Bucket state lives in a small SQLite database in WAL mode and every
+take is one IMMEDIATE transaction, so all worker processes and batch
+jobs share the same budget. Each bucket refills at the provider's rate
+up to a burst size, and counts calls against an optional daily quota
+(reset at midnight UTC).
+
+Interactive calls (web requests) may use every token. Batch calls
+(seeding, catalog sync, prefetch) leave a reserve of the burst and of
+the daily quota untouched, so a running ingest job never starves user
+searches. Callers choose between blocking until a token is available
+and failing fast with RateLimited, a requests exception the provider
+modules already handle.
+
+Configuration (per provider, e.g. PERENUAL_RATE_PER_MINUTE):
+    <PROVIDER>_RATE_PER_MINUTE, <PROVIDER>_BURST, <PROVIDER>_DAILY_QUOTA
+    PROVIDER_RATE_LIMIT_PATH      state file (default .cache/provider_limits.sqlite3)
+    PROVIDER_RATE_LIMIT_DISABLED  set to 1 to turn limiting off
+"""
+
+import contextvars
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+
+# Share of the burst and daily quota that batch calls may not use
+BATCH_RESERVE = 0.2
+
+DEFAULT_PATH = os.path.join('.cache', 'provider_limits.sqlite3')
+
+Limit = namedtuple('Limit', ['rate_per_minute', 'burst', 'daily_quota'])
+
+# Defaults follow each provider's documented free-tier limits
+DEFAULT_LIMITS = {
+    'perenual': Limit(rate_per_minute=60, burst=10, daily_quota=100),
+    'trefle': Limit(rate_per_minute=120, burst=20, daily_quota=None),
+    'plant_id': Limit(rate_per_minute=30, burst=5, daily_quota=None),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    bucket TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    blocked_until REAL NOT NULL DEFAULT 0,
+    day TEXT NOT NULL,
+    used_today INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# (priority, block) for provider calls made in the current context
+_mode = contextvars.ContextVar('rate_limit_mode', default=(INTERACTIVE, False))
+
+
+class RateLimited(requests.exceptions.RequestException):
+    """No token was available in time for a provider call."""
+
+    def __init__(self, provider, retry_after):
+        super().__init__(f"{provider} rate limit reached; retry in {retry_after:.1f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class QuotaExhausted(RateLimited):
+    """The provider's daily quota is used up until midnight UTC."""
+
+    def __init__(self, provider, retry_after):
+        requests.exceptions.RequestException.__init__(
+            self, f"{provider} daily quota exhausted; resets in {retry_after / 3600:.1f}h")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+@contextmanager
+def rate_limit_mode(priority=INTERACTIVE, block=False):
+    """Set the priority and blocking mode for provider calls in this context."""
+    token = _mode.set((priority, block))
+    try:
+        yield
+    finally:
+        _mode.reset(token)
+
+
+def batch_priority(block=True):
+    """Run provider calls as a batch job, by default waiting for tokens."""
+    return rate_limit_mode(BATCH, block)
+
+
+def current_mode():
+    """Return the (priority, block) mode of the current context."""
+    return _mode.get()
+
+
+def limits_from_env(defaults=DEFAULT_LIMITS):
+    """Return provider limits with any environment overrides applied."""
+    limits = {}
+    for provider, limit in defaults.items():
+        prefix = provider.upper()
+        quota = os.environ.get(f'{prefix}_DAILY_QUOTA')
+        limits[provider] = Limit(
+            rate_per_minute=float(os.environ.get(f'{prefix}_RATE_PER_MINUTE', limit.rate_per_minute)),
+            burst=float(os.environ.get(f'{prefix}_BURST', limit.burst)),
+            daily_quota=(int(quota) or None) if quota is not None else limit.daily_quota
+        )
+    return limits
+
+
+def _seconds_until_midnight(now):
+    moment = datetime.fromtimestamp(now, timezone.utc)
+    return 86400 - (moment.hour * 3600 + moment.minute * 60 + moment.second)
+
+
+class RateLimiter:
+    """Token buckets shared by every process using the same state file."""
+
+    def __init__(self, path=DEFAULT_PATH, limits=None, clock=time.time, sleep=time.sleep):
+        self.path = path
+        self.limits = limits_from_env() if limits is None else limits
+        self._clock = clock
+        self._sleep = sleep
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.rejected = 0
+        self.waited_seconds = 0.0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def bucket_name(provider, api_key=None):
+        """Return the bucket for a provider and API key, without storing the key."""
+        digest = hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:16]
+        return f"{provider}:{digest}"
+
+    def acquire(self, provider, api_key=None, priority=None, block=None, timeout=None):
+        """Take one token for a provider call.
+
+        Priority and blocking default to the current context (see
+        rate_limit_mode and batch_priority). A blocking call waits for a
+        token, up to `timeout` seconds if given.
+
+        Raises:
+            RateLimited: no token in time (immediately when not blocking)
+            QuotaExhausted: the daily quota is used up
+        """
+        limit = self.limits.get(provider)
+        if limit is None:
+            return
+        context_priority, context_block = current_mode()
+        priority = priority or context_priority
+        block = context_block if block is None else block
+        deadline = None if timeout is None else self._clock() + timeout
+        bucket = self.bucket_name(provider, api_key)
+
+        while True:
+            wait = self._take(bucket, limit, priority)
+            if wait == 0:
+                with self._lock:
+                    self.acquired += 1
+                return
+            if wait < 0:
+                with self._lock:
+                    self.rejected += 1
+                raise QuotaExhausted(provider, _seconds_until_midnight(self._clock()))
+            if not block or (deadline is not None and self._clock() + wait > deadline):
+                with self._lock:
+                    self.rejected += 1
+                raise RateLimited(provider, wait)
+            with self._lock:
+                self.waited_seconds += wait
+            self._sleep(wait)
+
+    def _take(self, bucket, limit, priority):
+        """Try to take a token; return 0 on success, the wait in seconds, or -1 if over quota."""
+        now = self._clock()
+        today = datetime.fromtimestamp(now, timezone.utc).strftime('%Y-%m-%d')
+        rate = limit.rate_per_minute / 60.0
+        reserve = BATCH_RESERVE if priority == BATCH else 0.0
+
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                "SELECT tokens, updated_at, blocked_until, day, used_today FROM buckets WHERE bucket = ?",
+                (bucket,)
+            ).fetchone()
+            if row is None:
+                tokens, updated_at, blocked_until, day, used_today = limit.burst, now, 0.0, today, 0
+            else:
+                tokens, updated_at, blocked_until, day, used_today = row
+            if day != today:
+                day, used_today = today, 0
+
+            tokens = min(limit.burst, tokens + max(0.0, now - updated_at) * rate)
+
+            if limit.daily_quota and used_today >= limit.daily_quota * (1 - reserve):
+                result = -1
+            elif now < blocked_until:
+                result = blocked_until - now
+            elif tokens - 1 >= limit.burst * reserve:
+                tokens -= 1
+                used_today += 1
+                result = 0
+            else:
+                result = (limit.burst * reserve + 1 - tokens) / rate
+
+            connection.execute(
+                "INSERT OR REPLACE INTO buckets "
+                "(bucket, tokens, updated_at, blocked_until, day, used_today) VALUES (?, ?, ?, ?, ?, ?)",
+                (bucket, tokens, now, blocked_until, day, used_today)
+            )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return result
+
+    def backoff(self, provider, api_key=None, retry_after=None):
+        """Empty a bucket after the provider answered 429 Too Many Requests."""
+        limit = self.limits.get(provider)
+        if limit is None:
+            return
+        now = self._clock()
+        if retry_after is None:
+            retry_after = 60.0 / limit.rate_per_minute
+        self._connection().execute(
+            "UPDATE buckets SET tokens = 0, updated_at = ?, blocked_until = ? WHERE bucket = ?",
+            (now, now + retry_after, self.bucket_name(provider, api_key))
+        )
+        logger.warning(f"{provider} returned 429; pausing calls for {retry_after:.1f}s")
+
+    def status(self, provider, api_key=None):
+        """Return the current tokens and quota use of a bucket."""
+        limit = self.limits.get(provider)
+        if limit is None:
+            return None
+        row = self._connection().execute(
+            "SELECT tokens, updated_at, day, used_today FROM buckets WHERE bucket = ?",
+            (self.bucket_name(provider, api_key),)
+        ).fetchone()
+        now = self._clock()
+        today = datetime.fromtimestamp(now, timezone.utc).strftime('%Y-%m-%d')
+        tokens, used_today = limit.burst, 0
+        if row is not None:
+            tokens = min(limit.burst, row[0] + max(0.0, now - row[1]) * limit.rate_per_minute / 60.0)
+            used_today = row[3] if row[2] == today else 0
+        return {
+            'tokens': round(tokens, 2),
+            'burst': limit.burst,
+            'rate_per_minute': limit.rate_per_minute,
+            'used_today': used_today,
+            'daily_quota': limit.daily_quota
+        }
+
+    def stats(self):
+        """Return counters for monitoring."""
+        with self._lock:
+            return {
+                'acquired': self.acquired,
+                'rejected': self.rejected,
+                'waited_seconds': round(self.waited_seconds, 3)
+            }
+
+
+_default_limiter = None
+_default_failed = False
+_default_lock = threading.Lock()
+
+
+def default_limiter():
+    """Return the shared limiter configured from the environment, or None if disabled."""
+    global _default_limiter, _default_failed
+    if os.environ.get('PROVIDER_RATE_LIMIT_DISABLED') == '1':
+        return None
+    with _default_lock:
+        if _default_limiter is None and not _default_failed:
+            try:
+                _default_limiter = RateLimiter(os.environ.get('PROVIDER_RATE_LIMIT_PATH', DEFAULT_PATH))
+            except (OSError, sqlite3.Error) as e:
+                logger.error(f"Provider rate limiter unavailable: {e}")
+                _default_failed = True
+        return _default_limiter
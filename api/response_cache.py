@@ -0,0 +1,341 @@
+"""Persistent cache for provider GET responses.
+
+Responses are stored in a SQLite database in WAL mode, so every worker
+process and every restart shares the same cache, and readers never wait
+on the writer. Entries are keyed by provider, endpoint and query
+parameters (API keys excluded) and carry a per-endpoint TTL set by the
+calling module. After the TTL an entry is stale: it is still served at
+once for a further stale window while a background request refreshes
+it. Validators (ETag, Last-Modified) are stored with each entry, so
+the refresh can be a conditional request: a 304 extends the stored
+body's lifetime without downloading or re-parsing it. The file is
+bounded in size by evicting the least recently used entries; writes
+keep a running byte total, so eviction only runs once that total
+crosses the bound, or every EVICT_EVERY writes to drop dead entries and
+account for other processes' writes.
+
+Configuration:
+    PROVIDER_CACHE_PATH       cache file (default .cache/provider_responses.sqlite3)
+    PROVIDER_CACHE_MAX_MB     size bound in megabytes (default 256)
+    PROVIDER_CACHE_DISABLED   set to 1 to bypass the cache entirely
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+DEFAULT_PATH = os.path.join('.cache', 'provider_responses.sqlite3')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+STALE_TTL = 7 * DAY
+
+# Query parameters that authenticate rather than select data
+SECRET_PARAMS = {'key', 'token', 'api_key'}
+
+# Refresh accessed_at at most this often, so hot reads rarely write
+ACCESS_RESOLUTION = MINUTE
+
+# Evict down to this fraction of the bound, so eviction runs rarely
+EVICT_TO = 0.9
+
+# Evict at least this often, in writes, even while under the bound
+EVICT_EVERY = 100
+
+CachedResponse = namedtuple('CachedResponse', ['body', 'fresh'])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    body TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    stale_until REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    etag TEXT,
+    last_modified TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_responses_accessed_at ON responses (accessed_at);
+CREATE INDEX IF NOT EXISTS ix_responses_stale_until ON responses (stale_until);
+"""
+
+# Columns added after the first release, for cache files created before them
+_ADDED_COLUMNS = (('etag', 'TEXT'), ('last_modified', 'TEXT'))
+
+
+def make_key(provider, endpoint, params=None):
+    """Return the cache key for a request, ignoring API keys and param order."""
+    selected = sorted((str(name), str(value)) for name, value in (params or {}).items()
+                      if name not in SECRET_PARAMS and value is not None)
+    raw = json.dumps([provider, endpoint, selected], separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed response cache shared by all processes using one file."""
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES, stale_ttl=STALE_TTL,
+                 clock=time.time):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl
+        self._clock = clock
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._executor = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.evictions = 0
+        self.revalidations = 0
+        self.not_modified = 0
+        # Bytes stored as last counted plus this process's writes since, and writes since eviction
+        self._bytes = 0
+        self._writes = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+        self._migrate()
+        self._bytes = self._total_bytes()
+
+    def _total_bytes(self):
+        return self._connection().execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _connection(self):
+        # sqlite3 connections must stay on the thread that opened them
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def _migrate(self):
+        connection = self._connection()
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(responses)")}
+        for column, column_type in _ADDED_COLUMNS:
+            if column not in columns:
+                try:
+                    connection.execute(f"ALTER TABLE responses ADD COLUMN {column} {column_type}")
+                except sqlite3.OperationalError:
+                    pass  # another process added it first
+
+    def get(self, provider, endpoint, params=None, record=True):
+        """Return a CachedResponse, or None if missing or past its stale window.
+
+        Pass record=False for a second look at an entry, so the hit
+        counters only count each lookup once.
+        """
+        key = make_key(provider, endpoint, params)
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT body, expires_at, stale_until, accessed_at FROM responses WHERE key = ?",
+            (key,)
+        ).fetchone()
+
+        now = self._clock()
+        if row is None or row[2] <= now:
+            if record:
+                with self._lock:
+                    self.misses += 1
+            return None
+
+        body, expires_at, _, accessed_at = row
+        if now - accessed_at > ACCESS_RESOLUTION:
+            connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+
+        fresh = now < expires_at
+        if not record:
+            return CachedResponse(json.loads(body), fresh)
+        with self._lock:
+            if fresh:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+        return CachedResponse(json.loads(body), fresh)
+
+    def set(self, provider, endpoint, params, body, ttl, stale_ttl=None, etag=None,
+            last_modified=None):
+        """Store a response body for `ttl` seconds plus the stale window.
+
+        Args:
+            etag, last_modified: The response's validators, if it sent any
+        """
+        data = json.dumps(body, separators=(',', ':'))
+        size = len(data.encode('utf-8'))
+        now = self._clock()
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        self._connection().execute(
+            "INSERT OR REPLACE INTO responses "
+            "(key, provider, endpoint, body, size, fetched_at, expires_at, stale_until, accessed_at, "
+            "etag, last_modified) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (make_key(provider, endpoint, params), provider, endpoint, data,
+             size, now, now + ttl, now + ttl + stale_ttl, now, etag, last_modified)
+        )
+        # A replaced entry is counted twice until the next eviction recounts
+        with self._lock:
+            self._bytes += size
+            self._writes += 1
+            due = self._bytes > self.max_bytes or self._writes >= EVICT_EVERY
+        if due:
+            self.evict()
+
+    def validators(self, provider, endpoint, params=None):
+        """Return the stored (etag, last_modified) of an entry; None for any not stored."""
+        row = self._connection().execute(
+            "SELECT etag, last_modified FROM responses WHERE key = ?",
+            (make_key(provider, endpoint, params),)
+        ).fetchone()
+        return row if row is not None else (None, None)
+
+    def touch(self, provider, endpoint, params, ttl, stale_ttl=None):
+        """Restart an entry's TTL after the provider confirmed it unchanged.
+
+        Returns:
+            True if the entry was still stored
+        """
+        now = self._clock()
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        return self._connection().execute(
+            "UPDATE responses SET fetched_at = ?, expires_at = ?, stale_until = ?, accessed_at = ? "
+            "WHERE key = ?",
+            (now, now + ttl, now + ttl + stale_ttl, now, make_key(provider, endpoint, params))
+        ).rowcount > 0
+
+    def record_revalidation(self, not_modified):
+        """Count a conditional request, and whether it was answered 304 Not Modified."""
+        with self._lock:
+            self.revalidations += 1
+            if not_modified:
+                self.not_modified += 1
+
+    def evict(self):
+        """Drop dead entries, then least recently used ones while over the bound.
+
+        Returns:
+            Number of entries removed
+        """
+        connection = self._connection()
+        removed = connection.execute(
+            "DELETE FROM responses WHERE stale_until <= ?", (self._clock(),)
+        ).rowcount
+
+        total = self._total_bytes()
+        if total > self.max_bytes:
+            target = self.max_bytes * EVICT_TO
+            keys = []
+            for key, size in connection.execute(
+                    "SELECT key, size FROM responses ORDER BY accessed_at"):
+                if total <= target:
+                    break
+                keys.append((key,))
+                total -= size
+            connection.executemany("DELETE FROM responses WHERE key = ?", keys)
+            removed += len(keys)
+
+        with self._lock:
+            self._bytes = total
+            self._writes = 0
+            self.evictions += removed
+        return removed
+
+    def refresh(self, provider, endpoint, params, fetch):
+        """Run `fetch` in the background unless this entry is already refreshing.
+
+        Returns:
+            True if a refresh was started
+        """
+        key = make_key(provider, endpoint, params)
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            self.refreshes += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2,
+                                                    thread_name_prefix='response-cache')
+
+        def run():
+            try:
+                fetch()
+            except Exception as e:
+                logger.warning(f"Background refresh of {provider} {endpoint} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(run)
+        return True
+
+    def clear(self, provider=None):
+        """Drop every entry, or every entry for one provider."""
+        if provider is None:
+            self._connection().execute("DELETE FROM responses")
+        else:
+            self._connection().execute("DELETE FROM responses WHERE provider = ?", (provider,))
+        total = self._total_bytes()
+        with self._lock:
+            self._bytes = total
+
+    def stats(self):
+        """Return hit counters and the cache size for monitoring."""
+        entries, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+                'refreshes': self.refreshes,
+                'revalidations': self.revalidations,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions,
+                'entries': entries,
+                'bytes': size,
+                'max_bytes': self.max_bytes
+            }
+
+
+_default_cache = None
+_default_failed = False
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """Return the shared cache configured from the environment, or None if disabled."""
+    global _default_cache, _default_failed
+    if os.environ.get('PROVIDER_CACHE_DISABLED') == '1':
+        return None
+    with _default_lock:
+        if _default_cache is None and not _default_failed:
+            try:
+                _default_cache = ResponseCache(
+                    path=os.environ.get('PROVIDER_CACHE_PATH', DEFAULT_PATH),
+                    max_bytes=int(float(os.environ.get('PROVIDER_CACHE_MAX_MB', 256)) * 1024 * 1024)
+                )
+            except (OSError, sqlite3.Error) as e:
+                # Providers still work uncached; don't retry on every call
+                logger.error(f"Provider response cache unavailable: {e}")
+                _default_failed = True
+        return _default_cache
@@ -0,0 +1,123 @@
+"""Coalesce concurrent identical provider lookups into one call.
+
+Within a process, SingleFlight lets the first caller for a key make the
+call while every concurrent caller for the same key waits and shares
+its result (or its exception). Across processes, an optional advisory
+file lock serialises cache misses for the same key, so the second
+process finds the first one's response in the shared response cache
+instead of calling the provider again.
+
+Configuration:
+    PROVIDER_SINGLE_FLIGHT_LOCKS  set to 1 to coalesce across processes too
+    PROVIDER_LOCK_DIR             lock file directory (default .cache/locks)
+"""
+
+import copy
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalesce within each process only
+    fcntl = None
+
+DEFAULT_LOCK_DIR = os.path.join('.cache', 'locks')
+
+# Keys share this many lock files, so the directory never grows
+LOCK_STRIPES = 256
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run at most one call per key at a time and share its outcome."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+        self.shared_across_processes = 0
+
+    def do(self, key, fn):
+        """Return fn(), or the result of the identical call already in flight.
+
+        Waiting callers get a deep copy of the result, so no caller can
+        change another's data, and re-raise the same exception on failure.
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self.executed += 1
+            call.done.set()
+
+    def record_shared(self):
+        """Count a call answered by another process's result."""
+        with self._lock:
+            self.shared_across_processes += 1
+
+    def stats(self):
+        """Return coalescing counters for monitoring."""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'shared_across_processes': self.shared_across_processes,
+                'in_flight': len(self._calls)
+            }
+
+
+def default_lock_dir():
+    """Return the lock directory if cross-process coalescing is enabled, else None."""
+    if os.environ.get('PROVIDER_SINGLE_FLIGHT_LOCKS') != '1' or fcntl is None:
+        return None
+    return os.environ.get('PROVIDER_LOCK_DIR', DEFAULT_LOCK_DIR)
+
+
+@contextmanager
+def process_lock(directory, key):
+    """Hold an exclusive advisory lock shared by every process for this key.
+
+    Args:
+        directory: Lock file directory, created if missing
+        key: Hex digest identifying the call, e.g. a response cache key
+    """
+    os.makedirs(directory, exist_ok=True)
+    stripe = int(key[:8], 16) % LOCK_STRIPES
+    with open(os.path.join(directory, f"{stripe:03d}.lock"), 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
@@ -0,0 +1,162 @@
+"""In-memory prefix index for plant name autocomplete.
+
+Committed plant changes in this process update the index as they happen,
+and each worker rebuilds it periodically to pick up other processes'
+writes (see index_sync.py).
+"""
+
+import bisect
+import threading
+import time
+import unicodedata
+
+import index_sync
+from model import db, Plant
+
+
+def normalize_name(name):
+    """Lowercase a name, strip accents and collapse whitespace."""
+    if not name:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', name)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.lower().split())
+
+
+def _name_keys(name):
+    """Return the index keys for a name: the full name and each word suffix.
+
+    Indexing every word start lets "plant" match "Snake Plant" while the
+    lookup itself stays a plain prefix scan.
+    """
+    normalized = normalize_name(name)
+    if not normalized:
+        return []
+    words = normalized.split(' ')
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class PlantNameIndex:
+    """Sorted, normalized prefix index over plant scientific and common names."""
+
+    def __init__(self, max_age=None, clock=time.monotonic):
+        """
+        Args:
+            max_age: Seconds before ensure_built() rebuilds, defaulting to
+                index_sync.REBUILD_INTERVAL; 0 never rebuilds
+        """
+        self._keys = []            # sorted (key, plant_id) tuples
+        self._keys_by_plant = {}   # plant_id -> keys owned by that plant
+        self._plants = {}          # plant_id -> (scientific_name, common_name)
+        self._lock = threading.Lock()
+        self.max_age = index_sync.REBUILD_INTERVAL if max_age is None else max_age
+        self._clock = clock
+        self.built = False
+        self.built_at = None
+
+    def __len__(self):
+        return len(self._plants)
+
+    def build(self, plants):
+        """Replace the index contents.
+
+        Args:
+            plants: Iterable of (plant_id, scientific_name, common_name) rows
+        """
+        keys = []
+        keys_by_plant = {}
+        names = {}
+        for plant_id, scientific_name, common_name in plants:
+            plant_keys = self._plant_keys(scientific_name, common_name)
+            keys.extend((key, plant_id) for key in plant_keys)
+            keys_by_plant[plant_id] = plant_keys
+            names[plant_id] = (scientific_name, common_name)
+        keys.sort()
+
+        with self._lock:
+            self._keys = keys
+            self._keys_by_plant = keys_by_plant
+            self._plants = names
+            self.built = True
+            self.built_at = self._clock()
+
+    def build_from_db(self):
+        """Build the index from the plants table (needs an app context)."""
+        rows = db.session.query(
+            Plant.plant_id, Plant.scientific_name, Plant.common_name
+        ).all()
+        self.build(rows)
+
+    def ensure_built(self):
+        """Build the index from the database if it is unbuilt or older than max_age."""
+        if not self.built or (self.max_age and self._clock() - self.built_at > self.max_age):
+            self.build_from_db()
+
+    def apply_changes(self, changes):
+        """Apply committed changes: {plant_id: (scientific_name, common_name), or None if deleted}."""
+        # An unbuilt index loads everything from the database on first use
+        if not self.built:
+            return
+        for plant_id, names in changes.items():
+            if names is None:
+                self.remove_plant(plant_id)
+            else:
+                self.add_plant(plant_id, *names)
+
+    def add_plant(self, plant_id, scientific_name, common_name=None):
+        """Add a plant, replacing any names previously indexed for it."""
+        with self._lock:
+            self._remove_locked(plant_id)
+            plant_keys = self._plant_keys(scientific_name, common_name)
+            for key in plant_keys:
+                bisect.insort(self._keys, (key, plant_id))
+            self._keys_by_plant[plant_id] = plant_keys
+            self._plants[plant_id] = (scientific_name, common_name)
+
+    def remove_plant(self, plant_id):
+        """Remove a plant from the index."""
+        with self._lock:
+            self._remove_locked(plant_id)
+
+    def search(self, prefix, limit=10):
+        """Return up to `limit` plants with a name starting with `prefix`."""
+        prefix = normalize_name(prefix)
+        if not prefix or limit <= 0:
+            return []
+
+        results = []
+        seen = set()
+        with self._lock:
+            position = bisect.bisect_left(self._keys, (prefix,))
+            while position < len(self._keys) and len(results) < limit:
+                key, plant_id = self._keys[position]
+                if not key.startswith(prefix):
+                    break
+                if plant_id not in seen:
+                    seen.add(plant_id)
+                    scientific_name, common_name = self._plants[plant_id]
+                    results.append({
+                        'plant_id': plant_id,
+                        'scientific_name': scientific_name,
+                        'common_name': common_name
+                    })
+                position += 1
+        return results
+
+    def _plant_keys(self, scientific_name, common_name):
+        keys = _name_keys(scientific_name) + _name_keys(common_name)
+        return sorted(set(keys))
+
+    def _remove_locked(self, plant_id):
+        for key in self._keys_by_plant.pop(plant_id, []):
+            position = bisect.bisect_left(self._keys, (key, plant_id))
+            if position < len(self._keys) and self._keys[position] == (key, plant_id):
+                del self._keys[position]
+        self._plants.pop(plant_id, None)
+
+
+# Shared index used by the autocomplete endpoint, kept fresh by every commit
+plant_name_index = PlantNameIndex()
+index_sync.on_commit('plant_names', Plant,
+                     lambda plant: (plant.scientific_name, plant.common_name),
+                     plant_name_index.apply_changes)
@@ -0,0 +1,454 @@
+"""Local stand-in for the Perenual, Trefle and Plant.id APIs.
+
+Serves every endpoint the provider modules call, from the response
+fixtures in benchmarks/fixtures/providers.json, under one port with a
+path prefix per provider. IDs missing from the fixtures are answered
+with a fixture record under that ID, so paging through a large catalog
+or importing arbitrary plants works too. Each provider can be given
+latency (fixed, uniform or lognormal), a share of 5xx errors, 429s and
+hung requests, and a per-minute request limit, all drawn from a seeded
+random generator so load tests and benchmarks can be repeated offline.
+GET responses carry an ETag and Last-Modified, and conditional requests
+for an unchanged body are answered 304 Not Modified.
+
+The app and scripts use the stand-in when pointed at it through the
+<PROVIDER>_BASE_URL overrides (see api.http_client.base_url_for), which
+the server prints on start:
+
+    python -m benchmarks.fake_providers --port 8700 --latency-ms 120 \\
+        --distribution lognormal --error-rate 0.02 \\
+        --provider-faults trefle:throttle_rate=0.05,rate_per_minute=120
+
+GET /_stats returns request counts by provider, endpoint and status.
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, deque, namedtuple
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'providers.json')
+PROVIDERS = ('perenual', 'trefle', 'plant_id')
+DEFAULT_CATALOG_SIZE = 1000
+
+Faults = namedtuple('Faults', [
+    'latency_ms',       # fixed latency, or the median for uniform and lognormal
+    'distribution',     # 'fixed', 'uniform' or 'lognormal'
+    'jitter_ms',        # uniform: latency_ms +/- jitter_ms
+    'sigma',            # lognormal: spread of the log latency
+    'error_rate',       # share of requests answered with a 5xx
+    'throttle_rate',    # share of requests answered with a 429
+    'timeout_rate',     # share of requests that hang for timeout_seconds
+    'timeout_seconds',
+    'rate_per_minute',  # requests per rolling minute before every request gets a 429
+    'retry_after',      # Retry-After seconds sent with 429s
+], defaults=[0, 'fixed', 0, 0.5, 0.0, 0.0, 0.0, 30, None, 1])
+
+NO_FAULTS = Faults()
+
+# Where each provider expects its API key
+KEY_PARAMS = {'perenual': 'key', 'trefle': 'token'}
+KEY_HEADERS = {'plant_id': 'Api-Key'}
+
+
+def load_fixtures(path=FIXTURES_PATH):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def parse_faults(spec, base=NO_FAULTS):
+    """Return Faults from 'name=value,...' settings applied over `base`."""
+    values = {}
+    for setting in filter(None, spec.split(',')):
+        name, value = setting.split('=', 1)
+        if name not in Faults._fields:
+            raise ValueError(f"Unknown fault setting {name}")
+        values[name] = value if name == 'distribution' else float(value)
+    return base._replace(**values)
+
+
+class Catalog:
+    """Provider responses built from fixture records."""
+
+    def __init__(self, fixtures, size=DEFAULT_CATALOG_SIZE):
+        self.fixtures = fixtures
+        self.size = size
+        self.trefle = fixtures['trefle']['plants']
+        self.perenual = fixtures['perenual']['species']
+
+    @staticmethod
+    def _record(records, record_id):
+        """Return the fixture with this ID, or a fixture cycled under it."""
+        for record in records:
+            if record['id'] == record_id:
+                return copy.deepcopy(record)
+        record = copy.deepcopy(records[record_id % len(records)])
+        record['id'] = record_id
+        if 'main_species' in record:
+            record['main_species']['id'] = record_id
+        return record
+
+    def _listing(self, records):
+        # The fixture records first, then cycled copies up to the catalog size
+        for index in range(self.size):
+            record_id = records[index]['id'] if index < len(records) else 100000 + index
+            yield self._record(records, record_id)
+
+    @staticmethod
+    def _matches(record, query):
+        query = query.lower()
+        names = [record.get('common_name') or '', record.get('scientific_name') or '']
+        names = [name for value in names for name in (value if isinstance(value, list) else [value])]
+        return any(query in name.lower() for name in names)
+
+    @staticmethod
+    def _page(params, default_size, size_param):
+        page = max(int(params.get('page', 1)), 1)
+        size = max(int(params.get(size_param, default_size)), 1)
+        return page, size
+
+    def trefle_summary(self, record):
+        summary = {key: value for key, value in record.items() if key != 'main_species'}
+        summary['links'] = {'self': f"/api/v1/species/{record['slug']}",
+                            'plant': f"/api/v1/plants/{record['slug']}"}
+        return summary
+
+    def trefle_list(self, path, params, records=None):
+        query = params.get('q') or next((value for key, value in params.items()
+                                         if key.startswith('filter[')), None)
+        if records is None:
+            records = self.trefle if query else list(self._listing(self.trefle))
+        if query:
+            records = [record for record in records if self._matches(record, query)]
+        page, size = self._page(params, 20, 'limit')
+        items = records[(page - 1) * size:page * size]
+        last = max(math.ceil(len(records) / size), 1)
+        links = {'self': f"/api/v1{path}?page={page}", 'first': f"/api/v1{path}?page=1",
+                 'last': f"/api/v1{path}?page={last}"}
+        if page < last:
+            links['next'] = f"/api/v1{path}?page={page + 1}"
+        return {'data': [self.trefle_summary(record) for record in items],
+                'links': links, 'meta': {'total': len(records)}}
+
+    def trefle_plant(self, plant_id):
+        return {'data': self._record(self.trefle, plant_id),
+                'meta': {'last_modified': '2024-03-01T12:00:00.000Z'}}
+
+    def trefle_species(self, plant_id):
+        return {'data': [self._record(self.trefle, plant_id)['main_species']],
+                'links': {'self': f"/api/v1/plants/{plant_id}/species"}, 'meta': {'total': 1}}
+
+    def trefle_taxa(self, path, params, field):
+        names = sorted({record[field] for record in self.trefle})
+        taxa = [{'id': index + 1, 'name': name, 'slug': name.lower(),
+                 'links': {'self': f"/api/v1{path}/{name.lower()}"}} for index, name in enumerate(names)]
+        return {'data': taxa, 'links': {'self': f"/api/v1{path}?page={params.get('page', 1)}"},
+                'meta': {'total': len(taxa)}}
+
+    def perenual_summary(self, record):
+        keys = ('id', 'common_name', 'scientific_name', 'other_name', 'cycle', 'watering',
+                'sunlight', 'default_image')
+        return {key: record.get(key) for key in keys}
+
+    def perenual_list(self, params):
+        query = params.get('q')
+        if query:
+            records = [record for record in self.perenual if self._matches(record, query)]
+        else:
+            records = list(self._listing(self.perenual))
+        page, size = self._page(params, 30, 'size')
+        items = records[(page - 1) * size:page * size]
+        return {'data': [self.perenual_summary(record) for record in items],
+                'to': (page - 1) * size + len(items), 'per_page': size, 'current_page': page,
+                'from': (page - 1) * size + 1, 'last_page': max(math.ceil(len(records) / size), 1),
+                'total': len(records)}
+
+    def perenual_details(self, species_id):
+        return self._record(self.perenual, species_id)
+
+    def perenual_care(self, species_id):
+        record = self._record(self.perenual, species_id)
+        return {'data': [{'id': species_id, 'species_id': species_id,
+                          'common_name': record['common_name'],
+                          'scientific_name': record['scientific_name'],
+                          'section': [dict(section, id=index + 1) for index, section
+                                      in enumerate(self.fixtures['perenual']['care_sections'])]}],
+                'to': 1, 'per_page': 30, 'current_page': 1, 'from': 1, 'last_page': 1, 'total': 1}
+
+
+def _id(match):
+    return int(match.group(1))
+
+
+# (provider, method, path pattern, handler(catalog, match, path, params))
+ROUTES = [
+    ('trefle', 'GET', r'/plants/search', lambda c, m, p, q: c.trefle_list('/plants/search', q)),
+    ('trefle', 'GET', r'/plants', lambda c, m, p, q: c.trefle_list('/plants', q)),
+    ('trefle', 'GET', r'/plants/(\d+)', lambda c, m, p, q: c.trefle_plant(_id(m))),
+    ('trefle', 'GET', r'/plants/(\d+)/species', lambda c, m, p, q: c.trefle_species(_id(m))),
+    ('trefle', 'GET', r'/species/(\d+)', lambda c, m, p, q: {'data': c.trefle_plant(_id(m))['data']['main_species']}),
+    ('trefle', 'GET', r'/families', lambda c, m, p, q: c.trefle_taxa('/families', q, 'family')),
+    ('trefle', 'GET', r'/genus', lambda c, m, p, q: c.trefle_taxa('/genus', q, 'genus')),
+    ('perenual', 'GET', r'/species-list', lambda c, m, p, q: c.perenual_list(q)),
+    ('perenual', 'GET', r'/species/details/(\d+)', lambda c, m, p, q: c.perenual_details(_id(m))),
+    ('perenual', 'GET', r'/plants/(\d+)/care', lambda c, m, p, q: c.perenual_care(_id(m))),
+    ('plant_id', 'POST', r'/identify', lambda c, m, p, q: copy.deepcopy(c.fixtures['plant_id']['identify'])),
+    ('plant_id', 'POST', r'/health_assessment',
+     lambda c, m, p, q: copy.deepcopy(c.fixtures['plant_id']['health_assessment'])),
+]
+ROUTES = [(provider, method, re.compile(pattern + '$'), handler)
+          for provider, method, pattern, handler in ROUTES]
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    """Routes /<provider>/<endpoint> requests to the catalog, injecting faults."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def handle_request(self, method):
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+        if url.path == '/_stats':
+            return self.send_json(200, self.server.stats())
+
+        provider, _, endpoint = url.path.lstrip('/').partition('/')
+        endpoint = '/' + endpoint
+        route = next(((handler, match) for name, route_method, pattern, handler in ROUTES
+                      if name == provider and route_method == method
+                      for match in [pattern.match(endpoint)] if match), None)
+        if route is None:
+            return self.send_json(404, {'error': f"No fake endpoint {method} {url.path}"})
+        handler, match = route
+        endpoint_name = re.sub(r'/\d+', '/{id}', endpoint)
+
+        if not self.authorized(provider, params):
+            self.server.count(provider, endpoint_name, 401)
+            return self.send_json(401, {'error': 'Unauthenticated'})
+        if method == 'POST' and not (json.loads(body or b'{}').get('images')):
+            self.server.count(provider, endpoint_name, 400)
+            return self.send_json(400, {'error': 'No images provided'})
+
+        fault, delay = self.server.draw(provider)
+        if fault:
+            self.server.count(provider, endpoint_name, fault)
+        if fault == 'timeout':
+            # Hang past the client's read timeout, then drop the connection
+            time.sleep(delay)
+            self.close_connection = True
+            return
+        time.sleep(delay)
+        if fault == 429:
+            return self.send_json(429, {'message': 'Too Many Attempts.'},
+                                  {'Retry-After': str(int(self.server.faults_for(provider).retry_after))})
+        if fault:
+            return self.send_json(fault, {'error': 'Internal Server Error'})
+
+        payload = handler(self.server.catalog, match, endpoint, params)
+        if method != 'GET':
+            self.server.count(provider, endpoint_name, 200)
+            return self.send_json(200, payload)
+        # The catalog never changes while serving, so validators only depend on the body
+        validators = {'ETag': '"%s"' % hashlib.sha1(json.dumps(payload).encode('utf-8')).hexdigest(),
+                      'Last-Modified': self.server.last_modified}
+        if self.not_modified(validators):
+            self.server.count(provider, endpoint_name, 304)
+            return self.send_not_modified(validators)
+        self.server.count(provider, endpoint_name, 200)
+        self.send_json(200, payload, validators)
+
+    def not_modified(self, validators):
+        if self.headers.get('If-None-Match') is not None:
+            return validators['ETag'] in [tag.strip() for tag in self.headers['If-None-Match'].split(',')]
+        return self.headers.get('If-Modified-Since') == validators['Last-Modified']
+
+    def authorized(self, provider, params):
+        if provider in KEY_PARAMS:
+            return bool(params.get(KEY_PARAMS[provider]))
+        return bool(self.headers.get(KEY_HEADERS[provider]))
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_not_modified(self, validators):
+        self.send_response(304)
+        for name, value in validators.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeProviderServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the catalog, fault settings and counters."""
+
+    daemon_threads = True
+
+    def __init__(self, address, faults=None, fixtures=None, catalog_size=DEFAULT_CATALOG_SIZE,
+                 seed=None):
+        """
+        Args:
+            address: (host, port); port 0 picks a free port
+            faults: Faults for every provider, or a dict of provider -> Faults
+            fixtures: Fixture data, defaulting to benchmarks/fixtures/providers.json
+            catalog_size: Number of records in unfiltered list endpoints
+            seed: Seed for latency and fault draws
+        """
+        super().__init__(address, FakeProviderHandler)
+        self.catalog = Catalog(fixtures or load_fixtures(), catalog_size)
+        self.set_faults(faults)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.recent = {provider: deque() for provider in PROVIDERS}
+        self.last_modified = formatdate(time.time(), usegmt=True)
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up mid-response; that is expected here
+        pass
+
+    def set_faults(self, faults=None):
+        """Replace the fault settings; takes effect on the next request."""
+        if faults is None or isinstance(faults, Faults):
+            faults = {provider: faults or NO_FAULTS for provider in PROVIDERS}
+        self.faults = {provider: faults.get(provider, NO_FAULTS) for provider in PROVIDERS}
+
+    def faults_for(self, provider):
+        return self.faults[provider]
+
+    def base_url(self, provider):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/{provider}"
+
+    def environ(self):
+        """Return the environment that points the app at this server."""
+        env = {f"{provider.upper()}_BASE_URL": self.base_url(provider) for provider in PROVIDERS}
+        env.update({'PERENUAL_API_KEY': 'fake', 'TREFLE_API_KEY': 'fake',
+                    'TREFLE_API_TOKEN': 'fake', 'PLANT_ID_API_KEY': 'fake'})
+        return env
+
+    def draw(self, provider):
+        """Return (fault, delay seconds) for one request to a provider.
+
+        The fault is None, 429, a 5xx status or 'timeout'.
+        """
+        faults = self.faults[provider]
+        with self.lock:
+            now = time.monotonic()
+            recent = self.recent[provider]
+            while recent and recent[0] <= now - 60:
+                recent.popleft()
+            recent.append(now)
+            if faults.rate_per_minute and len(recent) > faults.rate_per_minute:
+                return 429, 0.0
+
+            roll = self.rng.random()
+            if roll < faults.timeout_rate:
+                return 'timeout', faults.timeout_seconds
+            roll -= faults.timeout_rate
+            if roll < faults.throttle_rate:
+                return 429, 0.0
+
+            if faults.distribution == 'uniform':
+                latency = self.rng.uniform(faults.latency_ms - faults.jitter_ms,
+                                           faults.latency_ms + faults.jitter_ms)
+            elif faults.distribution == 'lognormal' and faults.latency_ms:
+                latency = self.rng.lognormvariate(math.log(faults.latency_ms), faults.sigma)
+            else:
+                latency = faults.latency_ms
+            roll -= faults.throttle_rate
+            fault = self.rng.choice((500, 502, 503)) if roll < faults.error_rate else None
+        return fault, max(latency, 0) / 1000
+
+    def count(self, provider, endpoint, status):
+        with self.lock:
+            self.counts[(provider, endpoint, status)] += 1
+
+    def stats(self):
+        """Return request counts as {provider: {endpoint: {status: count}}}."""
+        with self.lock:
+            counts = list(self.counts.items())
+        stats = {}
+        for (provider, endpoint, status), count in counts:
+            stats.setdefault(provider, {}).setdefault(endpoint, {})[str(status)] = count
+        return stats
+
+    def requests(self, provider=None):
+        """Return the number of requests served, optionally for one provider."""
+        with self.lock:
+            return sum(count for (name, _, _), count in self.counts.items()
+                       if provider is None or name == provider)
+
+
+def start(port=0, host='127.0.0.1', **options):
+    """Start the fake providers in a daemon thread and return the server."""
+    server = FakeProviderServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8700)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--catalog-size', type=int, default=DEFAULT_CATALOG_SIZE)
+    parser.add_argument('--fixtures', default=FIXTURES_PATH)
+    for name, default in zip(Faults._fields, Faults._field_defaults.values()):
+        if name == 'distribution':
+            parser.add_argument('--distribution', choices=('fixed', 'uniform', 'lognormal'),
+                                default=default)
+        else:
+            parser.add_argument('--' + name.replace('_', '-'), type=float, default=default)
+    parser.add_argument('--provider-faults', action='append', default=[],
+                        metavar='PROVIDER:NAME=VALUE,...',
+                        help="Override fault settings for one provider")
+    args = parser.parse_args()
+
+    base = Faults(**{name: getattr(args, name) for name in Faults._fields})
+    faults = {provider: base for provider in PROVIDERS}
+    for spec in args.provider_faults:
+        provider, _, settings = spec.partition(':')
+        faults[provider] = parse_faults(settings, faults[provider])
+
+    server = FakeProviderServer((args.host, args.port), faults=faults,
+                                fixtures=load_fixtures(args.fixtures),
+                                catalog_size=args.catalog_size, seed=args.seed)
+    for name, value in server.environ().items():
+        print(f"export {name}={value}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
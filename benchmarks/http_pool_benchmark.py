@@ -0,0 +1,121 @@
+"""Benchmark pooled provider calls against one-off requests.get calls.
+
+Starts a local keep-alive HTTP stub server and times the same number of
+GETs made with bare requests.get (a new connection per call, as the
+provider modules used to do) and with a shared ProviderClient (one
+pooled keep-alive connection). The stub counts accepted connections, so
+the output shows both the latency and the handshakes saved.
+
+The stub speaks plain HTTP on localhost, so only the TCP handshake is
+saved here; against the real HTTPS providers each reused connection
+also skips a TLS handshake and a network round trip or two.
+
+Usage:
+    python -m benchmarks.http_pool_benchmark [--calls 500] [--delay-ms 0]
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from api.http_client import ProviderClient
+
+PAYLOAD = json.dumps({'data': [{'id': 1, 'common_name': 'Snake Plant'}]}).encode('utf-8')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers every GET with a small JSON body over a keep-alive connection."""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without TCP_NODELAY the
+    # second write waits on a delayed ACK and every reused call takes ~40ms
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up mid-response; that is expected here
+        pass
+
+
+def start_stub(delay=0.0):
+    """Start the stub server on a free port in a daemon thread."""
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.delay = delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def time_calls(call, calls):
+    """Return per-call latencies in milliseconds."""
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        response = call(i)
+        response.raise_for_status()
+        response.json()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def run(calls, delay_ms):
+    server = start_stub(delay_ms / 1000)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    results = []
+
+    server.connections = 0
+    latencies = time_calls(
+        lambda i: requests.get(f"{base_url}/species-list", params={'page': i}), calls)
+    results.append(('requests.get', latencies, server.connections))
+
+    server.connections = 0
+    client = ProviderClient('stub', base_url)
+    latencies = time_calls(lambda i: client.get('/species-list', params={'page': i}), calls)
+    results.append(('ProviderClient', latencies, server.connections))
+    client.close()
+
+    server.shutdown()
+
+    print(f"{calls} sequential GETs against a local stub (server delay {delay_ms} ms)")
+    print(f"{'client':<16}{'connections':>12}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'total s':>10}")
+    for name, latencies, connections in results:
+        ordered = sorted(latencies)
+        print(f"{name:<16}{connections:>12}{statistics.mean(latencies):>10.3f}"
+              f"{statistics.median(latencies):>10.3f}"
+              f"{ordered[int(len(ordered) * 0.95) - 1]:>10.3f}"
+              f"{sum(latencies) / 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=500)
+    parser.add_argument('--delay-ms', type=float, default=0)
+    args = parser.parse_args()
+    run(args.calls, args.delay_ms)
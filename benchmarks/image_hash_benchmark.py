@@ -0,0 +1,146 @@
+"""Benchmark near-duplicate image matching: hash robustness and lookups at scale.
+
+Part one renders synthetic photos, derives the copies users actually
+re-upload (downscaled, recompressed, slightly cropped, brightened) and
+reports how many land within the match distance of their original, and
+how many unrelated photos falsely do.
+
+Part two fills a MultiIndexHash with up to 1M stored hashes and times
+Hamming-radius lookups for near-duplicate queries (stored hashes with a
+few bits flipped) and for new photos (random hashes), against a linear
+scan for reference. Stored hashes are uniformly random, which spreads
+them evenly over the substring tables; real photo hashes cluster
+somewhat, so expect more candidates per lookup in production.
+
+Usage:
+    python -m benchmarks.image_hash_benchmark [--sizes 10000 100000 1000000]
+                                              [--queries 2000] [--photos 50]
+"""
+
+import argparse
+import io
+import random
+import statistics
+import time
+
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter
+
+from image_hash import MATCH_DISTANCE, MultiIndexHash, dhash, hamming
+
+
+def make_photo(rng, size=(1024, 768)):
+    """Return a smooth, photo-like image of random overlapping shapes."""
+    image = Image.new('RGB', size, tuple(rng.randint(0, 255) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randint(0, size[0]), rng.randint(0, size[1])
+        radius = rng.randint(60, 300)
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius),
+                     fill=tuple(rng.randint(0, 255) for _ in range(3)))
+    return image.filter(ImageFilter.GaussianBlur(8))
+
+
+def reencode(image, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=quality)
+    buffer.seek(0)
+    return Image.open(buffer)
+
+
+def variants(image):
+    """Return the kinds of copy a user re-uploads, by name."""
+    width, height = image.size
+    return {
+        'downscaled': image.resize((width // 3, height // 3), Image.LANCZOS),
+        'recompressed': reencode(image, 55),
+        'cropped 3%': image.crop((width * 3 // 100, height * 3 // 100, width, height)),
+        'brightened': ImageEnhance.Brightness(image).enhance(1.15),
+        'all of these': reencode(ImageEnhance.Brightness(
+            image.crop((width // 50, height // 50, width, height))
+            .resize((width // 2, height // 2), Image.LANCZOS)).enhance(1.1), 60),
+    }
+
+
+def run_robustness(photos, radius):
+    rng = random.Random(7)
+    originals = [dhash(make_photo(rng)) for _ in range(photos)]
+    rng = random.Random(7)
+    distances = {}
+    for original in originals:
+        for name, copy in variants(make_photo(rng)).items():
+            distances.setdefault(name, []).append(hamming(original, dhash(copy)))
+
+    print(f"Hash robustness over {photos} synthetic photos (match distance {radius} bits)")
+    print(f"{'copy':<16}{'matched':>10}{'mean bits':>12}{'max bits':>10}")
+    for name, values in distances.items():
+        matched = sum(1 for distance in values if distance <= radius) / len(values)
+        print(f"{name:<16}{matched:>10.1%}{statistics.mean(values):>12.1f}{max(values):>10}")
+
+    unrelated = [hamming(a, b) for i, a in enumerate(originals) for b in originals[i + 1:]]
+    false_matches = sum(1 for distance in unrelated if distance <= radius) / len(unrelated)
+    print(f"{'unrelated pairs':<16}{false_matches:>10.1%}{statistics.mean(unrelated):>12.1f}"
+          f"{min(unrelated):>10} (min)")
+    print()
+
+
+def flip_bits(rng, value, count):
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+
+def time_lookups(index, queries, radius):
+    latencies, hits = [], 0
+    for query in queries:
+        start = time.perf_counter()
+        matches = index.search(query, radius)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        hits += bool(matches)
+    return latencies, hits / len(queries)
+
+
+def run_scale(sizes, query_count, radius):
+    print(f"Hamming-radius lookups (radius {radius} bits, {query_count} queries of each kind)")
+    print(f"{'stored':>10}{'build s':>10}{'query':>14}{'hit rate':>10}"
+          f"{'mean us':>10}{'p95 us':>10}{'scan us':>12}")
+    for size in sizes:
+        rng = random.Random(size)
+        stored = [rng.getrandbits(64) for _ in range(size)]
+
+        start = time.perf_counter()
+        index = MultiIndexHash()
+        for position, value in enumerate(stored):
+            index.add(value, position)
+        build_seconds = time.perf_counter() - start
+
+        # A linear scan is what the lookup would cost without the index
+        scan_queries = [rng.getrandbits(64) for _ in range(5)]
+        start = time.perf_counter()
+        for query in scan_queries:
+            [value for value in stored if hamming(query, value) <= radius]
+        scan_us = (time.perf_counter() - start) / len(scan_queries) * 1e6
+
+        near = [flip_bits(rng, rng.choice(stored), rng.randint(0, radius)) for _ in range(query_count)]
+        new = [rng.getrandbits(64) for _ in range(query_count)]
+        for name, queries in (('near-dup', near), ('new photo', new)):
+            latencies, hit_rate = time_lookups(index, queries, radius)
+            ordered = sorted(latencies)
+            print(f"{size:>10}{build_seconds:>10.1f}{name:>14}{hit_rate:>10.1%}"
+                  f"{statistics.mean(latencies):>10.1f}{ordered[int(len(ordered) * 0.95) - 1]:>10.1f}"
+                  f"{scan_us:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--photos', type=int, default=50)
+    parser.add_argument('--radius', type=int, default=MATCH_DISTANCE)
+    args = parser.parse_args()
+
+    run_robustness(args.photos, args.radius)
+    run_scale(args.sizes, args.queries, args.radius)
+
+
+if __name__ == "__main__":
+    main()
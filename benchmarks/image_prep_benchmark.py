@@ -0,0 +1,138 @@
+"""Benchmark Plant.id uploads with and without image preparation.
+
+Renders a phone-sized photo (12MP, fine grain, saved at JPEG quality 95
+like a phone camera does) and sends it to a local Plant.id stub through
+PlantDotIDAPI, first as the original upload and then prepared by
+api.image_prep. The stub reads the request body at a simulated uplink
+bandwidth, so the output shows what the smaller payload saves end to
+end: JSON body size, preparation time, total request latency and the
+peak Python heap used to build the request.
+
+Usage:
+    python -m benchmarks.image_prep_benchmark [--uplink-mbps 20] [--calls 5]
+                                              [--max-edge 1500] [--quality 85]
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler
+
+from PIL import Image
+
+from api.circuit_breaker import CircuitBreaker
+from api.http_client import ProviderClient
+from api.image_prep import prepare_image
+from api.plant_id import PlantDotIDAPI
+from benchmarks.http_pool_benchmark import StubServer
+from benchmarks.image_hash_benchmark import make_photo
+
+RESPONSE = json.dumps({'suggestions': [{
+    'plant_name': "Monstera deliciosa", 'probability': 0.97,
+    'plant_details': {'common_names': ["Swiss cheese plant"], 'taxonomy': {'family': "Araceae"}}
+}]}).encode('utf-8')
+
+
+class UploadHandler(BaseHTTPRequestHandler):
+    """Reads a POST body at the server's simulated bandwidth and answers with a fixed result."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        start = time.perf_counter()
+        self.rfile.read(length)
+        self.server.received.append(length)
+        remaining = length / self.server.bytes_per_second - (time.perf_counter() - start)
+        if remaining > 0:
+            time.sleep(remaining)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_phone_photo(size=(4032, 3024)):
+    """Return JPEG bytes resembling a 12MP phone photo."""
+    photo = make_photo(random.Random(11), size)
+    grain = Image.effect_noise(size, 24).convert('RGB')
+    photo = Image.blend(photo, grain, 0.12)
+    buffer = io.BytesIO()
+    photo.save(buffer, 'JPEG', quality=95)
+    return buffer.getvalue()
+
+
+def time_uploads(api, image_data, calls):
+    """Return per-call latencies in milliseconds and the peak heap of the last call."""
+    latencies = []
+    for _ in range(calls):
+        tracemalloc.start()
+        start = time.perf_counter()
+        result, _ = api.identify_and_map(image_data)
+        latencies.append((time.perf_counter() - start) * 1000)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        if result is None:
+            raise RuntimeError("Upload to the stub failed")
+    return latencies, peak
+
+
+def run(uplink_mbps, calls, max_edge, quality):
+    server = StubServer(('127.0.0.1', 0), UploadHandler)
+    server.bytes_per_second = uplink_mbps * 1e6 / 8
+    server.received = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    api = PlantDotIDAPI(api_key='benchmark', cache=False)
+    api.client = ProviderClient('plant_id_benchmark', f"http://127.0.0.1:{server.server_address[1]}",
+                                limiter=False, breaker=CircuitBreaker('plant_id_benchmark'),
+                                cache=False, timeout=(3.05, 300))
+
+    image_data = make_phone_photo()
+    os.environ['PLANT_ID_MAX_EDGE'] = str(max_edge)
+    os.environ['PLANT_ID_IMAGE_QUALITY'] = str(quality)
+
+    results = []
+    for name, disabled in (('original', '1'), ('prepared', '0')):
+        os.environ['PLANT_ID_IMAGE_PREP_DISABLED'] = disabled
+        prep_times = []
+        for _ in range(calls):
+            start = time.perf_counter()
+            prepare_image(image_data)
+            prep_times.append((time.perf_counter() - start) * 1000)
+        prep_ms = statistics.mean(prep_times) if disabled == '0' else 0.0
+        server.received.clear()
+        latencies, peak = time_uploads(api, image_data, calls)
+        results.append((name, server.received[-1], prep_ms, latencies, peak))
+    del os.environ['PLANT_ID_IMAGE_PREP_DISABLED']
+
+    api.client.close()
+    server.shutdown()
+
+    print(f"Plant.id upload of a {len(image_data) / 1e6:.1f} MB 4032x3024 JPEG "
+          f"at {uplink_mbps} Mbit/s uplink (max edge {max_edge}, quality {quality}, {calls} calls)")
+    print(f"{'upload':<10}{'body MB':>10}{'prep ms':>10}{'mean ms':>10}{'p50 ms':>10}{'heap MB':>10}")
+    for name, body, prep_ms, latencies, peak in results:
+        print(f"{name:<10}{body / 1e6:>10.2f}{prep_ms:>10.0f}{statistics.mean(latencies):>10.0f}"
+              f"{statistics.median(latencies):>10.0f}{peak / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--uplink-mbps', type=float, default=20)
+    parser.add_argument('--calls', type=int, default=5)
+    parser.add_argument('--max-edge', type=int, default=1500)
+    parser.add_argument('--quality', type=int, default=85)
+    args = parser.parse_args()
+    run(args.uplink_mbps, args.calls, args.max_edge, args.quality)
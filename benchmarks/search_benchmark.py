@@ -0,0 +1,122 @@
+"""Benchmark plant name search latency at 10k/100k/1M catalog rows.
+
+Compares the old unranked ILIKE scan with the trigram-indexed, similarity
+ranked crud.search_plants. The old plan is reproduced by disabling index
+scans for the transaction, which is what a leading-wildcard ILIKE got
+before the GIN indexes existed.
+
+Usage:
+    python -m benchmarks.search_benchmark [--db postgresql:///rootly_bench]
+                                          [--sizes 10000 100000 1000000]
+
+The target database is dropped and recreated table by table, so never
+point this at a real Rootly database.
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from flask import Flask
+from sqlalchemy import insert, text
+
+from model import db, connect_to_db, Plant
+import crud
+
+SYLLABLES = ['ae', 'an', 'ar', 'bo', 'ca', 'da', 'el', 'fi', 'go', 'hy', 'is',
+             'ka', 'la', 'lo', 'ma', 'mo', 'ne', 'or', 'pa', 'ra', 'ro', 'sa',
+             'si', 'ta', 'ti', 'um', 'us', 've', 'xa', 'zi']
+QUERIES = ['rosa', 'monstera', 'fern', 'ficus', 'lily', 'cactus', 'palm',
+           'ivy', 'sansevieria', 'aloe']
+BATCH_SIZE = 10000
+
+
+def make_name(rng, words):
+    """Return a pseudo-Latin name made of random syllables."""
+    return ' '.join(
+        ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        for _ in range(words)
+    )
+
+
+def populate(size, seed=42):
+    """Replace the plants table with `size` synthetic rows."""
+    rng = random.Random(seed)
+    db.drop_all()
+    db.create_all()
+
+    rows = []
+    for i in range(size):
+        scientific_name = f"{make_name(rng, 2).capitalize()} {i}"
+        common_name = make_name(rng, 2).title()
+        # Sprinkle in the real query terms so every query has some hits
+        if i % 500 == 0:
+            common_name = f"{rng.choice(QUERIES).title()} {common_name}"
+        rows.append({'scientific_name': scientific_name,
+                     'common_name': common_name,
+                     'data_sources': ['benchmark']})
+        if len(rows) >= BATCH_SIZE:
+            db.session.execute(insert(Plant), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(Plant), rows)
+    db.session.commit()
+    db.session.execute(text("ANALYZE plants"))
+    db.session.commit()
+
+
+def legacy_search(query, limit=100):
+    """The pre-index search: unranked ILIKE over a sequential scan."""
+    db.session.execute(text("SET LOCAL enable_indexscan = off"))
+    db.session.execute(text("SET LOCAL enable_bitmapscan = off"))
+    search_term = f"%{query}%"
+    results = Plant.query.filter(
+        (Plant.scientific_name.ilike(search_term)) |
+        (Plant.common_name.ilike(search_term))
+    ).limit(limit).all()
+    db.session.rollback()
+    return results
+
+
+def time_search(search_fn, repeats):
+    """Return per-call latencies in milliseconds."""
+    timings = []
+    for _ in range(repeats):
+        for query in QUERIES:
+            start = time.perf_counter()
+            search_fn(query)
+            timings.append((time.perf_counter() - start) * 1000)
+            db.session.rollback()
+    return timings
+
+
+def summarize(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"  {label:<10} p50={statistics.median(timings):8.2f}ms  "
+          f"p95={p95:8.2f}ms  max={timings[-1]:8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='postgresql:///rootly_bench')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10000, 100000, 1000000])
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    connect_to_db(app, args.db, echo=False)
+
+    with app.app_context():
+        for size in args.sizes:
+            print(f"Populating {size} plants...")
+            populate(size)
+            print(f"Search latency at {size} rows:")
+            summarize('ilike', time_search(legacy_search, args.repeats))
+            summarize('trigram', time_search(crud.search_plants, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
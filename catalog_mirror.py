@@ -0,0 +1,267 @@
+"""Local mirror of the Perenual species list.
+
+The browse page reads species from the perenual_species table instead of
+calling Perenual on every view. A background worker refreshes the mirror
+page by page, upserting rows so browsing keeps working during a sync,
+and each run is recorded in catalog_sync_runs for the freshness metric.
+The daily Perenual quota covers only part of the catalog, so a run that
+stops early records where it got to and the next run resumes there; a
+pass over the whole catalog may take several runs.
+
+Manual resync:
+    python catalog_mirror.py [--max-pages N]
+"""
+
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from api.rate_limit import batch_priority
+from model import db, upgrade_schema, PerenualSpecies, CatalogSyncRun
+
+logger = logging.getLogger(__name__)
+
+SYNC_INTERVAL = int(os.environ.get('CATALOG_SYNC_INTERVAL', 24 * 60 * 60))  # seconds
+PAGE_SIZE = 30
+
+# A run still marked running after this long is assumed to have died
+STALE_RUN_AFTER = timedelta(hours=1)
+
+# An unfinished pass older than this starts over, e.g. if the catalog shrank under it
+MAX_PASS_AGE = timedelta(days=7)
+
+_UPDATED_COLUMNS = ('common_name', 'scientific_name', 'other_names', 'family',
+                    'genus', 'image_url', 'synced_at')
+
+
+def map_species(species_data, synced_at):
+    """Map a Perenual species-list entry to a perenual_species row."""
+    scientific_names = species_data.get('scientific_name') or []
+    default_image = species_data.get('default_image') or {}
+    return {
+        'perenual_id': species_data['id'],
+        'common_name': (species_data.get('common_name') or 'Unknown')[:255],
+        'scientific_name': scientific_names[0][:255] if scientific_names else None,
+        'other_names': [name[:255] for name in species_data.get('other_name') or [] if name],
+        'family': species_data.get('family'),
+        'genus': species_data.get('genus'),
+        'image_url': default_image.get('small_url'),
+        'synced_at': synced_at
+    }
+
+
+def prune_species(before):
+    """Delete mirror rows not seen since `before`. Does not commit."""
+    PerenualSpecies.query.filter(PerenualSpecies.synced_at < before).delete()
+
+
+def resume_point(now=None):
+    """Return (page, pass_started_at) of an unfinished pass, or (1, None) to start afresh."""
+    now = now or datetime.utcnow()
+    previous = (CatalogSyncRun.query
+                .filter(CatalogSyncRun.status != 'running')
+                .order_by(CatalogSyncRun.started_at.desc())
+                .first())
+    if (previous and previous.next_page and previous.pass_started_at
+            and now - previous.pass_started_at < MAX_PASS_AGE):
+        return previous.next_page, previous.pass_started_at
+    return 1, None
+
+
+def upsert_species(rows):
+    """Insert or update mirror rows. Does not commit."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        statement = pg_insert(PerenualSpecies).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[PerenualSpecies.perenual_id],
+            set_={column: statement.excluded[column] for column in _UPDATED_COLUMNS}
+        )
+        db.session.execute(statement)
+    else:
+        for row in rows:
+            db.session.merge(PerenualSpecies(**row))
+
+
+@batch_priority()
+def sync_catalog(max_pages=None, page_size=PAGE_SIZE):
+    """Refresh the mirror from the Perenual species list (needs an app context).
+
+    Each page is committed as it arrives. A run resumes the pass left
+    unfinished by the previous run, if any. Species that disappeared
+    upstream are only removed once a pass has covered every page, so a
+    failed or partial sync never empties the browse page. Pages are
+    fetched at batch priority, waiting on the shared rate limiter. Pages
+    cached by the previous run are revalidated, so unchanged ones come
+    back as cheap 304s.
+
+    Returns:
+        The finished CatalogSyncRun
+    """
+    from api.perenual import get_plant_list
+
+    page, pass_started_at = resume_point()
+    run = CatalogSyncRun(started_at=datetime.utcnow(), status='running', pages=0, species=0,
+                         start_page=page, next_page=page)
+    run.pass_started_at = pass_started_at or run.started_at
+    db.session.add(run)
+    db.session.commit()
+    logger.info(f"Starting catalog sync run {run.run_id} at page {page}")
+
+    last_page = None
+    try:
+        while True:
+            response = get_plant_list(page=page, size=page_size, revalidate=True)
+            rows = [map_species(species_data, run.started_at)
+                    for species_data in response.get('data', []) if species_data.get('id')]
+            if not rows:
+                break
+
+            upsert_species(rows)
+            run.pages += 1
+            run.species += len(rows)
+            run.next_page = page + 1
+            db.session.commit()
+
+            last_page = response.get('last_page') or page
+            if page >= last_page or (max_pages and run.pages >= max_pages):
+                break
+            page += 1
+    except Exception as e:
+        logger.error(f"Catalog sync run {run.run_id} failed on page {page}: {str(e)}")
+        db.session.rollback()
+        run.error = str(e)
+
+    # Complete only if the last page itself was synced, not merely reached
+    complete = last_page is not None and run.next_page > last_page and not run.error
+    if run.species == 0:
+        run.status = 'failed'
+        run.error = run.error or 'Perenual returned no species'
+    elif complete:
+        # Every page of the pass was synced at or after its start
+        prune_species(run.pass_started_at)
+        run.next_page = None
+        run.status = 'succeeded'
+    else:
+        run.status = 'partial'
+
+    run.finished_at = datetime.utcnow()
+    db.session.commit()
+    logger.info(f"Catalog sync run {run.run_id} {run.status}: "
+                f"{run.species} species from {run.pages} pages")
+    return run
+
+
+def catalog_status(now=None):
+    """Return mirror size and freshness for monitoring.
+
+    lag_seconds is the time since the last complete sync finished, or None
+    if the mirror has never been fully synced.
+    """
+    now = now or datetime.utcnow()
+    last_success = (CatalogSyncRun.query
+                    .filter_by(status='succeeded')
+                    .order_by(CatalogSyncRun.finished_at.desc())
+                    .first())
+    last_run = CatalogSyncRun.query.order_by(CatalogSyncRun.started_at.desc()).first()
+    lag_seconds = (now - last_success.finished_at).total_seconds() if last_success else None
+
+    return {
+        'species': db.session.query(func.count(PerenualSpecies.perenual_id)).scalar(),
+        'last_synced_at': last_success.finished_at.isoformat() if last_success else None,
+        'lag_seconds': lag_seconds,
+        'stale': lag_seconds is None or lag_seconds > 2 * SYNC_INTERVAL,
+        'last_run': {
+            'status': last_run.status,
+            'started_at': last_run.started_at.isoformat(),
+            'finished_at': last_run.finished_at.isoformat() if last_run.finished_at else None,
+            'pages': last_run.pages,
+            'species': last_run.species,
+            'start_page': last_run.start_page,
+            'next_page': last_run.next_page,
+            'error': last_run.error
+        } if last_run else None
+    }
+
+
+def sync_due(interval=SYNC_INTERVAL, now=None):
+    """Return seconds until the next sync is due (0 if due now)."""
+    now = now or datetime.utcnow()
+    running = (CatalogSyncRun.query
+               .filter_by(status='running')
+               .filter(CatalogSyncRun.started_at > now - STALE_RUN_AFTER)
+               .first())
+    if running:
+        # Another process is syncing; check again once it should be done
+        return STALE_RUN_AFTER.total_seconds()
+
+    last_run = (CatalogSyncRun.query
+                .filter(CatalogSyncRun.status != 'running')
+                .order_by(CatalogSyncRun.started_at.desc())
+                .first())
+    if last_run and last_run.next_page:
+        # Mid-pass: resume once the provider's daily quota has had time to reset
+        return max(0, interval - (now - last_run.started_at).total_seconds())
+
+    lag_seconds = catalog_status(now)['lag_seconds']
+    if lag_seconds is None:
+        return 0
+    return max(0, interval - lag_seconds)
+
+
+class CatalogSyncWorker(threading.Thread):
+    """Background thread that keeps the catalog mirror fresh."""
+
+    def __init__(self, app, interval=SYNC_INTERVAL):
+        super().__init__(name='catalog-sync', daemon=True)
+        self.app = app
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            wait = self.interval
+            try:
+                with self.app.app_context():
+                    wait = sync_due(self.interval)
+                    if wait == 0:
+                        sync_catalog()
+                        wait = self.interval
+            except Exception as e:
+                logger.error(f"Catalog sync worker error: {str(e)}")
+            self._stopped.wait(max(wait, 60))
+
+    def stop(self):
+        self._stopped.set()
+
+
+def start_catalog_sync(app, interval=SYNC_INTERVAL):
+    """Start the background sync worker if a Perenual API key is configured."""
+    if not os.environ.get('PERENUAL_API_KEY'):
+        logger.info("PERENUAL_API_KEY not set; catalog mirror will not be refreshed")
+        return None
+    worker = CatalogSyncWorker(app, interval)
+    worker.start()
+    return worker
+
+
+if __name__ == "__main__":
+    """Resync the catalog mirror now."""
+
+    import argparse
+
+    from server import app
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--max-pages', type=int, default=None,
+                        help='stop after this many pages (the run is recorded as partial)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        upgrade_schema()
+        run = sync_catalog(max_pages=args.max_pages)
+        print(f"Catalog sync {run.status}: {run.species} species from {run.pages} pages")
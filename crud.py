@@ -2,9 +2,15 @@
 
 from model import db, connect_to_db
 from model import User, Plant, PlantCareDetails, UserPlant, CareEvent, Reminder
-from model import HealthAssessment, IdentificationHistory, PlantHealthIssue
-from model import UserFavorite, Region, PlantRegionCare, RelatedPlant
+from model import HealthAssessment, IdentificationHistory, PlantHealthIssue, PlantName
+from model import UserFavorite, Region, PlantRegionCare, RelatedPlant, PerenualSpecies
+from autocomplete import normalize_name
+from facets import plant_facets, bitmap_ids, first_ids
+from pagination import decode_cursor, make_page
+import search_vectors
 from datetime import datetime, date, timedelta
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import joinedload
 import os
 
 # ----------------------------------------
@@ -73,7 +79,8 @@ def delete_user(user_id):
 def create_plant(scientific_name, common_name=None, plant_type=None, image_url=None, 
                 origin=None, description=None, poisonous_to_humans=False, 
                 poisonous_to_pets=False, invasive=False, rare=False, 
-                tropical=False, indoor=False, outdoor=False, data_sources=None):
+                tropical=False, indoor=False, outdoor=False, data_sources=None,
+                gbif_id=None):
     """Create and return a new plant."""
     
     plant = Plant(
@@ -91,6 +98,7 @@ def create_plant(scientific_name, common_name=None, plant_type=None, image_url=N
         indoor=indoor,
         outdoor=outdoor,
         data_sources=data_sources or [],
+        gbif_id=gbif_id,
         last_updated=datetime.utcnow()
     )
     
@@ -103,6 +111,18 @@ def get_plants():
     """Return all plants."""
     return Plant.query.all()
 
+def get_plants_page(cursor=None, per_page=20):
+    """Return (plants, next_cursor) ordered by scientific name, then ID."""
+    query = Plant.query
+    
+    after = decode_cursor(cursor, 2, (str, int), source='plants')
+    if after:
+        query = query.filter(tuple_(Plant.scientific_name, Plant.plant_id) > tuple_(*after))
+    
+    plants = query.order_by(Plant.scientific_name, Plant.plant_id).limit(per_page + 1).all()
+    return make_page(plants, per_page, lambda plant: (plant.scientific_name, plant.plant_id),
+                     source='plants')
+
 def get_plant_by_id(plant_id):
     """Return a plant by ID."""
     return Plant.query.get(plant_id)
@@ -111,40 +131,154 @@ def get_plant_by_scientific_name(scientific_name):
     """Return a plant by scientific name."""
     return Plant.query.filter(Plant.scientific_name == scientific_name).first()
 
-def search_plants(query, limit=100):
-    """Search for plants by name."""
+def search_plants(query, limit=100, with_care_details=False):
+    """Search for plants by scientific, common or alternate name, best matches first.
+    
+    Alternate vernacular names live in plant_names and are matched in the
+    same query. On PostgreSQL the name filters are served by the pg_trgm
+    GIN indexes and results are ranked by trigram similarity. Other engines
+    fall back to a plain, unranked ILIKE. Pass with_care_details=True to
+    load each plant's care details in the same query.
+    """
     search_term = f"%{query}%"
-    query_obj = Plant.query.filter(
+    name_filter = (
         (Plant.scientific_name.ilike(search_term)) | 
         (Plant.common_name.ilike(search_term))
     )
+    key = normalize_name(query)
+    alternate_filter = PlantName.normalized_name.contains(key, autoescape=True)
+    
+    if db.session.get_bind().dialect.name == 'postgresql':
+        if len(key) < 3:
+            # Too short for trigrams; use the prefix index instead
+            alternate_filter = PlantName.normalized_name.startswith(key, autoescape=True)
+        else:
+            alternate_filter = alternate_filter | PlantName.normalized_name.op('%')(key)
+        alternate_names = (db.session.query(
+                PlantName.plant_id,
+                func.max(func.similarity(PlantName.normalized_name, key)).label('score'))
+            .filter(alternate_filter)
+            .group_by(PlantName.plant_id)
+            .subquery())
+        
+        # greatest() skips NULLs, so plants without a common name still rank
+        score = func.greatest(
+            func.similarity(Plant.scientific_name, query),
+            func.similarity(Plant.common_name, query),
+            alternate_names.c.score
+        )
+        query_obj = Plant.query.outerjoin(
+            alternate_names, alternate_names.c.plant_id == Plant.plant_id
+        ).filter(
+            name_filter |
+            Plant.scientific_name.op('%')(query) |
+            Plant.common_name.op('%')(query) |
+            alternate_names.c.plant_id.isnot(None)
+        ).order_by(score.desc(), Plant.plant_id)
+    else:
+        alternate_ids = db.session.query(PlantName.plant_id).filter(alternate_filter)
+        query_obj = Plant.query.filter(name_filter | Plant.plant_id.in_(alternate_ids))
+    
+    if with_care_details:
+        query_obj = query_obj.options(joinedload(Plant.care_details))
     
     if limit:
         query_obj = query_obj.limit(limit)
     
     return query_obj.all()
 
-def filter_plants(plant_type=None, indoor=None, outdoor=None, poisonous=None, tropical=None):
-    """Filter plants by various attributes."""
-    query = Plant.query
+def add_plant_names(plant, names, source, language='en'):
+    """Attach vernacular names to a plant, skipping names it already has.
+    
+    Does not commit; the names join the caller's transaction.
+    
+    Returns:
+        List of the PlantName rows added
+    """
+    known = {(plant_name.normalized_name, plant_name.language) for plant_name in plant.names}
+    known.add((normalize_name(plant.common_name), language))
+    added = []
+    for name in names or []:
+        name = ' '.join((name or '').split())[:255]
+        normalized_name = normalize_name(name)
+        if not normalized_name or (normalized_name, language) in known:
+            continue
+        known.add((normalized_name, language))
+        plant_name = PlantName(name=name, normalized_name=normalized_name,
+                               language=language, source=source)
+        plant.names.append(plant_name)
+        added.append(plant_name)
+    return added
+
+def full_text_search_plants(query, limit=50, with_care_details=False):
+    """Search plant descriptions, care details and health issues.
+    
+    Results are ranked so that name matches come before care and health
+    matches, which come before description matches. Full-text search
+    needs PostgreSQL; other engines get an empty list.
+    """
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return []
+    
+    ts_query = func.websearch_to_tsquery(search_vectors.TEXT_SEARCH_CONFIG, query)
+    query_obj = Plant.query.filter(
+        Plant.search_vector.op('@@')(ts_query)
+    ).order_by(func.ts_rank(Plant.search_vector, ts_query).desc(), Plant.plant_id)
+    
+    if with_care_details:
+        query_obj = query_obj.options(joinedload(Plant.care_details))
+    
+    if limit:
+        query_obj = query_obj.limit(limit)
     
-    if plant_type:
-        query = query.filter(Plant.plant_type == plant_type)
+    return query_obj.all()
+
+def filter_plants(plant_type=None, indoor=None, outdoor=None, poisonous=None, tropical=None,
+                  limit=None):
+    """Filter plants by various attributes.
     
-    if indoor is not None:
-        query = query.filter(Plant.indoor == indoor)
+    Matching ids come from the in-memory facet bitmaps, so only the
+    matching rows are loaded from the database.
+    """
+    plant_facets.ensure_built()
+    plant_ids = bitmap_ids(plant_facets.filter(
+        plant_type=plant_type,
+        indoor=indoor,
+        outdoor=outdoor,
+        poisonous=poisonous,
+        tropical=tropical
+    ), limit=limit or None)
     
-    if outdoor is not None:
-        query = query.filter(Plant.outdoor == outdoor)
+    return get_plants_by_ids(plant_ids)
+
+def get_faceted_plants_page(bitmap, cursor=None, per_page=20):
+    """Return (plants, next_cursor) for a facet selection, ordered by ID."""
+    after = decode_cursor(cursor, 1, (int,))
+    plant_ids = first_ids(bitmap, per_page + 1, after=after[0] if after else None)
+    return make_page(get_plants_by_ids(plant_ids), per_page, lambda plant: (plant.plant_id,))
+
+def get_catalog_page(cursor=None, per_page=20):
+    """Return (species, next_cursor) from the Perenual mirror, ordered by common name."""
+    query = PerenualSpecies.query
     
-    if poisonous is not None:
-        query = query.filter((Plant.poisonous_to_humans == poisonous) | 
-                            (Plant.poisonous_to_pets == poisonous))
+    after = decode_cursor(cursor, 2, (str, int), source='catalog')
+    if after:
+        query = query.filter(
+            tuple_(PerenualSpecies.common_name, PerenualSpecies.perenual_id) > tuple_(*after))
     
-    if tropical is not None:
-        query = query.filter(Plant.tropical == tropical)
+    species = (query.order_by(PerenualSpecies.common_name, PerenualSpecies.perenual_id)
+               .limit(per_page + 1).all())
+    return make_page(species, per_page,
+                     lambda species: (species.common_name, species.perenual_id), source='catalog')
+
+def get_plants_by_ids(plant_ids):
+    """Return plants for a list of IDs, in the same order."""
+    if not plant_ids:
+        return []
     
-    return query.all()
+    plants = {plant.plant_id: plant
+              for plant in Plant.query.filter(Plant.plant_id.in_(plant_ids)).all()}
+    return [plants[plant_id] for plant_id in plant_ids if plant_id in plants]
 
 def update_plant(plant_id, **kwargs):
     """Update plant details."""
@@ -254,6 +388,17 @@ def get_user_plants(user_id):
     """Return all plants for a specific user."""
     return UserPlant.query.filter(UserPlant.user_id == user_id).all()
 
+def get_user_plants_page(user_id, cursor=None, per_page=24):
+    """Return (user_plants, next_cursor) for a user's collection, oldest first."""
+    query = UserPlant.query.options(joinedload(UserPlant.plant)).filter(UserPlant.user_id == user_id)
+    
+    after = decode_cursor(cursor, 1, (int,))
+    if after:
+        query = query.filter(UserPlant.user_plant_id > after[0])
+    
+    user_plants = query.order_by(UserPlant.user_plant_id).limit(per_page + 1).all()
+    return make_page(user_plants, per_page, lambda user_plant: (user_plant.user_plant_id,))
+
 def get_user_plant_by_id(user_plant_id):
     """Return a specific user plant by ID."""
     return UserPlant.query.get(user_plant_id)
@@ -409,13 +554,15 @@ def update_health_assessment(assessment_id, **kwargs):
 # ----------------------------------------
 
 def create_identification(user_id, image_url, identified_plant_id, 
-                         confidence_score, user_plant_id=None, added_to_collection=False):
+                         confidence_score, user_plant_id=None, added_to_collection=False,
+                         image_hash=None):
     """Create and return an identification record."""
     
     identification = IdentificationHistory(
         user_id=user_id,
         user_plant_id=user_plant_id,
         image_url=image_url,
+        image_hash=image_hash,
         identified_plant_id=identified_plant_id,
         confidence_score=confidence_score,
         identified_at=datetime.utcnow(),
@@ -427,6 +574,63 @@ def create_identification(user_id, image_url, identified_plant_id,
     
     return identification
 
+def create_identification_with_assessment(user_id, image_url, identified_plant_id,
+                                          confidence_score, symptoms, diagnosis,
+                                          treatment_recommendations, user_plant_id=None,
+                                          image_hash=None, api_result=None):
+    """Create an identification and a health assessment of the same photo in one transaction.
+    
+    Without a user_plant_id the identified plant is added to the user's
+    collection first, since an assessment belongs to a user plant. The
+    assessment only keeps the image hash alongside a Plant.id api_result,
+    so a failed health check is never reused for a near-duplicate photo.
+    
+    Returns:
+        Tuple of (identification, health_assessment)
+    """
+    
+    try:
+        if user_plant_id is None:
+            user_plant = UserPlant(
+                user_id=user_id,
+                plant_id=identified_plant_id,
+                acquisition_date=date.today(),
+                image_url=image_url,
+                status='active'
+            )
+            db.session.add(user_plant)
+            db.session.flush()
+            user_plant_id = user_plant.user_plant_id
+        
+        identification = IdentificationHistory(
+            user_id=user_id,
+            user_plant_id=user_plant_id,
+            image_url=image_url,
+            image_hash=image_hash,
+            identified_plant_id=identified_plant_id,
+            confidence_score=confidence_score,
+            identified_at=datetime.utcnow(),
+            added_to_collection=True
+        )
+        health_assessment = HealthAssessment(
+            user_plant_id=user_plant_id,
+            assessment_date=datetime.utcnow(),
+            symptoms=symptoms,
+            diagnosis=diagnosis,
+            treatment_recommendations=treatment_recommendations,
+            image_url=image_url,
+            api_result=api_result,
+            image_hash=image_hash if api_result else None,
+            resolved=False
+        )
+        db.session.add_all([identification, health_assessment])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    
+    return identification, health_assessment
+
 def get_identifications_by_user(user_id):
     """Return all identifications for a specific user."""
     return IdentificationHistory.query.filter(IdentificationHistory.user_id == user_id).order_by(IdentificationHistory.identified_at.desc()).all()
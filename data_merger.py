@@ -2,6 +2,7 @@
 
 import logging
 import crud
+from model import PlantCareDetails
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -43,17 +44,18 @@ def merge_plant_data(scientific_name, perenual_id=None, trefle_id=None):
     
     # Add Trefle data if ID is provided
     if trefle_id:
-        from api.quantitative_plant import get_trefle_plant_details, get_growth_data, map_growth_data_to_model
+        from api.quantitative_plant import get_plant_details, get_growth_data, map_growth_data_to_model
         
+        # One details call; the growth data is read from the same response
         logger.info(f"Fetching Trefle data for ID: {trefle_id}")
-        trefle_plant_data = get_trefle_plant_details(trefle_id)
+        trefle_plant_data = get_plant_details(trefle_id)
         
         if 'error' not in trefle_plant_data and 'data' in trefle_plant_data:
             # Update merged data with Trefle data
             merged_plant_data['data_sources'].append('trefle')
             
-            # Get and map growth data
-            growth_data = get_growth_data(trefle_id)
+            # Map growth data
+            growth_data = get_growth_data(trefle_id, plant_details=trefle_plant_data)
             if 'error' not in growth_data:
                 care_data = map_growth_data_to_model(growth_data)
                 
@@ -64,27 +66,39 @@ def merge_plant_data(scientific_name, perenual_id=None, trefle_id=None):
     
     return merged_plant_data, merged_care_data
 
-def find_or_create_plant(scientific_name, perenual_id=None, trefle_id=None):
+def find_or_create_plant(scientific_name, perenual_id=None, trefle_id=None, gbif_id=None):
     """
-    Find a plant by scientific name or create it by merging data from APIs.
+    Find a plant by accepted taxon or create it by merging data from APIs.
+    
+    Synonyms and author-citation variants resolve to the same GBIF taxon,
+    so they find the existing plant instead of creating a duplicate.
     
     Args:
         scientific_name: Scientific name of the plant
         perenual_id: ID of the plant in Perenual API (optional)
         trefle_id: ID of the plant in Trefle API (optional)
+        gbif_id: GBIF taxon ID reported by the identification API (optional)
     
     Returns:
         Plant model instance
     """
+    from taxonomy import find_plant
+    
     # Look for existing plant
-    existing_plant = crud.get_plant_by_scientific_name(scientific_name)
+    existing_plant, taxon = find_plant(scientific_name, gbif_id)
     
     if existing_plant:
         logger.info(f"Found existing plant: {scientific_name}")
         return existing_plant
     
+    # Store new plants under their accepted name
+    if taxon:
+        scientific_name = taxon.canonical_name
+    
     # If not found, merge data and create new plant
     plant_data, care_data = merge_plant_data(scientific_name, perenual_id, trefle_id)
+    if taxon:
+        plant_data['gbif_id'] = taxon.gbif_id
     
     # Create plant in database
     plant = crud.create_plant(**plant_data)
@@ -95,6 +109,97 @@ def find_or_create_plant(scientific_name, perenual_id=None, trefle_id=None):
         care_details = crud.create_plant_care_details(plant_id=plant.plant_id, **care_data)
         logger.info(f"Added care details for plant ID: {plant.plant_id}")
     
+    add_mirrored_names(plant, perenual_id)
+    
+    return plant
+
+def add_mirrored_names(plant, perenual_id=None):
+    """
+    Add vernacular names from the local Perenual catalog mirror to a plant.
+    
+    Args:
+        plant: Plant model instance
+        perenual_id: ID of the plant in Perenual API (optional, else matched by name)
+    """
+    from model import PerenualSpecies
+    
+    if perenual_id:
+        species = crud.db.session.get(PerenualSpecies, perenual_id)
+    else:
+        species = PerenualSpecies.query.filter_by(scientific_name=plant.scientific_name).first()
+    
+    if species:
+        names = [species.common_name] + (species.other_names or [])
+        if crud.add_plant_names(plant, names, source='perenual'):
+            crud.db.session.commit()
+
+def import_trefle_plant(trefle_id, scientific_name=None):
+    """
+    Import a plant from Trefle with its care details and vernacular names.
+    
+    Args:
+        trefle_id: ID of the plant in Trefle API
+        scientific_name: Scientific name to use if Trefle has none (optional)
+    
+    Returns:
+        Plant model instance (an existing one if the plant is already known),
+        or None if Trefle has no details for the ID
+    """
+    from api.quantitative_plant import (get_plant_details, get_growth_data,
+                                        map_growth_data_to_model, map_common_names)
+    from taxonomy import find_plant
+    
+    # Get plant details from Trefle; growth data comes from the same response
+    logger.info(f"Fetching plant details from Trefle API for ID: {trefle_id}")
+    plant_details = get_plant_details(trefle_id)
+    
+    if not plant_details or 'data' not in plant_details:
+        logger.error(f"Could not retrieve Trefle plant details for ID: {trefle_id}")
+        return None
+    
+    plant_data = plant_details['data']
+    scientific_name = plant_data.get('scientific_name') or scientific_name
+    if not scientific_name:
+        return None
+    
+    existing_plant, taxon = find_plant(scientific_name)
+    if existing_plant:
+        logger.info(f"Found existing plant: {scientific_name}")
+        return existing_plant
+    
+    plant = crud.create_plant(
+        scientific_name=scientific_name,
+        common_name=plant_data.get('common_name') or 'Unknown',
+        description=plant_data.get('family_common_name', '') or f"A plant in the {plant_data.get('family', 'plant')} family.",
+        image_url=plant_data.get('image_url') or None,
+        indoor=True,  # Default to indoor for now
+        data_sources=['trefle'],
+        gbif_id=taxon.gbif_id if taxon else None
+    )
+    logger.info(f"Created new plant: {scientific_name} (ID: {plant.plant_id})")
+    
+    for language, names in map_common_names(plant_details).items():
+        crud.add_plant_names(plant, names, source='trefle', language=language)
+    
+    # Add care details
+    try:
+        growth_data = get_growth_data(trefle_id, plant_details=plant_details)
+        if growth_data and 'error' not in growth_data:
+            care_model = map_growth_data_to_model(growth_data)
+            crud.db.session.add(PlantCareDetails(
+                plant_id=plant.plant_id,
+                watering_frequency='Weekly',  # Default
+                sunlight_requirements=care_model.get('sunlight_requirements', []),
+                soil_preferences=care_model.get('soil_preferences', 'Well-draining potting mix'),
+                temperature_range=care_model.get('temperature_range'),
+                propagation_methods=['Division', 'Cuttings'],
+                difficulty_level=care_model.get('difficulty_level', 'Moderate')
+            ))
+    except Exception as e:
+        logger.error(f"Error importing care details: {str(e)}")
+        # Continue with import even if care details fail
+    
+    crud.db.session.commit()
     return plant
 
 def update_plant_from_apis(plant_id, perenual_id=None, trefle_id=None):
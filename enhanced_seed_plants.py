@@ -1,11 +1,12 @@
 import os
 import logging
-import time
 from datetime import datetime
 from dotenv import load_dotenv
 from server import app
 from model import db, Plant, PlantCareDetails
+import crud
 from api.perenual import get_plant_list, get_plant_details
+from api.rate_limit import batch_priority
 from api.quantitative_plant import get_plant_list as get_trefle_list, get_plant_details as get_trefle_details, map_growth_data_to_model
 
 # Load environment variables
@@ -67,8 +68,14 @@ def map_trefle_plant_to_model(plant_data):
     }
 
 
+@batch_priority()
 def seed_database(per_page=30, max_plants=2000):
-    """Seed the database with plant data from multiple APIs."""
+    """Seed the database with plant data from multiple APIs.
+
+    Provider calls run at batch priority and block on the shared rate
+    limiter, so the seed goes as fast as the API limits allow while
+    leaving headroom for interactive requests.
+    """
     logger.info(f"Starting to seed database with up to {max_plants} plants...")
     
     added_count = 0
@@ -98,6 +105,7 @@ def seed_database(per_page=30, max_plants=2000):
                             
                             if not existing_plant:
                                 plant = Plant(**model_data)
+                                crud.add_plant_names(plant, plant_data.get('other_name'), source='perenual')
                                 db.session.add(plant)
                                 added_count += 1
                                 logger.info(f"Added plant: {model_data['common_name']} ({model_data['scientific_name']})")
@@ -150,13 +158,9 @@ def seed_database(per_page=30, max_plants=2000):
             
             page += 1
             
-            # Add a small delay to avoid rate limiting
-            time.sleep(0.5)
-            
         except Exception as e:
             logger.error(f"Error on page {page}: {e}")
             consecutive_errors += 1
-            time.sleep(2)  # Wait longer on errors
     
     # Final commit
     db.session.commit()
@@ -0,0 +1,242 @@
+"""In-memory bitmap index over plant flags and types for faceted filtering.
+
+Every facet value is stored as a bitmap in a Python int, with bit N set
+when the plant with plant_id N has that value. Combining facets is then a
+single & or | over ints, and counts are popcounts, so filters and live
+facet counts stay well under a millisecond regardless of how the flags
+combine. Reading ids back walks only the set bits, a 64-bit word at a
+time, and stops at the requested limit. Committed plant changes update
+the bitmaps as they happen, and each worker rebuilds them periodically
+to pick up other processes' writes (see index_sync.py).
+"""
+
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import index_sync
+from model import db, Plant
+
+FLAGS = ('indoor', 'outdoor', 'tropical', 'poisonous_to_humans',
+         'poisonous_to_pets', 'invasive', 'rare')
+
+# Browse page facets: facet name -> (flag, value), with labels for display
+FACETS = {
+    'indoor': ('indoor', True),
+    'outdoor': ('outdoor', True),
+    'tropical': ('tropical', True),
+    'pet_safe': ('poisonous_to_pets', False),
+}
+FACET_LABELS = {
+    'indoor': 'Indoor',
+    'outdoor': 'Outdoor',
+    'tropical': 'Tropical',
+    'pet_safe': 'Pet Safe',
+}
+
+# The plant attributes the index reads, captured when a change is flushed
+FacetRow = namedtuple('FacetRow', ('plant_id', 'plant_type') + FLAGS)
+
+
+# Set bits per byte value, for popcounts before int.bit_count (Python 3.10)
+_BYTE_POPCOUNTS = bytes(bin(value).count('1') for value in range(256))
+
+
+def _to_words(bitmap):
+    """Return a bitmap as 64-bit words, least significant first."""
+    data = bitmap.to_bytes((bitmap.bit_length() + 63) // 64 * 8, 'little')
+    words = memoryview(data).cast('Q')
+    if sys.byteorder != 'little':
+        words = [int.from_bytes(data[i:i + 8], 'little') for i in range(0, len(data), 8)]
+    return words
+
+
+def popcount(bitmap):
+    """Return the number of set bits in a bitmap."""
+    if hasattr(bitmap, 'bit_count'):
+        return bitmap.bit_count()
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    return sum(data.translate(_BYTE_POPCOUNTS))
+
+
+def bitmap_ids(bitmap, limit=None):
+    """Return the plant ids set in a bitmap, in ascending order, up to `limit` if given.
+
+    Set bits are found a word at a time with `word & -word`, so empty
+    stretches cost one test per 64 ids and a limit stops the walk early.
+    """
+    plant_ids = []
+    if limit is not None and limit <= 0:
+        return plant_ids
+    for index, word in enumerate(_to_words(bitmap)):
+        base = index * 64
+        while word:
+            lowest = word & -word
+            plant_ids.append(base + lowest.bit_length() - 1)
+            if len(plant_ids) == limit:
+                return plant_ids
+            word ^= lowest
+    return plant_ids
+
+
+def first_ids(bitmap, limit, after=None):
+    """Return up to `limit` plant ids set in a bitmap, above `after` if given.
+    
+    Only the set bits up to the limit are visited, so reading one page of
+    a large selection never decodes the whole bitmap.
+    """
+    if after is not None:
+        if after >= bitmap.bit_length():
+            return []
+        if after >= 0:
+            bitmap >>= after + 1
+            return [after + 1 + plant_id for plant_id in bitmap_ids(bitmap, limit)]
+    return bitmap_ids(bitmap, limit)
+
+
+class FacetIndex:
+    """Bitmaps of plant ids for each flag value and plant type."""
+
+    def __init__(self, max_age=None, clock=time.monotonic):
+        """
+        Args:
+            max_age: Seconds before ensure_built() rebuilds, defaulting to
+                index_sync.REBUILD_INTERVAL; 0 never rebuilds
+        """
+        self._clear()
+        self._lock = threading.Lock()
+        self.max_age = index_sync.REBUILD_INTERVAL if max_age is None else max_age
+        self._clock = clock
+        self.built = False
+        self.built_at = None
+
+    def _clear(self):
+        self.all = 0
+        # Separate True and False bitmaps, so NULL flags match neither,
+        # just like `column == value` in SQL
+        self._flags = {(flag, value): 0 for flag in FLAGS for value in (True, False)}
+        self._types = {}
+        self._plant_types = {}
+
+    def build(self, plants):
+        """Replace the index contents from objects or rows with plant attributes."""
+        with self._lock:
+            self._clear()
+            for plant in plants:
+                self._add_locked(plant)
+            self.built = True
+            self.built_at = self._clock()
+
+    def build_from_db(self):
+        """Build the index from the plants table (needs an app context)."""
+        columns = [Plant.plant_id, Plant.plant_type] + [getattr(Plant, flag) for flag in FLAGS]
+        self.build(db.session.query(*columns).all())
+
+    def ensure_built(self):
+        """Build the index from the database if it is unbuilt or older than max_age."""
+        if not self.built or (self.max_age and self._clock() - self.built_at > self.max_age):
+            self.build_from_db()
+
+    def apply_changes(self, changes):
+        """Apply committed changes: {plant_id: FacetRow, or None if deleted}."""
+        # An unbuilt index loads everything from the database on first use
+        if not self.built:
+            return
+        for plant_id, row in changes.items():
+            if row is None:
+                self.remove_plant(plant_id)
+            else:
+                self.add_plant(row)
+
+    def add_plant(self, plant):
+        """Add or refresh a plant."""
+        with self._lock:
+            self._remove_locked(plant.plant_id)
+            self._add_locked(plant)
+
+    def remove_plant(self, plant_id):
+        """Remove a plant."""
+        with self._lock:
+            self._remove_locked(plant_id)
+
+    def flag(self, flag, value=True):
+        """Return the bitmap of plants whose flag equals value."""
+        return self._flags[(flag, bool(value))]
+
+    def plant_type(self, plant_type):
+        """Return the bitmap of plants of a given type."""
+        return self._types.get(plant_type, 0)
+
+    def plant_types(self):
+        """Return the plant types present in the index."""
+        return sorted(self._types)
+
+    def select(self, facets=(), plant_type=None):
+        """Return the bitmap of plants matching every named facet (see FACETS)."""
+        bitmap = self.all
+        for facet in facets:
+            bitmap &= self.flag(*FACETS[facet])
+        if plant_type:
+            bitmap &= self.plant_type(plant_type)
+        return bitmap
+
+    def filter(self, plant_type=None, indoor=None, outdoor=None, poisonous=None, tropical=None):
+        """Return the bitmap matching crud.filter_plants semantics."""
+        bitmap = self.all
+        if plant_type:
+            bitmap &= self.plant_type(plant_type)
+        if indoor is not None:
+            bitmap &= self.flag('indoor', indoor)
+        if outdoor is not None:
+            bitmap &= self.flag('outdoor', outdoor)
+        if poisonous is not None:
+            bitmap &= (self.flag('poisonous_to_humans', poisonous) |
+                       self.flag('poisonous_to_pets', poisonous))
+        if tropical is not None:
+            bitmap &= self.flag('tropical', tropical)
+        return bitmap
+
+    def facet_counts(self, bitmap=None):
+        """Count matches per facet and plant type within a selection."""
+        if bitmap is None:
+            bitmap = self.all
+        return {
+            'total': popcount(bitmap),
+            'facets': {facet: popcount(bitmap & self.flag(*facet_value))
+                       for facet, facet_value in FACETS.items()},
+            'plant_types': {plant_type: popcount(bitmap & type_bitmap)
+                            for plant_type, type_bitmap in sorted(self._types.items())}
+        }
+
+    def _add_locked(self, plant):
+        bit = 1 << plant.plant_id
+        self.all |= bit
+        for flag in FLAGS:
+            value = getattr(plant, flag)
+            if value is not None:
+                self._flags[(flag, bool(value))] |= bit
+        if plant.plant_type:
+            self._types[plant.plant_type] = self._types.get(plant.plant_type, 0) | bit
+            self._plant_types[plant.plant_id] = plant.plant_type
+
+    def _remove_locked(self, plant_id):
+        bit = 1 << plant_id
+        if not self.all & bit:
+            return
+        mask = ~bit
+        self.all &= mask
+        for key in self._flags:
+            self._flags[key] &= mask
+        plant_type = self._plant_types.pop(plant_id, None)
+        if plant_type is not None:
+            self._types[plant_type] &= mask
+            if not self._types[plant_type]:
+                del self._types[plant_type]
+
+
+# Shared index used by crud.filter_plants and the browse page, kept fresh by every commit
+plant_facets = FacetIndex()
+index_sync.on_commit('plant_facets', Plant,
+                     lambda plant: FacetRow(*(getattr(plant, field) for field in FacetRow._fields)),
+                     plant_facets.apply_changes)
@@ -0,0 +1,272 @@
+"""Perceptual image hashes and a near-duplicate index over past uploads.
+
+A difference hash (dHash) reduces a photo to 64 bits describing which
+way brightness changes across a 9x8 grayscale thumbnail, so resized,
+recompressed or slightly re-shot copies of the same photo land within a
+few bits of each other while unrelated photos differ in about half of
+them. Hashes of past identification and health assessment uploads are
+kept in a multi-index hash table for Hamming-radius lookups, so a
+near-duplicate upload can reuse an earlier result instead of a paid
+Plant.id call. Committed uploads are indexed as they happen, and each
+worker rebuilds the index periodically to pick up other processes'
+uploads (see index_sync.py).
+"""
+
+import itertools
+import logging
+import threading
+import time
+from array import array
+
+from PIL import Image, ImageOps
+
+import index_sync
+from model import db, IdentificationHistory, HealthAssessment
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 8  # 8x8 comparisons, 64 bits
+MATCH_DISTANCE = 6  # bits; re-encoded copies differ by 0-4, other photos by ~32
+
+# Multi-index hashing: four 16-bit substrings, each with its own table
+CHUNKS = 4
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """Return the difference hash of a PIL image as an int."""
+    image = ImageOps.exif_transpose(image)
+    gray = image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = gray.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] < pixels[offset + col + 1])
+    return value
+
+
+def hash_file(path):
+    """Return the dHash of an image file as 16 hex digits, or None if unreadable."""
+    try:
+        with Image.open(path) as image:
+            # Let the JPEG decoder downscale while decoding; the hash needs only 9x8
+            image.draft('RGB', (64, 64))
+            return format(dhash(image), '016x')
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning(f"Could not hash image {path}: {e}")
+        return None
+
+
+def hamming(a, b):
+    """Return the number of differing bits between two hashes."""
+    return bin(a ^ b).count('1')
+
+
+def _chunk_variants(chunk, radius):
+    """Yield every 16-bit value within `radius` bits of `chunk`."""
+    yield chunk
+    for distance in range(1, radius + 1):
+        for bits in itertools.combinations(range(CHUNK_BITS), distance):
+            variant = chunk
+            for bit in bits:
+                variant ^= 1 << bit
+            yield variant
+
+
+class MultiIndexHash:
+    """Hamming-radius search over 64-bit hashes.
+
+    Each hash is filed under each of its four 16-bit substrings. Two
+    hashes within r bits must agree to within r // 4 bits on at least
+    one substring, so a lookup only verifies the few hashes sharing a
+    nearby substring instead of scanning them all.
+    """
+
+    def __init__(self):
+        self._hashes = array('Q')
+        self._values = []
+        self._tables = [{} for _ in range(CHUNKS)]
+
+    def __len__(self):
+        return len(self._values)
+
+    def add(self, value_hash, value):
+        """File a value under its hash."""
+        position = len(self._values)
+        self._hashes.append(value_hash)
+        self._values.append(value)
+        for index, table in enumerate(self._tables):
+            chunk = (value_hash >> (index * CHUNK_BITS)) & CHUNK_MASK
+            table.setdefault(chunk, []).append(position)
+
+    def search(self, value_hash, radius=MATCH_DISTANCE):
+        """Return (distance, value) pairs within `radius` bits, closest first."""
+        chunk_radius = radius // CHUNKS
+        candidates = set()
+        for index, table in enumerate(self._tables):
+            chunk = (value_hash >> (index * CHUNK_BITS)) & CHUNK_MASK
+            for variant in _chunk_variants(chunk, chunk_radius):
+                positions = table.get(variant)
+                if positions:
+                    candidates.update(positions)
+
+        matches = []
+        for position in candidates:
+            distance = hamming(value_hash, self._hashes[position])
+            if distance <= radius:
+                matches.append((distance, self._values[position]))
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+
+class ImageMatchIndex:
+    """Near-duplicate lookup over past identification and health assessment images."""
+
+    KINDS = ('identification', 'health')
+
+    def __init__(self, max_distance=MATCH_DISTANCE, max_age=None, clock=time.monotonic):
+        """
+        Args:
+            max_age: Seconds before ensure_built() rebuilds, defaulting to
+                index_sync.REBUILD_INTERVAL; 0 never rebuilds
+        """
+        self.max_distance = max_distance
+        self._indexes = {kind: MultiIndexHash() for kind in self.KINDS}
+        self._row_ids = {kind: set() for kind in self.KINDS}
+        self._lock = threading.Lock()
+        self.max_age = index_sync.REBUILD_INTERVAL if max_age is None else max_age
+        self._clock = clock
+        self.built = False
+        self.built_at = None
+        self.hits = 0
+        self.misses = 0
+        self.lookup_seconds = 0.0
+
+    def build(self, identifications, assessments):
+        """Replace the index contents.
+
+        Args:
+            identifications: Iterable of (identification_id, image_hash) rows
+            assessments: Iterable of (assessment_id, image_hash) rows
+        """
+        indexes = {kind: MultiIndexHash() for kind in self.KINDS}
+        row_ids = {kind: set() for kind in self.KINDS}
+        for kind, rows in (('identification', identifications), ('health', assessments)):
+            for row_id, image_hash in rows:
+                if image_hash:
+                    indexes[kind].add(int(image_hash, 16), row_id)
+                    row_ids[kind].add(row_id)
+        with self._lock:
+            self._indexes = indexes
+            self._row_ids = row_ids
+            self.built = True
+            self.built_at = self._clock()
+
+    def build_from_db(self):
+        """Build the index from stored upload hashes (needs an app context)."""
+        identifications = db.session.query(
+            IdentificationHistory.identification_id, IdentificationHistory.image_hash
+        ).filter(IdentificationHistory.image_hash.isnot(None)).all()
+        # Only assessments Plant.id answered can be reused
+        assessments = db.session.query(
+            HealthAssessment.assessment_id, HealthAssessment.image_hash
+        ).filter(HealthAssessment.image_hash.isnot(None),
+                 HealthAssessment.api_result.isnot(None)).all()
+        self.build(identifications, assessments)
+
+    def ensure_built(self):
+        """Build the index from the database if it is unbuilt or older than max_age."""
+        if not self.built or (self.max_age and self._clock() - self.built_at > self.max_age):
+            self.build_from_db()
+
+    def add(self, kind, image_hash, row_id):
+        """Index a newly stored upload, once."""
+        if image_hash:
+            with self._lock:
+                if row_id not in self._row_ids[kind]:
+                    self._indexes[kind].add(int(image_hash, 16), row_id)
+                    self._row_ids[kind].add(row_id)
+
+    def apply_changes(self, kind, changes):
+        """Index committed uploads: {row_id: image_hash, or None if not reusable}.
+
+        Deleted rows stay indexed until the next rebuild; lookups skip
+        rows that no longer exist.
+        """
+        # An unbuilt index loads everything from the database on first use
+        if not self.built:
+            return
+        for row_id, image_hash in changes.items():
+            self.add(kind, image_hash, row_id)
+
+    def find(self, kind, image_hash):
+        """Return the row IDs of earlier uploads close to this hash, closest first."""
+        if not image_hash:
+            return []
+        start = time.perf_counter()
+        with self._lock:
+            matches = self._indexes[kind].search(int(image_hash, 16), self.max_distance)
+            self.lookup_seconds += time.perf_counter() - start
+            if matches:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return [row_id for _, row_id in matches]
+
+    def stats(self):
+        """Return index sizes, hit rate and mean lookup time for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'identifications': len(self._indexes['identification']),
+                'health_assessments': len(self._indexes['health']),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'mean_lookup_ms': self.lookup_seconds * 1000 / lookups if lookups else 0.0
+            }
+
+
+# Shared index used by the identify and health assessment routes, kept fresh by every commit
+image_match_index = ImageMatchIndex()
+index_sync.on_commit('image_identifications', IdentificationHistory,
+                     lambda identification: identification.image_hash,
+                     lambda changes: image_match_index.apply_changes('identification', changes))
+# Only assessments Plant.id answered can be reused
+index_sync.on_commit('image_assessments', HealthAssessment,
+                     lambda assessment: assessment.image_hash if assessment.api_result else None,
+                     lambda changes: image_match_index.apply_changes('health', changes))
+
+
+def find_previous_identification(image_hash):
+    """Return the closest earlier identification of a near-duplicate image, or None."""
+    image_match_index.ensure_built()
+    for identification_id in image_match_index.find('identification', image_hash):
+        identification = db.session.get(IdentificationHistory, identification_id)
+        if identification:
+            return identification
+    return None
+
+
+def find_previous_assessment(image_hash, user_plant_id):
+    """Return the closest earlier assessment of a near-duplicate image of the same plant.
+
+    Only assessments of the same user plant that Plant.id answered are
+    reused; callers reuse their api_result, never the fields the owner
+    may have written.
+    """
+    image_match_index.ensure_built()
+    assessment_ids = image_match_index.find('health', image_hash)
+    if not assessment_ids:
+        return None
+    assessments = {assessment.assessment_id: assessment for assessment in HealthAssessment.query.filter(
+        HealthAssessment.assessment_id.in_(assessment_ids),
+        HealthAssessment.user_plant_id == user_plant_id,
+        HealthAssessment.api_result.isnot(None)
+    )}
+    for assessment_id in assessment_ids:
+        if assessment_id in assessments:
+            return assessments[assessment_id]
+    return None
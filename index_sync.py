@@ -0,0 +1,77 @@
+"""Keep per-process in-memory indexes in step with the database.
+
+The autocomplete, facet and image match indexes live in each worker's
+memory. on_commit() hooks Flask-SQLAlchemy's session, so rows written
+anywhere in this process, through crud or by constructing models
+directly, reach the index once their transaction commits. Rows written
+by other processes are picked up by a periodic rebuild: an index's
+ensure_built() reloads it when older than REBUILD_INTERVAL.
+
+Configuration:
+    INDEX_REBUILD_SECONDS   rebuild interval for the in-memory indexes (default 300; 0 never)
+"""
+
+import logging
+import os
+
+from sqlalchemy import event, inspect
+
+from model import db
+
+logger = logging.getLogger(__name__)
+
+REBUILD_INTERVAL = float(os.environ.get('INDEX_REBUILD_SECONDS', 300))
+
+
+def on_commit(name, model, snapshot, apply):
+    """Report committed changes to `model` rows to an in-memory index.
+
+    Args:
+        name: Unique name for the pending changes kept in session.info
+        model: Model class, or tuple of classes, to watch
+        snapshot: Called with a flushed row; returns what `apply` needs, since
+            rows are expired once the transaction commits
+        apply: Called after each commit with {primary key: snapshot, or None if deleted}
+    """
+    key = f'index_sync.{name}'
+
+    def changes(session, transaction):
+        # Changes are kept per (sub)transaction, so a rolled back savepoint drops only its own
+        return session.info.setdefault(key, {}).setdefault(transaction, {})
+
+    @event.listens_for(db.session, 'after_flush')
+    def collect(session, flush_context):
+        pending = changes(session, session.get_nested_transaction() or session.get_transaction())
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, model):
+                # New rows only get an identity key after this hook; read the key columns
+                row_id = inspect(obj).mapper.primary_key_from_instance(obj)[0]
+                if row_id is not None:
+                    pending[row_id] = None if obj in session.deleted else snapshot(obj)
+
+    @event.listens_for(db.session, 'after_commit')
+    def publish(session):
+        if session.in_nested_transaction():
+            # A released savepoint's changes wait for the enclosing transaction
+            savepoint = session.get_nested_transaction()
+            released = session.info.get(key, {}).pop(savepoint, {})
+            changes(session, savepoint.parent).update(released)
+            return
+        pending = {}
+        for transaction_changes in session.info.pop(key, {}).values():
+            pending.update(transaction_changes)
+        if pending:
+            try:
+                apply(pending)
+            except Exception as e:
+                # The periodic rebuild repairs the index; never fail the commit
+                logger.error(f"Could not update the {name} index: {e}")
+
+    @event.listens_for(db.session, 'after_rollback')
+    def discard(session):
+        if session.in_nested_transaction():
+            session.info.get(key, {}).pop(session.get_nested_transaction(), None)
+        else:
+            session.info.pop(key, None)
+
+    return collect, publish, discard
@@ -1,11 +1,21 @@
 """Models for Rootly plant care app."""
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
 db = SQLAlchemy()
 
+# Trigram indexes on plant names need the pg_trgm extension
+event.listen(
+    db.metadata,
+    'before_create',
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect='postgresql')
+)
+
 class User(db.Model):
     """User of Rootly website."""
 
@@ -57,7 +67,10 @@ class Plant(db.Model):
     indoor = db.Column(db.Boolean, default=False)
     outdoor = db.Column(db.Boolean, default=False)
     data_sources = db.Column(db.ARRAY(db.String(50)))
+    gbif_id = db.Column(db.Integer, index=True)  # Accepted GBIF backbone taxon
     last_updated = db.Column(db.DateTime, default=datetime.utcnow)
+    # Weighted full-text document, maintained by search_vectors.py
+    search_vector = deferred(db.Column(TSVECTOR))
 
     # Relationships
     care_details = db.relationship('PlantCareDetails', backref='plant', uselist=False)
@@ -66,6 +79,21 @@ class Plant(db.Model):
     favorites = db.relationship('UserFavorite', backref='plant')
     region_care = db.relationship('PlantRegionCare', backref='plant')
     identifications = db.relationship('IdentificationHistory', backref='identified_plant')
+    names = db.relationship('PlantName', backref='plant', cascade='all, delete-orphan')
+
+    __table_args__ = (
+        # GIN trigram indexes back both ILIKE '%q%' and similarity searches
+        db.Index('ix_plants_scientific_name_trgm', 'scientific_name',
+                 postgresql_using='gin',
+                 postgresql_ops={'scientific_name': 'gin_trgm_ops'}),
+        db.Index('ix_plants_common_name_trgm', 'common_name',
+                 postgresql_using='gin',
+                 postgresql_ops={'common_name': 'gin_trgm_ops'}),
+        db.Index('ix_plants_search_vector', 'search_vector',
+                 postgresql_using='gin'),
+        # Keyset pagination order for catalog pages
+        db.Index('ix_plants_scientific_name_plant_id', 'scientific_name', 'plant_id'),
+    )
 
     def __repr__(self):
         return f"<Plant plant_id={self.plant_id} name={self.common_name or self.scientific_name}>"
@@ -117,6 +145,11 @@ class UserPlant(db.Model):
     health_assessments = db.relationship('HealthAssessment', backref='user_plant')
     identifications = db.relationship('IdentificationHistory', backref='user_plant')
 
+    __table_args__ = (
+        # Keyset pagination order for a user's collection
+        db.Index('ix_user_plants_user_id_user_plant_id', 'user_id', 'user_plant_id'),
+    )
+
     def __repr__(self):
         return f"<UserPlant user_plant_id={self.user_plant_id} nickname={self.nickname}>"
 
@@ -164,6 +197,11 @@ class HealthAssessment(db.Model):
     diagnosis = db.Column(db.String(255))
     treatment_recommendations = db.Column(db.Text)
     image_url = db.Column(db.String(500))
+    # Plant.id's mapped result, kept apart from the user-edited fields above so
+    # near-duplicate uploads reuse what the API said (see image_hash.py). The
+    # upload's dHash is only stored alongside it.
+    api_result = db.Column(db.JSON(none_as_null=True))
+    image_hash = db.Column(db.String(16), index=True)
     resolved = db.Column(db.Boolean, default=False)
 
     def __repr__(self):
@@ -179,6 +217,7 @@ class IdentificationHistory(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     user_plant_id = db.Column(db.Integer, db.ForeignKey('user_plants.user_plant_id'), nullable=True)
     image_url = db.Column(db.String(500))
+    image_hash = db.Column(db.String(16), index=True)  # dHash of the upload, see image_hash.py
     identified_plant_id = db.Column(db.Integer, db.ForeignKey('plants.plant_id'), nullable=False)
     confidence_score = db.Column(db.Float)
     identified_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -205,6 +244,32 @@ class PlantHealthIssue(db.Model):
         return f"<PlantHealthIssue issue_id={self.issue_id} name={self.issue_name}>"
 
 
+class PlantName(db.Model):
+    """Vernacular name for a plant, from identification or a data provider."""
+
+    __tablename__ = "plant_names"
+
+    name_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    plant_id = db.Column(db.Integer, db.ForeignKey('plants.plant_id'), nullable=False, index=True)
+    name = db.Column(db.String(255), nullable=False)
+    normalized_name = db.Column(db.String(255), nullable=False)  # Lowercase, accents stripped
+    language = db.Column(db.String(10), default='en')
+    source = db.Column(db.String(50))  # plant_id, trefle, perenual, sample_data...
+
+    __table_args__ = (
+        db.UniqueConstraint('plant_id', 'normalized_name', 'language'),
+        # Prefix lookups (LIKE 'q%'), including queries too short for trigrams
+        db.Index('ix_plant_names_normalized_name_prefix', 'normalized_name',
+                 postgresql_ops={'normalized_name': 'text_pattern_ops'}),
+        db.Index('ix_plant_names_normalized_name_trgm', 'normalized_name',
+                 postgresql_using='gin',
+                 postgresql_ops={'normalized_name': 'gin_trgm_ops'}),
+    )
+
+    def __repr__(self):
+        return f"<PlantName name_id={self.name_id} name={self.name}>"
+
+
 class UserFavorite(db.Model):
     """Plant favorites for users."""
 
@@ -272,6 +337,159 @@ class RelatedPlant(db.Model):
         return f"<RelatedPlant related_id={self.related_id} type={self.relationship_type}>"
 
 
+class GbifTaxon(db.Model):
+    """Plant name from the GBIF backbone taxonomy, used to resolve synonyms."""
+
+    __tablename__ = "gbif_taxa"
+
+    taxon_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    accepted_taxon_id = db.Column(db.Integer, nullable=True)  # NULL for accepted names
+    canonical_name = db.Column(db.String(255), nullable=False)
+    normalized_name = db.Column(db.String(255), nullable=False)
+    taxonomic_status = db.Column(db.String(50))
+    taxon_rank = db.Column(db.String(50))
+
+    __table_args__ = (
+        # Name lookups are pure equality, which a hash index answers in constant time
+        db.Index('ix_gbif_taxa_normalized_name', 'normalized_name', postgresql_using='hash'),
+    )
+
+    def __repr__(self):
+        return f"<GbifTaxon taxon_id={self.taxon_id} name={self.canonical_name}>"
+
+
+class PerenualSpecies(db.Model):
+    """Local mirror of the Perenual species list, served by the browse page."""
+
+    __tablename__ = "perenual_species"
+
+    perenual_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    common_name = db.Column(db.String(255), nullable=False)
+    scientific_name = db.Column(db.String(255))
+    other_names = db.Column(db.ARRAY(db.String(255)))
+    family = db.Column(db.String(100))
+    genus = db.Column(db.String(100))
+    image_url = db.Column(db.String(500))
+    synced_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        # Matches the browse page order, so keyset pages are index range scans
+        db.Index('ix_perenual_species_common_name_perenual_id', 'common_name', 'perenual_id'),
+    )
+
+    # Display attributes shared with Plant on the browse page
+    is_api_result = True
+
+    @property
+    def plant_id(self):
+        return f"api_{self.perenual_id}"
+
+    def __repr__(self):
+        return f"<PerenualSpecies perenual_id={self.perenual_id} name={self.common_name}>"
+
+
+class CatalogSyncRun(db.Model):
+    """One refresh of the Perenual catalog mirror."""
+
+    __tablename__ = "catalog_sync_runs"
+
+    run_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    status = db.Column(db.String(20), default='running')  # running, succeeded, failed
+    pages = db.Column(db.Integer, default=0)
+    species = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+    # A pass over the whole catalog can span several runs when the daily quota runs out
+    start_page = db.Column(db.Integer, default=1)
+    next_page = db.Column(db.Integer)  # where the next run resumes; None once the pass completed
+    pass_started_at = db.Column(db.DateTime)  # start of the first run of this pass
+
+    def __repr__(self):
+        return f"<CatalogSyncRun run_id={self.run_id} status={self.status}>"
+
+
+class SearchQueryLog(db.Model):
+    """One plant search, appended in batches by search_log.py."""
+
+    __tablename__ = "search_query_log"
+
+    log_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    normalized_query = db.Column(db.String(255), nullable=False)
+    source = db.Column(db.String(20))  # browse, search
+    result_count = db.Column(db.Integer, nullable=False)
+    local_count = db.Column(db.Integer)  # Results answered from our own database
+    user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=True)
+    searched_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        db.Index('ix_search_query_log_normalized_query_searched_at',
+                 'normalized_query', 'searched_at'),
+    )
+
+    def __repr__(self):
+        return f"<SearchQueryLog log_id={self.log_id} query={self.normalized_query}>"
+
+
+class SearchPrefetch(db.Model):
+    """Last background import attempt for a query that found nothing locally."""
+
+    __tablename__ = "search_prefetches"
+
+    normalized_query = db.Column(db.String(255), primary_key=True)
+    attempted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    status = db.Column(db.String(20))  # pending, imported, not_found, failed, local
+    imported = db.Column(db.Integer, default=0)
+
+    def __repr__(self):
+        return f"<SearchPrefetch query={self.normalized_query} status={self.status}>"
+
+
+# Columns and indexes added to tables after they were first created.
+# create_all() never alters an existing table, so upgrade_schema() adds
+# them in place; every statement is safe to run again.
+SCHEMA_UPGRADES = [
+    # Trigram indexes for name search
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_plants_scientific_name_trgm "
+    "ON plants USING gin (scientific_name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_plants_common_name_trgm "
+    "ON plants USING gin (common_name gin_trgm_ops)",
+    # Full-text search vectors; fill them for existing plants with: python search_vectors.py
+    "ALTER TABLE plants ADD COLUMN IF NOT EXISTS search_vector TSVECTOR",
+    "CREATE INDEX IF NOT EXISTS ix_plants_search_vector ON plants USING gin (search_vector)",
+    # Keyset pagination orders
+    "CREATE INDEX IF NOT EXISTS ix_plants_scientific_name_plant_id ON plants (scientific_name, plant_id)",
+    "CREATE INDEX IF NOT EXISTS ix_user_plants_user_id_user_plant_id ON user_plants (user_id, user_plant_id)",
+    # plants.gbif_id: accepted GBIF taxon, see taxonomy.py
+    "ALTER TABLE plants ADD COLUMN IF NOT EXISTS gbif_id INTEGER",
+    "CREATE INDEX IF NOT EXISTS ix_plants_gbif_id ON plants (gbif_id)",
+    # Upload hashes and reusable Plant.id results, see image_hash.py
+    "ALTER TABLE identification_history ADD COLUMN IF NOT EXISTS image_hash VARCHAR(16)",
+    "CREATE INDEX IF NOT EXISTS ix_identification_history_image_hash "
+    "ON identification_history (image_hash)",
+    "ALTER TABLE health_assessments ADD COLUMN IF NOT EXISTS image_hash VARCHAR(16)",
+    "CREATE INDEX IF NOT EXISTS ix_health_assessments_image_hash ON health_assessments (image_hash)",
+    "ALTER TABLE health_assessments ADD COLUMN IF NOT EXISTS api_result JSON",
+    # Resumable catalog syncs, see catalog_mirror.py
+    "ALTER TABLE catalog_sync_runs ADD COLUMN IF NOT EXISTS start_page INTEGER",
+    "ALTER TABLE catalog_sync_runs ADD COLUMN IF NOT EXISTS next_page INTEGER",
+    "ALTER TABLE catalog_sync_runs ADD COLUMN IF NOT EXISTS pass_started_at TIMESTAMP WITHOUT TIME ZONE",
+]
+
+
+def upgrade_schema():
+    """Bring tables created by an earlier version of this module up to date.
+
+    Run after db.create_all(); a no-op on databases other than PostgreSQL.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return
+    with db.engine.begin() as connection:
+        for statement in SCHEMA_UPGRADES:
+            connection.execute(text(statement))
+
+
 def connect_to_db(flask_app, db_uri="postgresql:///rootly", echo=True):
     """Connect the database to our Flask app."""
 
@@ -286,7 +504,12 @@ def connect_to_db(flask_app, db_uri="postgresql:///rootly", echo=True):
 
 
 if __name__ == "__main__":
+    """Create missing tables and upgrade existing ones: python model.py"""
+    # Run as a script this module is __main__; the app is registered with the imported model.db
+    import model
     from server import app
-    connect_to_db(app)
-    print("Connected to DB.")
+    with app.app_context():
+        model.db.create_all()
+        model.upgrade_schema()
+    print("Database schema is up to date.")
 
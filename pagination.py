@@ -0,0 +1,108 @@
+"""Opaque cursors for keyset (seek) pagination.
+
+A cursor encodes the sort key of the last row on a page. The next page
+seeks past that key with an indexed comparison instead of an OFFSET, so
+page 500 costs the same as page 1. Cursors may be tagged with the list
+they page through, so one list never seeks with another's sort key.
+"""
+
+import base64
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Largest value of an INTEGER primary key; larger cursor ids cannot match a row
+MAX_ID = 2 ** 31 - 1
+
+
+def encode_cursor(values, source=None):
+    """Encode a row's sort key as an opaque, URL-safe cursor.
+
+    Args:
+        source: Name of the list being paged, checked when decoding
+    """
+    data = list(values) if source is None else {'source': source, 'key': list(values)}
+    payload = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def _load(cursor):
+    """Return the decoded JSON payload of a cursor, or None if malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError):
+        logger.warning(f"Ignoring malformed cursor: {cursor!r}")
+        return None
+
+
+def cursor_source(cursor):
+    """Return the source a cursor was tagged with, or None."""
+    data = _load(cursor) if cursor else None
+    return data.get('source') if isinstance(data, dict) else None
+
+
+def decode_cursor(cursor, size, types=None, source=None):
+    """Decode a cursor into its sort key values.
+
+    Cursors come from the query string, so with `types` (one type per
+    value, e.g. (str, int)) each value is checked before it reaches a
+    query; ints must be ids in 0..MAX_ID. With `source`, only cursors
+    tagged with that source are accepted.
+
+    Returns None for a missing, malformed, foreign or out-of-range
+    cursor, so callers simply start from the first page.
+    """
+    if not cursor:
+        return None
+    values = _load(cursor)
+    if source is not None:
+        if not isinstance(values, dict) or values.get('source') != source:
+            logger.warning(f"Ignoring cursor from another list: {cursor!r}")
+            return None
+        values = values.get('key')
+    if not isinstance(values, list) or len(values) != size:
+        logger.warning(f"Ignoring cursor with unexpected shape: {cursor!r}")
+        return None
+    if types is not None and not all(_valid(value, value_type)
+                                     for value, value_type in zip(values, types)):
+        logger.warning(f"Ignoring cursor with unexpected values: {cursor!r}")
+        return None
+    return values
+
+
+def _valid(value, value_type):
+    if value_type is int:
+        # bool is an int subclass, but never a valid id
+        return type(value) is int and 0 <= value <= MAX_ID
+    return isinstance(value, value_type)
+
+
+def make_page(rows, per_page, key, source=None):
+    """Split a per_page + 1 row fetch into (page, next_cursor)."""
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        return rows, encode_cursor(key(rows[-1]), source)
+    return rows, None
+
+
+def paginate_list(items, cursor, per_page, key):
+    """Return (page, next_cursor) for an already materialized, ordered list.
+
+    Used for cached result lists; the cursor holds the key of the last item
+    shown, so pages stay stable even if the list is rebuilt in between. A
+    cursor whose item is no longer in the list gives an empty last page
+    rather than starting over and showing the first results again.
+    """
+    start = 0
+    if cursor:
+        after = decode_cursor(cursor, 2)
+        for position, item in enumerate(items):
+            if after is not None and list(key(item)) == after:
+                start = position + 1
+                break
+        else:
+            logger.warning(f"Cursor item is no longer in the list: {cursor!r}")
+            return [], None
+    return make_page(items[start:start + per_page + 1], per_page, key)
@@ -1,31 +1,108 @@
 # plant_service.py - Service for managing plant data
 from model import Plant, PlantCareDetails, db
+import asyncio
 from datetime import datetime
-from typing import Dict, List
+from typing import Callable, Dict, List
+from api import fanout
+
+# Trefle detail lookups in flight at once per search
+DETAIL_WORKERS = 4
+
+def fetch_trefle_details(trefle_api, plant_ids: List[int], workers: int = DETAIL_WORKERS,
+                         deadline: float = None) -> Dict:
+    """Fetch Trefle details for several plants concurrently, keyed by plant ID.
+    
+    Lookups run on the shared provider fan-out pool, at most `workers` at
+    a time, under one deadline for the whole batch (default
+    fanout.DEFAULT_DEADLINE). Plants whose lookup failed or missed the
+    deadline are left out.
+    """
+    if not plant_ids:
+        return {}
+    
+    async def fetch_all():
+        slots = asyncio.Semaphore(workers)
+        
+        async def fetch(plant_id):
+            async with slots:
+                return await fanout.call(trefle_api.get_plant_by_id, plant_id)
+        
+        found, _ = await fanout.gather({plant_id: fetch(plant_id) for plant_id in plant_ids},
+                                       deadline or fanout.DEFAULT_DEADLINE)
+        return found
+    
+    return {plant_id: detailed_data for plant_id, detailed_data in fanout.run(fetch_all()).items()
+            if detailed_data and 'data' in detailed_data}
+
+def save_trefle_search(trefle_api, query: str, limit: int, upsert: Callable,
+                       workers: int = DETAIL_WORKERS, deadline: float = None) -> List[Plant]:
+    """Search Trefle and upsert every hit, committing them together.
+    
+    Details for every hit are fetched concurrently, at most `workers` at
+    a time, under one `deadline` and through the shared Trefle rate
+    limiter. Each upsert runs in its own savepoint, so one bad record
+    only skips that plant.
+    
+    Args:
+        upsert: Called with a search hit and its details ({} if the lookup
+            failed); adds the plant to the session without committing
+    """
+    results = trefle_api.search_plants(query)
+    
+    if not results or 'data' not in results:
+        return []
+    
+    hits = [plant_data for plant_data in results['data'][:limit]
+            if plant_data.get('scientific_name')]
+    details = fetch_trefle_details(trefle_api, [plant_data['id'] for plant_data in hits
+                                                if 'id' in plant_data], workers, deadline)
+    
+    plants = []
+    for plant_data in hits:
+        try:
+            with db.session.begin_nested():
+                # A failed lookup is not retried here; the plant is saved without details
+                plant = upsert(plant_data, details.get(plant_data.get('id'), {}))
+            plants.append(plant)
+        except Exception as e:
+            print(f"Error saving plant {plant_data['scientific_name']}: {e}")
+    
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error saving plants for {query}: {e}")
+        return []
+    
+    return plants
 
 class PlantService:
     """Service for managing plant data with Trefle API integration."""
     
+    DETAIL_WORKERS = DETAIL_WORKERS
+    # Seconds to wait for a search's detail lookups together; None for the fan-out default
+    DETAIL_DEADLINE = None
+    
     def __init__(self, trefle_api):
         self.trefle_api = trefle_api
     
     def search_and_create_plants(self, query: str, limit: int = 10) -> List[Plant]:
-        """Search Trefle API and create/update plants in database."""
-        results = self.trefle_api.search_plants(query)
-        
-        if not results or 'data' not in results:
-            return []
-        
-        plants = []
-        for plant_data in results['data'][:limit]:
-            plant = self._create_or_update_plant_from_trefle(plant_data)
-            if plant:
-                plants.append(plant)
-        
-        return plants
+        """Search Trefle API and create/update plants in database (see save_trefle_search)."""
+        return save_trefle_search(
+            self.trefle_api, query, limit,
+            lambda plant_data, detailed_data: self._create_or_update_plant_from_trefle(
+                plant_data, detailed_data, commit=False),
+            self.DETAIL_WORKERS, self.DETAIL_DEADLINE)
     
-    def _create_or_update_plant_from_trefle(self, trefle_data: Dict) -> Plant:
-        """Create or update a plant from Trefle API data."""
+    def _create_or_update_plant_from_trefle(self, trefle_data: Dict, detailed_data: Dict = None,
+                                            commit: bool = True) -> Plant:
+        """Create or update a plant from Trefle API data.
+        
+        Args:
+            trefle_data: A plant from a Trefle search
+            detailed_data: Its Trefle details if already fetched; fetched otherwise
+            commit: Commit the change; the caller commits when False
+        """
         scientific_name = trefle_data.get('scientific_name')
         if not scientific_name:
             return None
@@ -45,10 +122,13 @@ class PlantService:
         plant.last_updated = datetime.utcnow()
         
         # Get detailed information if available
-        if 'id' in trefle_data:
+        if detailed_data is None and 'id' in trefle_data:
             detailed_data = self.trefle_api.get_plant_by_id(trefle_data['id'])
-            if detailed_data and 'data' in detailed_data:
-                self._update_plant_with_details(plant, detailed_data['data'])
+        if detailed_data and 'data' in detailed_data:
+            self._update_plant_with_details(plant, detailed_data['data'])
+        
+        if not commit:
+            return plant
         
         try:
             db.session.commit()
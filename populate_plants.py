@@ -26,6 +26,7 @@ logger = logging.getLogger(__name__)
 
 from api.quantitative_plant import get_plant_list as get_trefle_plants
 from api.plant_image_apis import PlantImageFetcher
+from api.rate_limit import batch_priority
 
 
 def create_regions():
@@ -204,6 +205,7 @@ def populate_plants_from_perenual():
                     data_sources=['perenual'],
                     last_updated=datetime.utcnow()
                 )
+                crud.add_plant_names(plant, plant_data.get('other_name'), source='perenual')
                 
                 db.session.add(plant)
                 db.session.flush()  # Get the plant ID
@@ -362,6 +364,7 @@ def add_popular_houseplants():
     logger.info(f"Added {plants_added} popular houseplants")
     return plants_added
 
+@batch_priority()
 def main():
     """Main function to populate the database."""
     logger.info("Starting database population...")
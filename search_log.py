@@ -0,0 +1,317 @@
+"""Search query log and zero-result prefetching.
+
+Searches from the browse and search pages are buffered in memory and
+appended to search_query_log in batches by a background thread, so a
+search never waits on an INSERT. An aggregation job ranks frequent
+queries and queries we could not answer locally; the most frequent
+local misses are fetched from Trefle (or Perenual) and imported, so the
+next user searching for them gets a local answer.
+
+Report and prefetch now:
+    python search_log.py [--days N] [--min-searches N]
+"""
+
+import atexit
+import functools
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import case, func, insert
+
+import crud
+from api.fanout import fan_out
+from api.quantitative_plant import details_memo
+from api.rate_limit import batch_priority
+from model import db, SearchQueryLog, SearchPrefetch
+from search_service import normalize_query
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SIZE = 100
+FLUSH_INTERVAL = 5  # seconds
+MAX_BUFFERED = 10000
+
+PREFETCH_INTERVAL = int(os.environ.get('SEARCH_PREFETCH_INTERVAL', 15 * 60))  # seconds
+PREFETCH_WINDOW = timedelta(days=7)
+PREFETCH_MIN_SEARCHES = 3
+PREFETCH_PER_QUERY = 3
+PREFETCH_RETRY_AFTER = timedelta(days=1)
+
+
+class SearchLogBuffer:
+    """Collect search log rows in memory and write them in batches.
+
+    The flush thread starts on the first record and writes whenever
+    `flush_size` rows are waiting or `flush_interval` seconds pass. If the
+    database falls behind, the oldest rows beyond `max_buffered` are
+    dropped rather than growing without bound.
+    """
+
+    def __init__(self, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 max_buffered=MAX_BUFFERED):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._rows = deque(maxlen=max_buffered)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._app = None
+        self._thread = None
+        self.flushed = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def record(self, query, source, result_count, local_count=None, user_id=None):
+        """Buffer one search (needs an app context the first time)."""
+        normalized_query = normalize_query(query)[:255]
+        if not normalized_query:
+            return
+
+        row = {
+            'normalized_query': normalized_query,
+            'source': source,
+            'result_count': result_count,
+            'local_count': local_count,
+            'user_id': user_id,
+            'searched_at': datetime.utcnow()
+        }
+        with self._lock:
+            if len(self._rows) == self._rows.maxlen:
+                self.dropped += 1
+            self._rows.append(row)
+            pending = len(self._rows)
+
+        self._ensure_started()
+        if pending >= self.flush_size:
+            self._wake.set()
+
+    def flush(self):
+        """Write every buffered row in one INSERT (needs an app context).
+
+        Returns:
+            Number of rows written
+        """
+        with self._lock:
+            rows = list(self._rows)
+            self._rows.clear()
+        if not rows:
+            return 0
+
+        try:
+            db.session.execute(insert(SearchQueryLog), rows)
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error writing {len(rows)} search log rows: {str(e)}")
+            db.session.rollback()
+            return 0
+
+        self.flushed += len(rows)
+        return len(rows)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._app = current_app._get_current_object()
+            self._thread = threading.Thread(target=self._run, name='search-log', daemon=True)
+            self._thread.start()
+        atexit.register(self._flush_in_app)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._flush_in_app()
+
+    def _flush_in_app(self):
+        try:
+            with self._app.app_context():
+                self.flush()
+        except Exception as e:
+            logger.error(f"Search log flush failed: {str(e)}")
+
+
+def rank_queries(since=None, limit=20):
+    """Return the most frequent queries since a time, with their miss counts.
+
+    zero_results counts searches that showed nothing at all; local_misses
+    counts searches our own database could not answer.
+    """
+    since = since or datetime.utcnow() - PREFETCH_WINDOW
+    rows = _aggregate(since).order_by(func.count(SearchQueryLog.log_id).desc(),
+                                      SearchQueryLog.normalized_query).limit(limit).all()
+    return [_query_stats(row) for row in rows]
+
+
+def zero_result_queries(since=None, min_searches=PREFETCH_MIN_SEARCHES, limit=20):
+    """Return queries with at least `min_searches` local misses, most missed first."""
+    since = since or datetime.utcnow() - PREFETCH_WINDOW
+    local_misses = func.sum(case((SearchQueryLog.local_count == 0, 1), else_=0))
+    rows = (_aggregate(since)
+            .having(local_misses >= min_searches)
+            .order_by(local_misses.desc(), SearchQueryLog.normalized_query)
+            .limit(limit).all())
+    return [_query_stats(row) for row in rows]
+
+
+def _aggregate(since):
+    return (db.session.query(
+                SearchQueryLog.normalized_query,
+                func.count(SearchQueryLog.log_id).label('searches'),
+                func.sum(case((SearchQueryLog.result_count == 0, 1), else_=0)).label('zero_results'),
+                func.sum(case((SearchQueryLog.local_count == 0, 1), else_=0)).label('local_misses'))
+            .filter(SearchQueryLog.searched_at >= since)
+            .group_by(SearchQueryLog.normalized_query))
+
+
+def _query_stats(row):
+    return {
+        'query': row.normalized_query,
+        'searches': row.searches,
+        'zero_results': int(row.zero_results or 0),
+        'local_misses': int(row.local_misses or 0)
+    }
+
+
+@batch_priority()
+def prefetch_zero_result_queries(since=None, min_searches=PREFETCH_MIN_SEARCHES, limit=20,
+                                 per_query=PREFETCH_PER_QUERY, retry_after=PREFETCH_RETRY_AFTER):
+    """Import plants for frequent queries that found nothing locally.
+
+    Each query is attempted at most once per `retry_after`, whatever the
+    outcome, so a query no provider knows does not cost API calls on
+    every run. Provider calls run at batch priority. Needs an app context.
+
+    Returns:
+        List of (query, status, imported count) for the queries attempted
+    """
+    now = datetime.utcnow()
+    attempted = []
+    for stats in zero_result_queries(since, min_searches, limit):
+        query = stats['query']
+        prefetch = db.session.get(SearchPrefetch, query)
+        if prefetch and prefetch.attempted_at > now - retry_after:
+            continue
+        if not prefetch:
+            prefetch = SearchPrefetch(normalized_query=query)
+            db.session.add(prefetch)
+        # Record the attempt first, so a failed import's rollback cannot drop it
+        prefetch.attempted_at = now
+        prefetch.status = 'pending'
+        db.session.commit()
+
+        if crud.search_plants(query, limit=1):
+            # Imported some other way since it was logged
+            status, imported = 'local', 0
+        else:
+            status, imported = _import_matches(query, per_query)
+
+        prefetch.attempted_at = datetime.utcnow()
+        prefetch.status = status
+        prefetch.imported = imported
+        db.session.commit()
+        logger.info(f"Prefetched {query!r}: {status} ({imported} imported)")
+        attempted.append((query, status, imported))
+    return attempted
+
+
+@details_memo()
+def _import_matches(query, limit):
+    """Import the top Trefle matches for a query, falling back to Perenual.
+
+    The matches' Trefle details are fetched together, under one fan-out
+    deadline, before the imports read them from the details memo.
+    """
+    from api.quantitative_plant import get_plant_details, search_plants as search_trefle_plants
+    from api.perenual import search_plants as search_perenual_plants
+    from data_merger import import_trefle_plant, find_or_create_plant
+
+    imported = 0
+    try:
+        trefle_results = search_trefle_plants(query)
+        matches = [plant_data for plant_data in trefle_results.get('data', [])[:limit]
+                   if plant_data.get('id')]
+        # A lookup that misses the deadline is fetched again by its import
+        fan_out({plant_data['id']: functools.partial(get_plant_details, plant_data['id'])
+                 for plant_data in matches})
+        for plant_data in matches:
+            if import_trefle_plant(plant_data['id'], plant_data.get('scientific_name')):
+                imported += 1
+
+        if not imported:
+            perenual_results = search_perenual_plants(query)
+            for plant_data in perenual_results.get('data', [])[:limit]:
+                scientific_names = plant_data.get('scientific_name') or []
+                if scientific_names and find_or_create_plant(scientific_names[0],
+                                                             perenual_id=plant_data.get('id')):
+                    imported += 1
+    except Exception as e:
+        logger.error(f"Error prefetching {query!r}: {str(e)}")
+        db.session.rollback()
+        return 'failed', imported
+
+    return ('imported' if imported else 'not_found'), imported
+
+
+class SearchPrefetchWorker(threading.Thread):
+    """Background thread that periodically prefetches zero-result queries."""
+
+    def __init__(self, app, interval=PREFETCH_INTERVAL, on_import=None):
+        super().__init__(name='search-prefetch', daemon=True)
+        self.app = app
+        self.interval = interval
+        self.on_import = on_import
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    attempted = prefetch_zero_result_queries()
+                if self.on_import and any(imported for _, _, imported in attempted):
+                    self.on_import()
+            except Exception as e:
+                logger.error(f"Search prefetch worker error: {str(e)}")
+
+    def stop(self):
+        self._stopped.set()
+
+
+def start_search_prefetch(app, interval=PREFETCH_INTERVAL, on_import=None):
+    """Start the background prefetch worker."""
+    worker = SearchPrefetchWorker(app, interval, on_import)
+    worker.start()
+    return worker
+
+
+# Shared buffer used by the browse and search pages
+search_log = SearchLogBuffer()
+
+
+if __name__ == "__main__":
+    """Print the query ranking and prefetch frequent local misses."""
+
+    import argparse
+
+    from server import app
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=PREFETCH_WINDOW.days)
+    parser.add_argument('--min-searches', type=int, default=PREFETCH_MIN_SEARCHES)
+    args = parser.parse_args()
+
+    with app.app_context():
+        since = datetime.utcnow() - timedelta(days=args.days)
+        print("Top queries (searches / zero results / local misses):")
+        for stats in rank_queries(since):
+            print(f"  {stats['query']}: {stats['searches']} / {stats['zero_results']} / "
+                  f"{stats['local_misses']}")
+        for query, status, imported in prefetch_zero_result_queries(since, args.min_searches):
+            print(f"Prefetched {query!r}: {status} ({imported} imported)")
@@ -0,0 +1,249 @@
+"""Federated plant search across the local database and Trefle.
+
+Trefle is only searched when the local name search falls short of the
+threshold. It then runs alongside the slower full-text search, so a
+miss costs roughly the slower of the two rather than their sum.
+
+Results are cached for the full TTL once Trefle answered. While Trefle
+is unavailable (no API key, or its circuit is open) local-only results
+are cached briefly; after a transient failure they are not cached.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import crud
+import index_sync
+from api import fanout
+from model import Plant, PlantName
+
+logger = logging.getLogger(__name__)
+
+# How complete a federated search was, which decides how long it is cached
+COMPLETE = 'complete'
+UNAVAILABLE = 'unavailable'
+FAILED = 'failed'
+
+
+def normalize_query(query):
+    """Normalize a search query for use as a cache key."""
+    return ' '.join((query or '').lower().split())
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after a fixed TTL."""
+
+    def __init__(self, maxsize=256, ttl=300, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self._clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        """Cache a value, evicting the least recently used entry if full.
+
+        Args:
+            ttl: Seconds to keep this entry, overriding the cache's TTL
+        """
+        with self._lock:
+            self._entries[key] = (self._clock() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        """Drop a single entry."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and the hit ratio."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize
+            }
+
+
+class FederatedSearchService:
+    """Search the local database first and fill in with Trefle results.
+
+    Results are cached by normalized query, so a repeated search neither
+    calls Trefle nor queries the database again until the entry expires.
+    Local-only results are kept for `unavailable_ttl` seconds while Trefle
+    is unavailable, so a missing API key does not disable the cache.
+    """
+
+    def __init__(self, cache_size=256, cache_ttl=300, local_limit=100,
+                 api_threshold=50, api_limit=10, api_deadline=None, unavailable_ttl=30):
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self.unavailable_ttl = unavailable_ttl
+        self.local_limit = local_limit
+        self.api_threshold = api_threshold
+        self.api_limit = api_limit
+        self.api_deadline = api_deadline
+
+    def search(self, query):
+        """Return formatted search results for a query."""
+        key = normalize_query(query)
+        if not key:
+            return []
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return list(cached)
+
+        results, outcome = fanout.run(self._search_federated(query))
+
+        # A failed provider call would otherwise pin partial results until expiry
+        if outcome == COMPLETE:
+            self.cache.set(key, results)
+        elif outcome == UNAVAILABLE:
+            self.cache.set(key, results, ttl=self.unavailable_ttl)
+        return list(results)
+
+    def invalidate(self, query=None):
+        """Forget cached results for one query, or for every query."""
+        if query is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(normalize_query(query))
+
+    def invalidate_on_commit(self, name='search_results'):
+        """Forget cached results whenever this process commits plants or plant names.
+
+        Other processes' plants show up once their cached entries expire.
+
+        Returns:
+            The session listeners, as from index_sync.on_commit()
+        """
+        return index_sync.on_commit(name, (Plant, PlantName), lambda row: None,
+                                    lambda changes: self.invalidate())
+
+    def stats(self):
+        """Return cache statistics for monitoring."""
+        return self.cache.stats()
+
+    async def _search_federated(self, query):
+        """Search local names, then full text alongside Trefle if names fall short.
+
+        Returns:
+            Tuple of (results, COMPLETE, UNAVAILABLE or FAILED)
+        """
+        plants = crud.search_plants(query, limit=self.local_limit, with_care_details=True)
+        if len(plants) >= self.api_threshold:
+            # The indexed name search alone decides most queries, with no API call
+            return [self._format_local_plant(plant) for plant in plants], COMPLETE
+
+        trefle = self._start_trefle(query)
+        found_ids = {plant.plant_id for plant in plants}
+        plants += [plant for plant in crud.full_text_search_plants(
+                       query, limit=self.api_threshold, with_care_details=True)
+                   if plant.plant_id not in found_ids]
+        results = [self._format_local_plant(plant) for plant in plants]
+
+        if len(results) >= self.api_threshold:
+            if trefle is not None:
+                # Full text filled the gap; drop the Trefle call if it has not started
+                trefle.cancel()
+            return results, COMPLETE
+
+        seen = {result['scientific_name'].lower() for result in results
+                if result['scientific_name']}
+        api_results, outcome = await self._search_trefle(trefle, seen)
+        results.extend(api_results)
+        return results, outcome
+
+    def _start_trefle(self, query):
+        """Start the Trefle search on the fan-out pool, or return None if Trefle is down."""
+        from api.circuit_breaker import is_available
+        from api.quantitative_plant import search_plants as search_trefle_plants
+
+        if not is_available('trefle'):
+            logger.info(f"Trefle circuit open; skipping API search for: {query}")
+            return None
+
+        logger.info(f"Searching Trefle API for: {query}")
+        return fanout.call(search_trefle_plants, query)
+
+    async def _search_trefle(self, trefle, seen):
+        """Return (results, outcome) for Trefle plants not already in `seen`."""
+        from api.quantitative_plant import NOT_CONFIGURED
+
+        if trefle is None:
+            return [], UNAVAILABLE
+
+        found, failed = await fanout.gather({'trefle': trefle},
+                                            self.api_deadline or fanout.DEFAULT_DEADLINE)
+        if failed:
+            logger.error(f"Error searching Trefle API: {str(failed['trefle'])}")
+            return [], FAILED
+        trefle_results = found['trefle']
+
+        if trefle_results and trefle_results.get('error') == NOT_CONFIGURED:
+            return [], UNAVAILABLE
+        if not trefle_results or 'error' in trefle_results:
+            return [], FAILED
+
+        results = []
+        for plant_data in trefle_results.get('data', [])[:self.api_limit]:
+            scientific_name = plant_data.get('scientific_name')
+            if not scientific_name or scientific_name.lower() in seen:
+                continue
+            seen.add(scientific_name.lower())
+            results.append({
+                'in_database': False,
+                'plant_id': plant_data.get('id'),
+                'scientific_name': scientific_name,
+                'common_name': plant_data.get('common_name', 'Unknown'),
+                'image_url': plant_data.get('image_url') or None,
+                'care_details': None,  # Fetched only when importing to save API calls
+                'api_source': 'trefle'
+            })
+        return results, COMPLETE
+
+    @staticmethod
+    def _format_local_plant(plant):
+        care_details = plant.care_details
+        return {
+            'in_database': True,
+            'plant_id': plant.plant_id,
+            'scientific_name': plant.scientific_name,
+            'common_name': plant.common_name,
+            'image_url': plant.image_url,
+            'care_details': {
+                'sunlight_requirements': care_details.sunlight_requirements,
+                'watering_frequency': care_details.watering_frequency,
+                'difficulty_level': care_details.difficulty_level
+            } if care_details else None
+        }
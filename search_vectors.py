@@ -0,0 +1,105 @@
+"""Weighted full-text search vectors for plants.
+
+Each plant's search_vector combines its names (weight A), care details,
+health issues and flags (weight B) and description (weight C), so
+ts_rank orders name matches above care matches above description
+matches. Vectors are refreshed incrementally: any commit on the app's
+session (db.session) that touches a Plant, PlantCareDetails or
+PlantHealthIssue row recomputes the vectors of the affected plants in
+the same transaction. Other sessions, such as scripts using a plain
+SQLAlchemy Session, call refresh_search_vectors() themselves.
+"""
+
+from sqlalchemy import bindparam, event, text
+
+from model import db, Plant, PlantCareDetails, PlantHealthIssue
+
+TEXT_SEARCH_CONFIG = 'english'
+
+_PENDING_KEY = 'search_vector_plant_ids'
+
+_DOCUMENT_SQL = """
+    setweight(to_tsvector('{config}', concat_ws(' ', p.scientific_name, p.common_name)), 'A') ||
+    setweight(to_tsvector('{config}', concat_ws(' ',
+        CASE WHEN p.indoor THEN 'indoor' END,
+        CASE WHEN p.outdoor THEN 'outdoor' END,
+        CASE WHEN p.tropical THEN 'tropical' END,
+        CASE WHEN p.poisonous_to_pets IS FALSE THEN 'pet safe' END,
+        (SELECT concat_ws(' ', c.watering_frequency,
+                          array_to_string(c.sunlight_requirements, ' '),
+                          c.soil_preferences, c.fertilizing_schedule,
+                          c.companion_plants, c.difficulty_level)
+           FROM plant_care_details c
+          WHERE c.plant_id = p.plant_id
+          LIMIT 1),
+        (SELECT string_agg(concat_ws(' ', h.issue_name, h.symptoms, h.treatment), ' ')
+           FROM plant_health_issues h
+          WHERE h.plant_id = p.plant_id))), 'B') ||
+    setweight(to_tsvector('{config}', coalesce(p.description, '')), 'C')
+""".format(config=TEXT_SEARCH_CONFIG)
+
+REFRESH_ALL_SQL = text(f"UPDATE plants AS p SET search_vector = {_DOCUMENT_SQL}")
+
+REFRESH_SOME_SQL = text(
+    f"UPDATE plants AS p SET search_vector = {_DOCUMENT_SQL} WHERE p.plant_id IN :plant_ids"
+).bindparams(bindparam('plant_ids', expanding=True))
+
+
+def _is_postgres(session):
+    return session.get_bind().dialect.name == 'postgresql'
+
+
+def refresh_search_vectors(plant_ids=None, session=None):
+    """Recompute search vectors for some plants, or all plants if None.
+
+    Does not commit; the update joins the caller's transaction.
+    """
+    session = session or db.session
+    if not _is_postgres(session):
+        return
+    if plant_ids is None:
+        session.execute(REFRESH_ALL_SQL)
+    elif plant_ids:
+        session.execute(REFRESH_SOME_SQL, {'plant_ids': sorted(plant_ids)})
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_changed_plants(session, flush_context):
+    """Remember which plants had searchable rows change in this flush."""
+    plant_ids = session.info.setdefault(_PENDING_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Plant):
+            if obj not in session.deleted:
+                plant_ids.add(obj.plant_id)
+        elif isinstance(obj, (PlantCareDetails, PlantHealthIssue)):
+            if obj.plant_id is not None:
+                plant_ids.add(obj.plant_id)
+
+
+@event.listens_for(db.session, 'before_commit')
+def _refresh_changed_plants(session):
+    """Refresh vectors for changed plants inside the committing transaction."""
+    if not session.info.get(_PENDING_KEY) and not (session.new or session.dirty or session.deleted):
+        return
+    # Flush first so changes made since the last flush are collected too
+    session.flush()
+    plant_ids = session.info.pop(_PENDING_KEY, set())
+    plant_ids.discard(None)
+    if plant_ids:
+        refresh_search_vectors(plant_ids, session=session)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_changed_plants(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+if __name__ == "__main__":
+    """Rebuild every plant's search vector."""
+
+    from server import app
+
+    with app.app_context():
+        refresh_search_vectors()
+        db.session.commit()
+        print("Search vectors rebuilt!")
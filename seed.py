@@ -3,7 +3,8 @@
 import os
 from dotenv import load_dotenv
 from server import app
-from model import connect_to_db, db, Region, User, Plant, PlantCareDetails
+from model import connect_to_db, db, upgrade_schema, Region, User, Plant, PlantCareDetails
+import crud
 from datetime import datetime
 
 load_dotenv()
@@ -12,6 +13,7 @@ def create_tables():
     """Create database tables."""
     connect_to_db(app)
     db.create_all()
+    upgrade_schema()
     print("Tables created!")
 
 def add_regions():
@@ -73,6 +75,8 @@ def add_sample_plants():
         {
             "scientific_name": "Sansevieria trifasciata",
             "common_name": "Snake Plant",
+            "other_names": ["Mother-in-law's tongue", "Viper's bowstring hemp",
+                            "Saint George's sword"],
             "plant_type": "Houseplant",
             "origin": "West Africa",
             "description": "Succulent plant with stiff, upright leaves.",
@@ -84,7 +88,9 @@ def add_sample_plants():
     ]
     
     for plant_data in plants:
+        other_names = plant_data.pop("other_names", [])
         plant = Plant(**plant_data)
+        crud.add_plant_names(plant, other_names, source="sample_data")
         db.session.add(plant)
     
     db.session.commit()
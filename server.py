@@ -11,6 +11,21 @@ from werkzeug.utils import secure_filename
 import logging
 from dotenv import load_dotenv
 import crud
+from autocomplete import plant_name_index
+from search_service import FederatedSearchService
+from facets import plant_facets, FACETS, FACET_LABELS
+from pagination import cursor_source, paginate_list
+from catalog_mirror import catalog_status, start_catalog_sync
+from search_log import search_log, start_search_prefetch
+from image_hash import (hash_file, image_match_index, find_previous_identification,
+                        find_previous_assessment)
+from api.circuit_breaker import breaker_stats, is_available as provider_available
+from api.http_client import coalescing_stats
+from api.rate_limit import default_limiter
+from api.response_cache import default_cache
+from api.cassette import default_cassette
+from api.identification_cache import default_identification_cache
+from api.quantitative_plant import details_memo
 
 # Load environment variables
 load_dotenv()
@@ -40,12 +55,42 @@ logger = logging.getLogger(__name__)
 from model import connect_to_db
 connect_to_db(app)
 
+# Cached local + Trefle search used by /search-plants
+search_service = FederatedSearchService()
+# Plants committed by any route, e.g. /identify-plant, appear in the next search
+search_service.invalidate_on_commit()
+
 # Helper functions
 def allowed_file(filename):
     """Check if the file extension is allowed"""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def build_facet_links(active_facets, plant_type, counts):
+    """Return toggle links with live match counts for the browse page facets."""
+    links = []
+    for facet, label in FACET_LABELS.items():
+        active = facet in active_facets
+        toggled = [f for f in active_facets if f != facet] if active else active_facets + [facet]
+        params = {f: 1 for f in toggled}
+        if plant_type:
+            params['plant_type'] = plant_type
+        links.append({
+            'label': label,
+            'count': counts['facets'][facet],
+            'active': active,
+            'url': url_for('browse_plants', **params)
+        })
+    return links
+
+def next_page_url(next_cursor):
+    """Return the current page's URL advanced to the next cursor, if any."""
+    if not next_cursor:
+        return None
+    args = request.args.to_dict()
+    args['cursor'] = next_cursor
+    return url_for(request.endpoint, **args)
+
 # Routes
 @app.route('/')
 def homepage():
@@ -147,39 +192,52 @@ def identify_plant():
             file_path = os.path.join(app.config['UPLOAD_FOLDER'], user_filename)
             file.save(file_path)
             
-            # Call the Plant.id API
-            from api.plant_id import identify_plant, map_identification_result
+            # Call the Plant.id API; a re-uploaded photo is answered from the
+            # identification cache, and an open circuit fails at once
+            from api.plant_id import identify_and_map_plant
             
             try:
-                # Identify the plant
-                identification_result = identify_plant(file_path)
-                
-                if 'error' in identification_result:
-                    flash(f"Error identifying plant: {identification_result['error']}")
-                    return redirect('/identify')
-                
-                # Map the result to our model structure
-                plant_data = map_identification_result(identification_result)
-                
-                if not plant_data:
-                    flash("Could not identify the plant. Please try with a clearer image.")
-                    return redirect('/identify')
-                
-                # Look for matching plant in database
-                plant = crud.get_plant_by_scientific_name(plant_data['scientific_name'])
+                # A resized or recompressed copy of an earlier photo reuses its result
+                image_hash = hash_file(file_path)
+                previous = find_previous_identification(image_hash)
+                plant = db.session.get(Plant, previous.identified_plant_id) if previous else None
                 
-                # If not found, create a new plant entry
-                if not plant:
-                    # Import the data merger
+                if plant:
+                    plant_data = {
+                        'scientific_name': plant.scientific_name,
+                        'common_names': [plant.common_name] if plant.common_name else [],
+                        'confidence_score': previous.confidence_score or 0.0,
+                        'gbif_id': plant.gbif_id,
+                        'api_source': 'plant_id'
+                    }
+                else:
+                    # Identify the plant and map the result to our model structure
+                    identification_result, plant_data = identify_and_map_plant(file_path)
+                    
+                    if 'error' in identification_result:
+                        flash(f"Error identifying plant: {identification_result['error']}")
+                        return redirect('/identify')
+                    
+                    if not plant_data:
+                        flash("Could not identify the plant. Please try with a clearer image.")
+                        return redirect('/identify')
+                    
+                    # Match on the accepted GBIF taxon so synonyms reuse the same plant,
+                    # creating a new plant entry if there is none
                     from data_merger import find_or_create_plant
-                    plant = find_or_create_plant(scientific_name=plant_data['scientific_name'])
+                    plant = find_or_create_plant(scientific_name=plant_data['scientific_name'],
+                                                 gbif_id=plant_data.get('gbif_id'))
+                    
+                    # Keep every vernacular name so later searches resolve locally
+                    crud.add_plant_names(plant, plant_data.get('common_names'), source='plant_id')
                 
                 # Create identification history record
                 identification = crud.create_identification(
                     user_id=session['user_id'],
                     image_url=f"/static/uploads/{user_filename}",
                     identified_plant_id=plant.plant_id,
-                    confidence_score=plant_data.get('confidence_score', 0.0)
+                    confidence_score=plant_data.get('confidence_score', 0.0),
+                    image_hash=image_hash
                 )
                 
                 return render_template('identification_results.html', 
@@ -195,6 +253,73 @@ def identify_plant():
     
     return render_template('identify.html')
 
+@app.route('/identify-and-assess', methods=['POST'])
+def identify_and_assess_plant():
+    """Identify a plant and check its health from one photo, adding it to the collection."""
+    if 'user_id' not in session:
+        flash('Please log in to identify plants.')
+        return redirect('/login')
+    
+    file = request.files.get('plant_image')
+    if not file or file.filename == '' or not allowed_file(file.filename):
+        flash('Please choose an image of your plant.')
+        return redirect('/identify')
+    
+    filename = secure_filename(file.filename)
+    user_filename = f"{session['user_id']}_{datetime.utcnow().timestamp()}_{filename}"
+    file_path = os.path.join(app.config['UPLOAD_FOLDER'], user_filename)
+    file.save(file_path)
+    image_url = f"/static/uploads/{user_filename}"
+    
+    from api.plant_id import identify_and_assess_plant as identify_and_assess
+    from api.plant_health import map_health_assessment
+    from data_merger import find_or_create_plant
+    
+    try:
+        # One decode and encode, with both Plant.id calls in flight together
+        identification_result, plant_data, health_result = identify_and_assess(file_path)
+        
+        if 'error' in identification_result:
+            flash(f"Error identifying plant: {identification_result['error']}")
+            return redirect('/identify')
+        
+        if not plant_data:
+            flash("Could not identify the plant. Please try with a clearer image.")
+            return redirect('/identify')
+        
+        plant = find_or_create_plant(scientific_name=plant_data['scientific_name'],
+                                     gbif_id=plant_data.get('gbif_id'))
+        crud.add_plant_names(plant, plant_data.get('common_names'), source='plant_id')
+        
+        if 'error' in health_result:
+            app.logger.warning(f"Health assessment API error: {health_result.get('error')}")
+            api_result = None
+            assessment_result = {'diagnosis': 'Health check unavailable',
+                                 'treatment_recommendations': 'Try a health check again later'}
+        else:
+            api_result = assessment_result = map_health_assessment(health_result)
+        
+        image_hash = hash_file(file_path)
+        identification, assessment = crud.create_identification_with_assessment(
+            user_id=session['user_id'],
+            image_url=image_url,
+            identified_plant_id=plant.plant_id,
+            confidence_score=plant_data.get('confidence_score', 0.0),
+            symptoms=assessment_result.get('symptoms', []),
+            diagnosis=assessment_result.get('diagnosis'),
+            treatment_recommendations=assessment_result.get('treatment_recommendations'),
+            image_hash=image_hash,
+            api_result=api_result
+        )
+        
+        flash(f"Identified as {plant.common_name or plant.scientific_name}: {assessment.diagnosis}")
+        return redirect(f'/user-plant/{assessment.user_plant_id}')
+    
+    except Exception as e:
+        app.logger.error(f"Error in plant identification and health assessment: {str(e)}")
+        flash("An error occurred during identification. Please try again.")
+        return redirect('/identify')
+
 @app.route('/my-plants')
 def my_plants():
     """Show user's plant collection."""
@@ -203,9 +328,11 @@ def my_plants():
         return redirect('/login')
     
     user = db.session.get(User, session['user_id'])
-    user_plants = UserPlant.query.filter_by(user_id=user.user_id).all()
+    user_plants, next_cursor = crud.get_user_plants_page(user.user_id, request.args.get('cursor'))
     
-    return render_template('my_plants.html', user=user, user_plants=user_plants)
+    return render_template('my_plants.html', user=user, user_plants=user_plants,
+                          next_url=next_page_url(next_cursor),
+                          is_first_page=not request.args.get('cursor'))
 
 @app.route('/add-plant', methods=['GET', 'POST'])
 def add_plant():
@@ -234,9 +361,17 @@ def add_plant():
         flash('Plant added to your collection!')
         return redirect('/my-plants')
     
-    # Get all plants to display in a dropdown
-    plants = Plant.query.all()
-    return render_template('add_plant.html', plants=plants)
+    # The plant picker is a typeahead backed by /api/plants/autocomplete
+    return render_template('add_plant.html')
+
+@app.route('/api/plants/autocomplete')
+def autocomplete_plants():
+    """Return plants whose name starts with the typed prefix as JSON."""
+    query = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    
+    plant_name_index.ensure_built()
+    return jsonify(plant_name_index.search(query, limit=limit))
 
 @app.route('/browse-plants')
 def browse_plants():
@@ -244,17 +379,39 @@ def browse_plants():
     # Get search parameter
     search = request.args.get('search', '')
     page = int(request.args.get('page', 1))
+    active_facets = [facet for facet in FACETS if request.args.get(facet)]
+    plant_type = request.args.get('plant_type', '')
+    cursor = request.args.get('cursor')
+    next_cursor = None
+    facet_links = []
+    facet_counts = None
     
     try:
+        # Facet counts come from in-memory bitmaps, so they are cheap to show on every view
+        plant_facets.ensure_built()
+        selection = plant_facets.select(active_facets, plant_type)
+        facet_counts = plant_facets.facet_counts(selection)
+        if plant_type:
+            # Keep the other types selectable by counting them without the type filter
+            facet_counts['plant_types'] = plant_facets.facet_counts(
+                plant_facets.select(active_facets))['plant_types']
+        facet_links = build_facet_links(active_facets, plant_type, facet_counts)
+        
         if search:
-            # Search local database first
-            local_plants = Plant.query.filter(
-                (Plant.common_name.ilike(f'%{search}%')) | 
-                (Plant.scientific_name.ilike(f'%{search}%'))
-            ).limit(20).all()
+            # Search local database first, best matches first
+            local_plants = crud.search_plants(search, limit=20)
             
-            # If few results, supplement with API search
+            # Then descriptions, care details and health issues
             if len(local_plants) < 10:
+                found_ids = {plant.plant_id for plant in local_plants}
+                for plant in crud.full_text_search_plants(search, limit=20):
+                    if plant.plant_id not in found_ids and len(local_plants) < 20:
+                        local_plants.append(plant)
+            
+            local_count = len(local_plants)
+            
+            # If few results, supplement with API search unless Perenual is down
+            if len(local_plants) < 10 and provider_available('perenual'):
                 try:
                     from api.perenual import search_plants as perenual_search
                     api_plants = perenual_search(search)
@@ -275,38 +432,28 @@ def browse_plants():
                     logger.warning(f"API search failed: {e}")
             
             plants = local_plants
+            search_log.record(search, 'browse', len(plants), local_count,
+                              user_id=session.get('user_id'))
+        elif active_facets or plant_type:
+            # Faceted browsing reads only the matching rows, a page at a time
+            plants, next_cursor = crud.get_faceted_plants_page(selection, cursor)
         else:
-            # Load popular plants from API
-            try:
-                from api.perenual import get_plant_list
-                api_response = get_plant_list(page=page)
-                plants = []
-                
-                if api_response and 'data' in api_response:
-                    for plant_data in api_response['data']:
-                        # Create plant objects for display
-                        api_plant = {
-                            'plant_id': f"api_{plant_data.get('id', 0)}",
-                            'scientific_name': plant_data.get('scientific_name', ['Unknown'])[0] if plant_data.get('scientific_name') else 'Unknown',
-                            'common_name': plant_data.get('common_name', 'Unknown'),
-                            'image_url': plant_data.get('default_image', {}).get('small_url') if plant_data.get('default_image') else None,
-                            'description': f"A {plant_data.get('type', 'plant')} from our plant database.",
-                            'is_api_result': True
-                        }
-                        plants.append(type('Plant', (), api_plant)())
-                else:
-                    # Fall back to local database
-                    plants = Plant.query.limit(20).all()
-            except Exception as e:
-                logger.error(f"API request failed: {e}")
-                # Fall back to local database
-                plants = Plant.query.limit(20).all()
+            # Popular plants come from the local Perenual mirror, never the API itself
+            plants, next_cursor = crud.get_catalog_page(cursor)
+            if not plants and cursor_source(cursor) != 'catalog':
+                # Mirror not synced yet; page through our own plants instead
+                plants, next_cursor = crud.get_plants_page(cursor)
                 
     except Exception as e:
         logger.error(f"Error in browse_plants: {e}")
+        # A failed statement aborts the transaction; the fallback needs a fresh one
+        db.session.rollback()
         plants = Plant.query.limit(20).all()
     
-    return render_template('browse_plants.html', plants=plants, search=search, page=page)
+    return render_template('browse_plants.html', plants=plants, search=search, page=page,
+                          facet_links=facet_links, facet_counts=facet_counts,
+                          active_facets=active_facets, plant_type=plant_type,
+                          next_url=next_page_url(next_cursor))
 
 @app.route('/plant/<int:plant_id>')
 def plant_details(plant_id):
@@ -430,6 +577,7 @@ def add_health_assessment():
     
     # Process image upload if provided
     image_url = None
+    image_hash = None
     assessment_result = None
     
     if 'image' in request.files and request.files['image'].filename:
@@ -442,18 +590,29 @@ def add_health_assessment():
             file.save(file_path)
             image_url = f"/static/uploads/{user_filename}"
             
-            # Use Plant.health API for automated assessment
+            # Use Plant.health API for automated assessment; while it is down
+            # the assessment is saved from the form alone
             try:
                 from api.plant_health import assess_health, map_health_assessment
                 
-                # Assess plant health
-                health_result = assess_health(file_path)
+                # A near-duplicate of an earlier photo of this plant reuses that assessment
+                image_hash = hash_file(file_path)
+                previous = find_previous_assessment(image_hash, user_plant.user_plant_id)
                 
-                if 'error' not in health_result:
-                    # Map health assessment to our model structure
-                    assessment_result = map_health_assessment(health_result)
+                if previous:
+                    assessment_result = previous.api_result
                 else:
-                    app.logger.warning(f"Health assessment API error: {health_result.get('error')}")
+                    # Assess plant health
+                    if provider_available('plant_id'):
+                        health_result = assess_health(file_path)
+                    else:
+                        health_result = {'error': 'Plant.id is temporarily unavailable'}
+                    
+                    if 'error' not in health_result:
+                        # Map health assessment to our model structure
+                        assessment_result = map_health_assessment(health_result)
+                    else:
+                        app.logger.warning(f"Health assessment API error: {health_result.get('error')}")
             except Exception as e:
                 app.logger.error(f"Error in health assessment: {str(e)}")
     
@@ -487,6 +646,9 @@ def add_health_assessment():
         diagnosis=diagnosis,
         treatment_recommendations=treatment_recommendations,
         image_url=image_url,
+        # Only a Plant.id result is worth reusing for a near-duplicate photo
+        api_result=assessment_result,
+        image_hash=image_hash if assessment_result else None,
         resolved=False
     )
     
@@ -569,67 +731,52 @@ def search_plants():
     if not query:
         return render_template('search_plants.html', plants=None, query=None)
     
-    # First search the local database (limit to 100 plants)
-    db_plants = crud.search_plants(query, limit=100)
+    # Local name and full-text matches, topped up from Trefle; cached per query
+    formatted_plants = search_service.search(query)
     
-    # Format database plants for display
-    formatted_plants = []
-    for plant in db_plants:
-        # Get care details if they exist
-        care_details = PlantCareDetails.query.filter_by(plant_id=plant.plant_id).first()
-        
-        formatted_plants.append({
-            'in_database': True,
-            'plant_id': plant.plant_id,
-            'scientific_name': plant.scientific_name,
-            'common_name': plant.common_name,
-            'image_url': plant.image_url,
-            'care_details': {
-                'sunlight_requirements': care_details.sunlight_requirements if care_details else None,
-                'watering_frequency': care_details.watering_frequency if care_details else None,
-                'difficulty_level': care_details.difficulty_level if care_details else None
-            } if care_details else None
-        })
+    if not request.args.get('cursor'):
+        local_count = sum(1 for plant in formatted_plants if plant['in_database'])
+        search_log.record(query, 'search', len(formatted_plants), local_count,
+                          user_id=session['user_id'])
     
-    # If we have fewer than 50 results from the database, supplement with Trefle API
-    if len(formatted_plants) < 50:
-        try:
-            # Import Trefle API search function
-            from api.quantitative_plant import search_plants as search_trefle_plants
-            
-            # Search Trefle API
-            logger.info(f"Searching Trefle API for: {query}")
-            trefle_results = search_trefle_plants(query)
-            
-            if trefle_results and 'data' in trefle_results:
-                # Process the first 10 results from Trefle
-                for plant_data in trefle_results['data'][:10]:
-                    # Check if this plant is already in our formatted results (avoid duplicates)
-                    scientific_name = plant_data.get('scientific_name')
-                    if scientific_name and not any(p['scientific_name'] == scientific_name for p in formatted_plants):
-                        # Extract image URL if available
-                        image_url = None
-                        if 'image_url' in plant_data and plant_data['image_url']:
-                            image_url = plant_data['image_url']
-                        
-                        # Add to formatted plants
-                        formatted_plants.append({
-                            'in_database': False,
-                            'plant_id': plant_data.get('id'),
-                            'scientific_name': scientific_name,
-                            'common_name': plant_data.get('common_name', 'Unknown'),
-                            'image_url': image_url,
-                            'care_details': None,  # We'll fetch this only when importing to save API calls
-                            'api_source': 'trefle'
-                        })
-            
-        except Exception as e:
-            logger.error(f"Error searching Trefle API: {str(e)}")
-            # If Trefle API fails, we still have the database results
+    # Page through the cached results by the key of the last plant shown
+    page_plants, next_cursor = paginate_list(
+        formatted_plants, request.args.get('cursor'), per_page=24,
+        key=lambda plant: (plant.get('api_source', 'local'), plant['plant_id'])
+    )
     
-    return render_template('search_plants.html', plants=formatted_plants, query=query)
+    return render_template('search_plants.html', plants=page_plants, query=query,
+                          total=len(formatted_plants), next_url=next_page_url(next_cursor))
+
+@app.route('/api/search/stats')
+def search_stats():
+    """Return search cache statistics for monitoring."""
+    return jsonify(search_service.stats())
+
+@app.route('/api/providers/status')
+def providers_status():
+    """Return breaker, rate limiter, coalescing, cache and cassette state for monitoring."""
+    limiter = default_limiter()
+    cache = default_cache()
+    identification_cache = default_identification_cache()
+    cassette = default_cassette()
+    return jsonify({
+        'circuit_breakers': breaker_stats(),
+        'rate_limiter': limiter.stats() if limiter else None,
+        'single_flight': coalescing_stats(),
+        'response_cache': cache.stats() if cache else None,
+        'identification_cache': identification_cache.stats() if identification_cache else None,
+        'image_matches': image_match_index.stats(),
+        'cassette': cassette.stats() if cassette else None
+    })
+
+@app.route('/api/catalog/status')
+def catalog_mirror_status():
+    """Return the size and freshness of the Perenual catalog mirror."""
+    return jsonify(catalog_status())
 
 @app.route('/import-plant', methods=['POST'])
+@details_memo()
 def import_plant():
     """Import a plant from Trefle API or database."""
     if 'user_id' not in session:
@@ -645,8 +792,9 @@ def import_plant():
         return redirect('/search-plants')
     
     try:
-        # First check if plant already exists in database
-        existing_plant = Plant.query.filter_by(scientific_name=scientific_name).first()
+        # First check if plant already exists in database, under any synonym
+        from taxonomy import find_plant
+        existing_plant, _ = find_plant(scientific_name)
         
         if existing_plant:
             flash(f'{existing_plant.common_name or existing_plant.scientific_name} is already in the database!')
@@ -655,58 +803,15 @@ def import_plant():
         # Import the plant based on the API source
         if api_source == 'trefle' and external_id:
             # Import from Trefle API
-            from api.quantitative_plant import get_plant_details, get_growth_data, map_growth_data_to_model
+            from data_merger import import_trefle_plant
+            new_plant = import_trefle_plant(external_id, scientific_name)
             
-            # Get plant details from Trefle
-            logger.info(f"Fetching plant details from Trefle API for ID: {external_id}")
-            plant_details = get_plant_details(external_id)
-            
-            if not plant_details or 'data' not in plant_details:
+            if not new_plant:
                 flash('Error importing plant: Could not retrieve plant details.')
                 return redirect('/search-plants')
             
-            # Extract plant data
-            plant_data = plant_details['data']
-            
-            # Create plant record
-            new_plant = Plant(
-                scientific_name=plant_data.get('scientific_name', scientific_name),
-                common_name=plant_data.get('common_name', 'Unknown'),
-                description=plant_data.get('family_common_name', '') or f"A plant in the {plant_data.get('family', 'plant')} family.",
-                indoor=True,  # Default to indoor for now
-                data_sources=['trefle']
-            )
-            
-            # Add image URL if available
-            if 'image_url' in plant_data and plant_data['image_url']:
-                new_plant.image_url = plant_data['image_url']
-            
-            db.session.add(new_plant)
-            db.session.flush()  # Get ID without committing
-            
-            # Try to get care details
-            try:
-                growth_data = get_growth_data(external_id)
-                if growth_data and 'error' not in growth_data:
-                    care_model = map_growth_data_to_model(growth_data)
-                    
-                    # Create care details
-                    care_details = PlantCareDetails(
-                        plant_id=new_plant.plant_id,
-                        watering_frequency='Weekly',  # Default
-                        sunlight_requirements=care_model.get('sunlight_requirements', []),
-                        soil_preferences=care_model.get('soil_preferences', 'Well-draining potting mix'),
-                        temperature_range=care_model.get('temperature_range'),
-                        pruning_frequency='As needed',
-                        propagation_methods=['Division', 'Cuttings'],
-                        difficulty_level=care_model.get('difficulty_level', 'Moderate')
-                    )
-                    db.session.add(care_details)
-            except Exception as e:
-                logger.error(f"Error importing care details: {str(e)}")
-                # Continue with import even if care details fail
-            
-            db.session.commit()
+            # Cached searches still list this plant as an API result
+            search_service.invalidate()
             flash(f'Successfully imported {new_plant.common_name or new_plant.scientific_name}!')
             return redirect(f'/plant/{new_plant.plant_id}')
             
@@ -716,6 +821,7 @@ def import_plant():
             plant = find_or_create_plant(scientific_name=scientific_name)
             
             if plant:
+                search_service.invalidate()
                 flash(f'Successfully imported {plant.common_name or plant.scientific_name}!')
                 return redirect(f'/plant/{plant.plant_id}')
             else:
@@ -744,4 +850,11 @@ def server_error(e):
     return render_template('500.html'), 500
 
 if __name__ == "__main__":
+    # Warm the autocomplete index so the first typeahead request is fast
+    with app.app_context():
+        plant_name_index.build_from_db()
+    # The reloader runs this block twice; only the serving process runs workers
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_catalog_sync(app)
+        start_search_prefetch(app, on_import=search_service.invalidate)
     app.run(host="0.0.0.0", debug=True, port=5001)
@@ -48,6 +48,58 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // Plant name typeahead for the add plant page
+    const plantSearch = document.getElementById('plant_search');
+    const plantIdInput = document.getElementById('plant_id');
+    const suggestions = document.getElementById('plant_suggestions');
+    
+    if (plantSearch && plantIdInput && suggestions) {
+        let debounceTimer = null;
+        
+        plantSearch.addEventListener('input', function() {
+            // Typing invalidates any earlier pick
+            plantIdInput.value = '';
+            clearTimeout(debounceTimer);
+            
+            const query = this.value.trim();
+            if (!query) {
+                suggestions.innerHTML = '';
+                return;
+            }
+            
+            debounceTimer = setTimeout(function() {
+                fetch('/api/plants/autocomplete?q=' + encodeURIComponent(query))
+                    .then(function(response) { return response.json(); })
+                    .then(function(plants) {
+                        suggestions.innerHTML = '';
+                        plants.forEach(function(plant) {
+                            const item = document.createElement('button');
+                            item.type = 'button';
+                            item.className = 'list-group-item list-group-item-action';
+                            item.textContent = plant.common_name
+                                ? plant.common_name + ' (' + plant.scientific_name + ')'
+                                : plant.scientific_name;
+                            item.addEventListener('click', function() {
+                                plantSearch.value = item.textContent;
+                                plantIdInput.value = plant.plant_id;
+                                plantSearch.classList.remove('is-invalid');
+                                suggestions.innerHTML = '';
+                            });
+                            suggestions.appendChild(item);
+                        });
+                    });
+            }, 150);
+        });
+        
+        // The hidden id is what the server needs, so block submits without a pick
+        plantSearch.form.addEventListener('submit', function(event) {
+            if (!plantIdInput.value) {
+                event.preventDefault();
+                plantSearch.classList.add('is-invalid');
+            }
+        });
+    }
+    
     // Tooltips initialization (for Bootstrap tooltips)
     const tooltipTriggerList = [].slice.call(document.querySelectorAll('[data-bs-toggle="tooltip"]'));
     const tooltipList = tooltipTriggerList.map(function (tooltipTriggerEl) {
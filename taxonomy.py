@@ -0,0 +1,254 @@
+"""Offline GBIF backbone taxonomy for resolving plant names locally.
+
+The GBIF backbone dump (Taxon.tsv from backbone.zip) has millions of
+rows. Only plant names at species rank and below are kept, streamed row
+by row into the gbif_taxa table in batches, so memory stays flat no
+matter how large the dump is. Identification results and imports then
+resolve synonyms and author-citation variants to one accepted GBIF taxon
+with a hash index lookup, without calling any provider.
+
+Usage:
+    python taxonomy.py path/to/Taxon.tsv
+"""
+
+import csv
+import logging
+import sys
+from collections import namedtuple
+from functools import lru_cache
+
+from sqlalchemy import case, insert
+from sqlalchemy.exc import SQLAlchemyError
+
+import crud
+from model import db, upgrade_schema, GbifTaxon, Plant
+
+logger = logging.getLogger(__name__)
+
+KEPT_RANKS = {'species', 'subspecies', 'variety', 'form'}
+
+# Infraspecific markers kept in canonical names, mapped to one spelling
+RANK_MARKERS = {
+    'subsp.': 'subsp.', 'ssp.': 'subsp.', 'subsp': 'subsp.', 'ssp': 'subsp.',
+    'var.': 'var.', 'var': 'var.',
+    'f.': 'f.', 'forma': 'f.', 'fo.': 'f.',
+}
+HYBRID_MARKERS = {'×', 'x'}
+
+BATCH_SIZE = 10000
+
+ResolvedTaxon = namedtuple('ResolvedTaxon', ['gbif_id', 'canonical_name'])
+
+
+class _NotFound(LookupError):
+    """Raised for names the backbone lacks, so lru_cache never remembers a miss."""
+
+
+def normalize_scientific_name(name):
+    """Reduce a scientific name to a lowercase canonical lookup key.
+
+    Author citations, hybrid signs and extra whitespace are dropped, so
+    "Dracaena trifasciata (Prain) Mabb." and "dracaena  trifasciata"
+    share the key "dracaena trifasciata".
+    """
+    if not name:
+        return ''
+    tokens = name.replace('×', ' × ').split()
+    if not tokens or not tokens[0][:1].isalpha():
+        return ''
+
+    parts = [tokens[0].lower()]
+    position = 1
+    while position < len(tokens):
+        token = tokens[position]
+        lowered = token.lower()
+        if lowered in HYBRID_MARKERS:
+            position += 1
+            continue
+        if lowered in RANK_MARKERS and position + 1 < len(tokens):
+            epithet = tokens[position + 1]
+            if not _is_epithet(epithet):
+                break
+            parts += [RANK_MARKERS[lowered], epithet.lower()]
+            position += 2
+            continue
+        # Epithets are lowercase; anything else starts the author citation
+        if len(parts) == 1 and _is_epithet(token):
+            parts.append(lowered)
+            position += 1
+            continue
+        break
+    return ' '.join(parts)
+
+
+def _is_epithet(token):
+    return token[:1].islower() and token.replace('-', '').isalpha()
+
+
+def parse_backbone(lines):
+    """Yield gbif_taxa rows for plant names in a GBIF backbone Taxon.tsv.
+
+    Args:
+        lines: Iterable of text lines, header first (e.g. an open file)
+    """
+    reader = csv.reader(lines, delimiter='\t', quoting=csv.QUOTE_NONE)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = {name: index for index, name in enumerate(header)}
+    required = ('taxonID', 'acceptedNameUsageID', 'scientificName', 'canonicalName',
+                'taxonRank', 'taxonomicStatus', 'kingdom')
+    missing = [name for name in required if name not in columns]
+    if missing:
+        raise ValueError(f"Not a GBIF backbone Taxon file, missing columns: {missing}")
+
+    for row in reader:
+        if len(row) < len(header):
+            continue
+        if row[columns['kingdom']] != 'Plantae':
+            continue
+        rank = row[columns['taxonRank']].lower()
+        if rank not in KEPT_RANKS:
+            continue
+
+        canonical_name = row[columns['canonicalName']] or row[columns['scientificName']]
+        normalized_name = normalize_scientific_name(canonical_name)
+        if not normalized_name:
+            continue
+
+        accepted_id = row[columns['acceptedNameUsageID']]
+        yield {
+            'taxon_id': int(row[columns['taxonID']]),
+            'accepted_taxon_id': int(accepted_id) if accepted_id else None,
+            'canonical_name': canonical_name[:255],
+            'normalized_name': normalized_name[:255],
+            'taxonomic_status': row[columns['taxonomicStatus']].lower() or None,
+            'taxon_rank': rank
+        }
+
+
+def ingest_backbone(path, batch_size=BATCH_SIZE):
+    """Replace the gbif_taxa table with the plants in a backbone dump.
+
+    Rows are inserted in batches of `batch_size`, each committed on its
+    own, so the dump is never held in memory. Needs an app context.
+
+    Returns:
+        Number of taxa loaded
+    """
+    # Remarks fields in the dump can exceed csv's default field limit
+    csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+    db.session.query(GbifTaxon).delete()
+    db.session.commit()
+
+    count = 0
+    batch = []
+    with open(path, encoding='utf-8', newline='') as backbone:
+        for row in parse_backbone(backbone):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                count += _insert_batch(batch)
+                batch = []
+                logger.info(f"Loaded {count} GBIF taxa")
+    if batch:
+        count += _insert_batch(batch)
+
+    clear_cache()
+    logger.info(f"Finished loading {count} GBIF taxa from {path}")
+    return count
+
+
+def _insert_batch(batch):
+    db.session.execute(insert(GbifTaxon), batch)
+    db.session.commit()
+    return len(batch)
+
+
+@lru_cache(maxsize=10000)
+def _resolve_name(normalized_name):
+    accepted_first = case((GbifTaxon.taxonomic_status == 'accepted', 0), else_=1)
+    taxon = (GbifTaxon.query
+             .filter(GbifTaxon.normalized_name == normalized_name)
+             .order_by(accepted_first, GbifTaxon.taxon_id)
+             .first())
+    return _accepted(taxon)
+
+
+@lru_cache(maxsize=10000)
+def _resolve_id(gbif_id):
+    return _accepted(db.session.get(GbifTaxon, gbif_id))
+
+
+def _accepted(taxon):
+    """Follow a synonym to its accepted taxon."""
+    if taxon is None:
+        # A miss may be filled by a later ingest, possibly in another process
+        raise _NotFound
+    if taxon.accepted_taxon_id and taxon.accepted_taxon_id != taxon.taxon_id:
+        accepted = db.session.get(GbifTaxon, taxon.accepted_taxon_id)
+        if accepted is not None:
+            taxon = accepted
+    return ResolvedTaxon(taxon.taxon_id, taxon.canonical_name)
+
+
+def resolve(scientific_name=None, gbif_id=None):
+    """Resolve a name or GBIF id to its accepted taxon.
+
+    Returns:
+        ResolvedTaxon, or None if the backbone has no match
+    """
+    try:
+        if gbif_id:
+            try:
+                return _resolve_id(int(gbif_id))
+            except _NotFound:
+                pass
+        normalized_name = normalize_scientific_name(scientific_name)
+        if normalized_name:
+            return _resolve_name(normalized_name)
+    except _NotFound:
+        pass
+    except SQLAlchemyError as e:
+        # A failed query aborts the transaction on PostgreSQL; leave the session usable
+        db.session.rollback()
+        logger.error(f"Error resolving taxon {scientific_name!r}: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error resolving taxon {scientific_name!r}: {str(e)}")
+    return None
+
+
+def clear_cache():
+    """Forget resolved names, e.g. after reloading the backbone."""
+    _resolve_name.cache_clear()
+    _resolve_id.cache_clear()
+
+
+def find_plant(scientific_name, gbif_id=None):
+    """Find an existing plant by accepted taxon, falling back to exact name.
+
+    Returns:
+        Tuple of (plant or None, ResolvedTaxon or None)
+    """
+    taxon = resolve(scientific_name, gbif_id)
+    plant = None
+    if taxon:
+        plant = (Plant.query.filter_by(gbif_id=taxon.gbif_id).first() or
+                 crud.get_plant_by_scientific_name(taxon.canonical_name))
+    if plant is None and scientific_name:
+        plant = crud.get_plant_by_scientific_name(scientific_name)
+    return plant, taxon
+
+
+if __name__ == '__main__':
+    from server import app
+
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+
+    with app.app_context():
+        db.create_all()
+        upgrade_schema()
+        ingest_backbone(sys.argv[1])
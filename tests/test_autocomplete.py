@@ -0,0 +1,84 @@
+import unittest
+import time
+from unittest import mock
+from autocomplete import PlantNameIndex, normalize_name
+
+class AutocompleteTests(unittest.TestCase):
+    def setUp(self):
+        """Build an index over a few sample plants."""
+        self.index = PlantNameIndex()
+        self.index.build([
+            (1, "Monstera deliciosa", "Swiss Cheese Plant"),
+            (2, "Ficus lyrata", "Fiddle Leaf Fig"),
+            (3, "Sansevieria trifasciata", "Snake Plant"),
+            (4, "Spathiphyllum wallisii", "Peace Lily"),
+        ])
+    
+    def test_normalize_name(self):
+        """Test accents, case and whitespace are normalized."""
+        self.assertEqual(normalize_name("  Café   AU lait "), "cafe au lait")
+        self.assertEqual(normalize_name(None), "")
+    
+    def test_prefix_search(self):
+        """Test scientific and common name prefixes match."""
+        self.assertEqual([p['plant_id'] for p in self.index.search("mon")], [1])
+        self.assertEqual([p['plant_id'] for p in self.index.search("FIDDLE")], [2])
+        self.assertEqual(self.index.search("xyz"), [])
+        self.assertEqual(self.index.search(""), [])
+    
+    def test_word_prefix_search(self):
+        """Test later words in a name match and plants are not repeated."""
+        results = self.index.search("plant")
+        self.assertEqual(sorted(p['plant_id'] for p in results), [1, 3])
+    
+    def test_limit(self):
+        """Test the number of results is bounded."""
+        self.assertEqual(len(self.index.search("s", limit=2)), 2)
+    
+    def test_incremental_updates(self):
+        """Test adding, renaming and removing plants."""
+        self.index.add_plant(5, "Epipremnum aureum", "Golden Pothos")
+        self.assertEqual(self.index.search("pothos")[0]['plant_id'], 5)
+        
+        self.index.add_plant(5, "Epipremnum aureum", "Devil's Ivy")
+        self.assertEqual(self.index.search("pothos"), [])
+        self.assertEqual(self.index.search("devil")[0]['plant_id'], 5)
+        
+        self.index.remove_plant(5)
+        self.assertEqual(self.index.search("epipremnum"), [])
+        self.assertEqual(len(self.index), 4)
+    
+    def test_committed_changes_and_rebuild(self):
+        """Test commit notifications update the index and an old index is rebuilt."""
+        self.index.apply_changes({5: ("Epipremnum aureum", "Golden Pothos"), 3: None})
+        self.assertEqual(self.index.search("pothos")[0]['plant_id'], 5)
+        self.assertEqual(self.index.search("snake"), [])
+        
+        now = [0.0]
+        index = PlantNameIndex(max_age=300, clock=lambda: now[0])
+        index.build_from_db = mock.Mock(side_effect=lambda: index.build([]))
+        index.apply_changes({1: ("Monstera deliciosa", None)})  # not built yet: ignored
+        self.assertEqual(len(index), 0)
+        index.ensure_built()
+        now[0] = 200
+        index.ensure_built()
+        self.assertEqual(index.build_from_db.call_count, 1)
+        now[0] = 301
+        index.ensure_built()
+        self.assertEqual(index.build_from_db.call_count, 2)
+    
+    def test_search_performance(self):
+        """Test lookups stay well under a millisecond on a large index."""
+        index = PlantNameIndex()
+        index.build((i, f"Genus{i % 997} species{i}", f"Common plant {i}") for i in range(100000))
+        
+        start_time = time.perf_counter()
+        for _ in range(100):
+            results = index.search("genus42", limit=10)
+        per_lookup = (time.perf_counter() - start_time) / 100
+        
+        self.assertEqual(len(results), 10)
+        self.assertLess(per_lookup, 0.001)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import requests
+from api import cassette as cassette_module
+from api.cassette import RECORD, REPLAY, Cassette, CassetteMiss
+from api.circuit_breaker import CircuitBreaker
+from api.http_client import ProviderClient
+from benchmarks import fake_providers
+
+class CassetteTests(unittest.TestCase):
+    def setUp(self):
+        """Record against the fake providers into a temporary cassette."""
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'providers.jsonl.gz')
+        self.server = fake_providers.start(seed=1, catalog_size=50)
+        self.clients = []
+    
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+    
+    def client(self, provider, cassette, base_url=None):
+        client = ProviderClient(provider, base_url or self.server.base_url(provider), retries=0,
+                                cache=False, limiter=False, breaker=CircuitBreaker(provider),
+                                cassette=cassette)
+        self.clients.append(client)
+        return client
+    
+    def record(self):
+        """Make a few Trefle and Plant.id calls in record mode and save the cassette."""
+        cassette = Cassette(self.path, RECORD)
+        trefle = self.client('trefle', cassette)
+        plant_id = self.client('plant_id', cassette)
+        bodies = [
+            trefle.get_json('/plants', params={'token': 'secret-token', 'page': 1, 'limit': 5}),
+            trefle.get_json('/plants/182512', params={'token': 'secret-token'}),
+            plant_id.post('/identify', json={'images': ['aGk=']}, headers={'Api-Key': 'secret-key'}).json(),
+        ]
+        cassette.save()
+        self.assertEqual(cassette.stats()['recorded'], 3)
+        return bodies
+    
+    def test_replay_matches_recording_without_network(self):
+        """Test a replayed run returns the recorded bodies with the server gone."""
+        recorded = self.record()
+        self.server.shutdown()
+        
+        cassette = Cassette(self.path, REPLAY)
+        # The real base URLs: nothing must be sent anywhere
+        trefle = self.client('trefle', cassette, base_url='https://trefle.io/api/v1')
+        plant_id = self.client('plant_id', cassette, base_url='https://api.plant.id/v2')
+        with mock.patch.object(requests.Session, 'request', side_effect=AssertionError('network')):
+            replayed = [
+                trefle.get_json('/plants', params={'limit': 5, 'page': 1, 'token': 'other-token'}),
+                trefle.get_json('/plants/182512', params={'token': 'other-token'}),
+                plant_id.post('/identify', json={'images': ['aGk=']}, headers={'Api-Key': 'k'}).json(),
+            ]
+            with self.assertRaises(CassetteMiss):
+                plant_id.post('/identify', json={'images': ['b3RoZXI=']})
+            with self.assertRaises(CassetteMiss):
+                trefle.get_json('/plants/190500', params={'token': 'x'})
+        
+        self.assertEqual(replayed, recorded)
+        self.assertEqual(cassette.stats()['replayed'], 3)
+        self.assertEqual(cassette.stats()['misses'], 2)
+    
+    def test_repeats_replay_in_order_and_keys_are_not_stored(self):
+        """Test repeated requests replay their responses in sequence, and no API key is saved."""
+        cassette = Cassette(self.path, RECORD)
+        perenual = self.client('perenual', cassette)
+        self.server.set_faults({'perenual': fake_providers.Faults(rate_per_minute=1, retry_after=3)})
+        statuses = [perenual.get('/species-list', params={'key': 'secret-key'}).status_code
+                    for _ in range(2)]
+        cassette.save()
+        self.assertEqual(statuses, [200, 429])
+        
+        replay = self.client('perenual', Cassette(self.path, REPLAY))
+        responses = [replay.get('/species-list', params={'key': 'x'}) for _ in range(3)]
+        self.assertEqual([response.status_code for response in responses], [200, 429, 429])
+        self.assertEqual(responses[1].headers['Retry-After'], '3')
+        with self.assertRaises(requests.HTTPError):
+            responses[1].raise_for_status()
+        
+        with gzip.open(self.path, 'rt', encoding='utf-8') as cassette_file:
+            self.assertNotIn('secret-key', cassette_file.read())
+    
+    def test_default_cassette_never_goes_live(self):
+        """Test an unreadable cassette replays nothing rather than falling back to the network."""
+        environ = {'PROVIDER_CASSETTE_MODE': 'replay', 'PROVIDER_CASSETTE_PATH': self.path}
+        with mock.patch.dict(os.environ, environ), \
+                mock.patch.object(cassette_module, '_default_cassette', None):
+            cassette = cassette_module.default_cassette()
+            self.assertTrue(cassette.replaying)
+            client = self.client('trefle', None)
+            self.assertIsNone(client.cache)
+            with self.assertRaises(CassetteMiss):
+                client.get_json('/plants/1', params={'token': 'x'}, ttl=60)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+from flask import Flask
+import catalog_mirror
+from catalog_mirror import map_species
+from model import db, CatalogSyncRun
+
+class MapSpeciesTests(unittest.TestCase):
+    def test_maps_species_list_entry(self):
+        """Test a Perenual species-list entry becomes a mirror row."""
+        synced_at = datetime(2024, 1, 1)
+        row = map_species({
+            'id': 1,
+            'common_name': 'European Silver Fir',
+            'scientific_name': ['Abies alba'],
+            'other_name': ['Common Silver Fir'],
+            'family': None,
+            'genus': 'Abies',
+            'default_image': {'small_url': 'https://example.com/fir.jpg'}
+        }, synced_at)
+        
+        self.assertEqual(row['perenual_id'], 1)
+        self.assertEqual(row['scientific_name'], 'Abies alba')
+        self.assertEqual(row['other_names'], ['Common Silver Fir'])
+        self.assertEqual(row['image_url'], 'https://example.com/fir.jpg')
+        self.assertEqual(row['synced_at'], synced_at)
+    
+    def test_handles_missing_fields(self):
+        """Test entries without names or images still map."""
+        row = map_species({'id': 2, 'common_name': None, 'default_image': None,
+                           'scientific_name': [], 'other_name': None}, datetime(2024, 1, 1))
+        
+        self.assertEqual(row['common_name'], 'Unknown')
+        self.assertIsNone(row['scientific_name'])
+        self.assertEqual(row['other_names'], [])
+        self.assertIsNone(row['image_url'])
+
+class ResumedSyncTests(unittest.TestCase):
+    def setUp(self):
+        """Use an in-memory SQLite database holding only the sync runs."""
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        CatalogSyncRun.__table__.create(db.engine)
+        
+        self.fetched = []
+        self.quota = 0
+        patches = [mock.patch('api.perenual.get_plant_list', side_effect=self.get_plant_list),
+                   mock.patch.object(catalog_mirror, 'upsert_species'),
+                   mock.patch.object(catalog_mirror, 'prune_species')]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.prune = catalog_mirror.prune_species
+    
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+    
+    def get_plant_list(self, page, size, revalidate=False):
+        """Serve a five page catalog, answering nothing once the run's quota is spent."""
+        if self.quota == 0:
+            return {'data': []}
+        self.quota -= 1
+        self.fetched.append(page)
+        return {'data': [{'id': page * 100 + n, 'common_name': 'Fir'} for n in range(3)],
+                'last_page': 5}
+    
+    def sync(self, quota):
+        self.quota = quota
+        return catalog_mirror.sync_catalog()
+    
+    def test_runs_resume_until_the_pass_completes(self):
+        """Test each run continues where the last stopped, and only a full pass prunes."""
+        first = self.sync(quota=2)
+        self.assertEqual((first.status, first.next_page), ('partial', 3))
+        self.assertEqual(self.sync(quota=0).status, 'failed')
+        second = self.sync(quota=2)
+        self.assertEqual((second.start_page, second.next_page), (3, 5))
+        self.prune.assert_not_called()
+        
+        third = self.sync(quota=2)
+        self.assertEqual((third.status, third.next_page), ('succeeded', None))
+        self.assertEqual(self.fetched, [1, 2, 3, 4, 5])
+        # Rows synced by every run of the pass survive; only older ones go
+        self.prune.assert_called_once_with(first.started_at)
+        
+        self.assertEqual(self.sync(quota=1).start_page, 1)
+    
+    def test_old_unfinished_pass_starts_over(self):
+        """Test a pass left unfinished for too long restarts from the first page."""
+        first = self.sync(quota=2)
+        first.pass_started_at -= catalog_mirror.MAX_PASS_AGE
+        db.session.commit()
+        self.assertEqual(catalog_mirror.resume_point(), (1, None))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import requests
+from api.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+from api.http_client import ProviderClient
+from benchmarks.http_pool_benchmark import start_stub
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+class CircuitBreakerTests(unittest.TestCase):
+    def setUp(self):
+        """Breaker that opens at half of 4 calls failing, or at 3 of 4 slow."""
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker('perenual', window=60, min_calls=4, failure_rate=0.5,
+                                      slow_call_seconds=2, slow_call_rate=0.75,
+                                      open_seconds=30, clock=self.clock)
+    
+    def test_opens_on_error_rate(self):
+        """Test the breaker opens once enough recent calls failed."""
+        self.breaker.record_success(0.1)
+        self.breaker.record_failure()
+        self.breaker.record_success(0.1)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.is_available())
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.allow()
+        self.assertEqual(self.breaker.stats()['rejected'], 1)
+    
+    def test_opens_on_slow_calls(self):
+        """Test the breaker opens when most calls are slow, even if they succeed."""
+        for _ in range(3):
+            self.breaker.record_success(2.5)
+        self.breaker.record_success(0.1)
+        self.assertEqual(self.breaker.state, OPEN)
+    
+    def test_old_outcomes_leave_the_window(self):
+        """Test failures older than the window no longer count."""
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 61
+        self.breaker.record_failure()
+        self.breaker.record_success(0.1)
+        self.breaker.record_success(0.1)
+        self.breaker.record_success(0.1)
+        self.assertEqual(self.breaker.state, CLOSED)
+    
+    def test_half_open_trial(self):
+        """Test one trial call goes through after the cool-down and decides the state."""
+        for _ in range(4):
+            self.breaker.record_failure()
+        self.clock.now += 30
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        
+        self.breaker.allow()
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.allow()  # only one trial at a time
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        
+        self.clock.now += 30
+        self.breaker.allow()
+        self.breaker.record_success(0.1)
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.stats()['times_opened'], 2)
+
+class BreakerClientTests(unittest.TestCase):
+    def setUp(self):
+        self.server = start_stub()
+        self.breaker = CircuitBreaker('stub', min_calls=2, failure_rate=0.5, open_seconds=60)
+        self.client = ProviderClient('stub', f"http://127.0.0.1:{self.server.server_address[1]}",
+                                     timeout=(1, 0.1), retries=0, cache=False, limiter=False,
+                                     breaker=self.breaker)
+    
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def test_timeouts_open_the_breaker(self):
+        """Test repeated timeouts open the breaker and later calls fail at once."""
+        self.server.delay = 0.5
+        for _ in range(2):
+            with self.assertRaises(requests.exceptions.Timeout):
+                self.client.get('/species-list')
+        with self.assertRaises(CircuitOpenError):
+            self.client.get('/species-list')
+        # Callers that catch RequestException handle an open circuit too
+        self.assertTrue(issubclass(CircuitOpenError, requests.exceptions.RequestException))
+
+if __name__ == "__main__":
+    unittest.main()
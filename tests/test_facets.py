@@ -0,0 +1,88 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from facets import FacetIndex, bitmap_ids, popcount
+
+def make_plant(plant_id, plant_type=None, **flags):
+    """Return a plant-like object with every flag defaulting to False."""
+    values = dict(indoor=False, outdoor=False, tropical=False, poisonous_to_humans=False,
+                  poisonous_to_pets=False, invasive=False, rare=False)
+    values.update(flags)
+    return SimpleNamespace(plant_id=plant_id, plant_type=plant_type, **values)
+
+class FacetIndexTests(unittest.TestCase):
+    def setUp(self):
+        """Index a handful of plants."""
+        self.index = FacetIndex()
+        self.index.build([
+            make_plant(1, "Houseplant", indoor=True, tropical=True),
+            make_plant(2, "Houseplant", indoor=True, poisonous_to_pets=True),
+            make_plant(3, "Shrub", outdoor=True, poisonous_to_humans=True),
+            make_plant(4, "Shrub", indoor=True, outdoor=True),
+            make_plant(5, None, indoor=None),
+        ])
+    
+    def test_bitmap_helpers(self):
+        """Test bit positions map back to plant ids."""
+        self.assertEqual(bitmap_ids(0b101010), [1, 3, 5])
+        self.assertEqual(bitmap_ids(0), [])
+        self.assertEqual(popcount(0b101010), 3)
+    
+    def test_large_sparse_bitmaps(self):
+        """Test ids far apart and across word boundaries, with and without a limit."""
+        plant_ids = [0, 63, 64, 127, 5000, 999999]
+        bitmap = sum(1 << plant_id for plant_id in plant_ids)
+        self.assertEqual(bitmap_ids(bitmap), plant_ids)
+        self.assertEqual(bitmap_ids(bitmap, limit=3), [0, 63, 64])
+        self.assertEqual(bitmap_ids(bitmap, limit=0), [])
+        self.assertEqual(popcount(bitmap), 6)
+        self.assertEqual(popcount((1 << 100000) - 1), 100000)
+    
+    def test_filter_matches_crud_semantics(self):
+        """Test filters mirror the SQL filters in crud.filter_plants."""
+        self.assertEqual(bitmap_ids(self.index.filter(indoor=True)), [1, 2, 4])
+        self.assertEqual(bitmap_ids(self.index.filter(indoor=False)), [3])
+        self.assertEqual(bitmap_ids(self.index.filter(plant_type="Shrub", outdoor=True)), [3, 4])
+        self.assertEqual(bitmap_ids(self.index.filter(poisonous=True)), [2, 3])
+        self.assertEqual(bitmap_ids(self.index.filter()), [1, 2, 3, 4, 5])
+    
+    def test_and_or_combinations(self):
+        """Test flag bitmaps combine with & and |."""
+        either = self.index.flag('tropical') | self.index.flag('outdoor')
+        self.assertEqual(bitmap_ids(either), [1, 3, 4])
+        self.assertEqual(bitmap_ids(either & self.index.flag('indoor')), [1, 4])
+    
+    def test_facet_counts(self):
+        """Test live counts within a selection."""
+        counts = self.index.facet_counts(self.index.select(['indoor']))
+        self.assertEqual(counts['total'], 3)
+        self.assertEqual(counts['facets']['outdoor'], 1)
+        self.assertEqual(counts['facets']['pet_safe'], 2)
+        self.assertEqual(counts['plant_types'], {"Houseplant": 2, "Shrub": 1})
+    
+    def test_incremental_updates(self):
+        """Test changed and removed plants are reflected."""
+        self.index.add_plant(make_plant(2, "Vine", outdoor=True))
+        self.assertEqual(bitmap_ids(self.index.flag('indoor')), [1, 4])
+        self.assertEqual(bitmap_ids(self.index.plant_type("Vine")), [2])
+        self.assertEqual(bitmap_ids(self.index.plant_type("Houseplant")), [1])
+        
+        self.index.remove_plant(3)
+        self.assertEqual(bitmap_ids(self.index.flag('outdoor')), [2, 4])
+        self.assertNotIn(3, bitmap_ids(self.index.select()))
+    
+    def test_committed_changes_and_rebuild(self):
+        """Test commit notifications update the bitmaps and an old index is rebuilt."""
+        self.index.apply_changes({6: make_plant(6, "Vine", indoor=True), 1: None})
+        self.assertEqual(bitmap_ids(self.index.flag('indoor')), [2, 4, 6])
+        
+        now = [0.0]
+        index = FacetIndex(max_age=300, clock=lambda: now[0])
+        index.build_from_db = mock.Mock(side_effect=lambda: index.build([]))
+        index.ensure_built()
+        now[0] = 301
+        index.ensure_built()
+        self.assertEqual(index.build_from_db.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
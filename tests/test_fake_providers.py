@@ -0,0 +1,94 @@
+import os
+import unittest
+from unittest import mock
+import requests
+from api.circuit_breaker import CircuitBreaker
+from api.http_client import ProviderClient, base_url_for
+from benchmarks import fake_providers
+from benchmarks.fake_providers import Faults
+
+class FakeProvidersTests(unittest.TestCase):
+    def setUp(self):
+        self.server = fake_providers.start(seed=1, catalog_size=50)
+        self.clients = {}
+    
+    def tearDown(self):
+        for client in self.clients.values():
+            client.close()
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def client(self, provider):
+        """Return a client for one provider of the fake server, without retries or caching."""
+        if provider not in self.clients:
+            self.clients[provider] = ProviderClient(
+                provider, self.server.base_url(provider), retries=0, cache=False, limiter=False,
+                breaker=CircuitBreaker(provider), timeout=(1, 0.5))
+        return self.clients[provider]
+    
+    def test_fixture_endpoints(self):
+        """Test each provider's endpoints answer in the provider's own format."""
+        trefle = self.client('trefle')
+        page = trefle.get_json('/plants', params={'token': 'x', 'page': 2, 'limit': 20})
+        self.assertEqual((len(page['data']), page['meta']['total']), (20, 50))
+        self.assertIn('next', page['links'])
+        found = trefle.get_json('/plants/search', params={'token': 'x', 'q': 'monstera'})
+        self.assertEqual([plant['scientific_name'] for plant in found['data']], ["Monstera deliciosa"])
+        details = trefle.get_json('/plants/182512', params={'token': 'x'})
+        self.assertEqual(details['data']['main_species']['growth']['light'], 5)
+        # IDs outside the fixtures get a fixture record under that ID
+        self.assertEqual(trefle.get_json('/plants/424242', params={'token': 'x'})['data']['id'], 424242)
+        
+        perenual = self.client('perenual')
+        species = perenual.get_json('/species-list', params={'key': 'x', 'q': 'snake'})
+        self.assertEqual(species['data'][0]['id'], 721)
+        care = perenual.get_json('/plants/721/care', params={'key': 'x'})
+        self.assertEqual(care['data'][0]['section'][0]['type'], 'watering')
+        
+        response = self.client('plant_id').post('/identify', json={'images': ['aGk=']},
+                                                headers={'Api-Key': 'x'})
+        self.assertEqual(response.json()['suggestions'][0]['plant_details']['gbif_id'], 2768832)
+        
+        self.assertEqual(trefle.get('/plants/1').status_code, 401)
+        self.assertEqual(self.server.stats()['trefle']['/plants/{id}'], {'200': 2, '401': 1})
+    
+    def test_injected_faults(self):
+        """Test errors, throttling and the per-minute limit are served as configured."""
+        self.server.set_faults({'trefle': Faults(error_rate=1.0),
+                                'perenual': Faults(rate_per_minute=2, retry_after=7),
+                                'plant_id': Faults(throttle_rate=1.0)})
+        
+        self.assertIn(self.client('trefle').get('/plants/1', params={'token': 'x'}).status_code,
+                      (500, 502, 503))
+        statuses = [self.client('perenual').get('/species-list', params={'key': 'x'}) for _ in range(3)]
+        self.assertEqual([response.status_code for response in statuses], [200, 200, 429])
+        self.assertEqual(statuses[2].headers['Retry-After'], '7')
+        response = self.client('plant_id').post('/health_assessment', json={'images': ['aGk=']},
+                                                headers={'Api-Key': 'x'})
+        self.assertEqual(response.status_code, 429)
+    
+    def test_latency_and_timeouts(self):
+        """Test hung requests time out, and the latency draw is reproducible."""
+        self.server.set_faults(Faults(timeout_rate=1.0, timeout_seconds=1))
+        with self.assertRaises(requests.exceptions.Timeout):
+            self.client('trefle').get('/plants/1', params={'token': 'x'})
+        
+        draws = []
+        for _ in range(2):
+            server = fake_providers.FakeProviderServer(
+                ('127.0.0.1', 0), faults=Faults(latency_ms=100, distribution='lognormal'), seed=5)
+            draws.append([server.draw('trefle')[1] for _ in range(20)])
+            server.server_close()
+        self.assertEqual(draws[0], draws[1])
+        self.assertTrue(0.02 < sorted(draws[0])[10] < 0.5)
+    
+    def test_base_url_override(self):
+        """Test <PROVIDER>_BASE_URL points a provider at the fake server."""
+        with mock.patch.dict(os.environ, self.server.environ()):
+            self.assertEqual(base_url_for('trefle', 'https://trefle.io/api/v1'),
+                             self.server.base_url('trefle'))
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(base_url_for('plant_id'), 'https://api.plant.id/v2')
+
+if __name__ == "__main__":
+    unittest.main()
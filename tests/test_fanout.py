@@ -0,0 +1,59 @@
+import asyncio
+import time
+import unittest
+from api import fanout
+from api.rate_limit import batch_priority, current_mode, BATCH
+
+def slow(value, seconds=0.2):
+    time.sleep(seconds)
+    return value
+
+def failing():
+    raise ValueError('provider down')
+
+class FanOutTests(unittest.TestCase):
+    def test_calls_run_concurrently(self):
+        """Test three slow calls take about as long as one."""
+        start = time.perf_counter()
+        results, failed = fanout.fan_out({
+            'perenual': lambda: slow('p'),
+            'trefle': lambda: slow('t'),
+            'care': lambda: slow('c'),
+        })
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(results, {'perenual': 'p', 'trefle': 't', 'care': 'c'})
+        self.assertEqual(failed, {})
+    
+    def test_shared_deadline(self):
+        """Test calls that miss the deadline are reported failed without waiting for them."""
+        start = time.perf_counter()
+        results, failed = fanout.fan_out({
+            'fast': lambda: slow('f', 0.01),
+            'slow': lambda: slow('s', 1.0),
+            'broken': failing,
+        }, timeout=0.2)
+        self.assertLess(time.perf_counter() - start, 0.6)
+        self.assertEqual(results, {'fast': 'f'})
+        self.assertIsInstance(failed['slow'], asyncio.TimeoutError)
+        self.assertIsInstance(failed['broken'], ValueError)
+    
+    def test_context_is_kept(self):
+        """Test pool threads see the caller's rate limit priority."""
+        with batch_priority():
+            results, _ = fanout.fan_out({'mode': current_mode})
+        self.assertEqual(results['mode'], (BATCH, True))
+    
+    def test_work_overlaps_started_calls(self):
+        """Test work done before awaiting overlaps calls already started."""
+        async def search():
+            started = fanout.call(slow, 'api')
+            local = slow('local')
+            found, _ = await fanout.gather({'api': started})
+            return local, found['api']
+        
+        start = time.perf_counter()
+        self.assertEqual(fanout.run(search()), ('local', 'api'))
+        self.assertLess(time.perf_counter() - start, 0.35)
+
+if __name__ == "__main__":
+    unittest.main()
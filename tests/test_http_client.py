@@ -0,0 +1,56 @@
+import unittest
+from unittest import mock
+import requests
+from api.http_client import ProviderClient, get_client
+from api.plant_image_apis import PlantImageFetcher
+from benchmarks.http_pool_benchmark import start_stub
+
+class ProviderClientTests(unittest.TestCase):
+    def setUp(self):
+        """Start a local keep-alive stub server."""
+        self.server = start_stub()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+    
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def test_connections_are_reused(self):
+        """Test repeated calls share one pooled connection."""
+        client = ProviderClient('stub', self.base_url)
+        for page in range(5):
+            response = client.get('/species-list', params={'page': page})
+            self.assertEqual(response.json()['data'][0]['common_name'], 'Snake Plant')
+        client.close()
+        self.assertEqual(self.server.connections, 1)
+    
+    def test_default_read_timeout(self):
+        """Test a slow provider times out instead of hanging."""
+        self.server.delay = 0.5
+        client = ProviderClient('stub', self.base_url, timeout=(1, 0.1), retries=0)
+        with self.assertRaises(requests.exceptions.Timeout):
+            client.get('/species-list')
+        client.close()
+    
+    def test_urls(self):
+        """Test paths join the base URL and absolute URLs pass through."""
+        client = ProviderClient('stub', 'https://example.com/api/v2/')
+        self.assertEqual(client.url('/species-list'), 'https://example.com/api/v2/species-list')
+        self.assertEqual(client.url('species-list'), 'https://example.com/api/v2/species-list')
+        self.assertEqual(client.url('https://other.example.com/x'), 'https://other.example.com/x')
+    
+    def test_clients_are_shared_per_provider(self):
+        """Test every module gets the same client for a provider."""
+        self.assertIs(get_client('trefle'), get_client('trefle'))
+        self.assertIsNot(get_client('trefle'), get_client('perenual'))
+    
+    def test_image_fetcher_keeps_its_endpoint(self):
+        """Test the image fetcher still calls Perenual's unversioned species list."""
+        fetcher = PlantImageFetcher(perenual_key='key')
+        image = {'data': [{'default_image': {'original_url': 'https://example.com/rose.jpg'}}]}
+        with mock.patch.object(fetcher.perenual_client, 'get_json', return_value=image) as get_json:
+            self.assertEqual(fetcher.get_best_image('rose'), 'https://example.com/rose.jpg')
+        self.assertEqual(get_json.call_args[0][0], 'https://perenual.com/api/species-list')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import requests
+from api.identification_cache import IdentificationCache
+from api.plant_id import PlantDotIDAPI
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+class IdentificationCacheTests(unittest.TestCase):
+    def setUp(self):
+        """Give the API a private cache and a fake Plant.id endpoint."""
+        self.directory = tempfile.mkdtemp()
+        self.clock = FakeClock()
+        self.cache = IdentificationCache(os.path.join(self.directory, 'identifications.sqlite3'),
+                                         ttl=3600, clock=self.clock)
+        self.api = PlantDotIDAPI(api_key='test-key', cache=self.cache)
+        self.response = {'suggestions': [{
+            'plant_name': "Dracaena trifasciata",
+            'probability': 0.93,
+            'plant_details': {'common_names': ["Snake plant"], 'gbif_id': 2768832,
+                              'taxonomy': {'family': "Asparagaceae", 'genus': "Dracaena"}}
+        }]}
+        self.api.client = mock.Mock()
+        self.api.client.post.return_value.json.return_value = self.response
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_same_bytes_call_plant_id_once(self):
+        """Test a re-uploaded image is answered from the cache with the mapped result."""
+        first = self.api.identify_and_map(b'same photo bytes')
+        second = self.api.identify_and_map(b'same photo bytes')
+        
+        self.assertEqual(self.api.client.post.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(second[0], self.response)
+        self.assertEqual(second[1]['scientific_name'], "Dracaena trifasciata")
+        self.assertEqual(second[1]['gbif_id'], 2768832)
+    
+    def test_different_images_and_expiry(self):
+        """Test other images miss, and entries expire after the TTL."""
+        self.api.identify_plant(b'photo one')
+        self.api.identify_plant(b'photo two')
+        self.assertEqual(self.api.client.post.call_count, 2)
+        
+        self.clock.now += 3601
+        self.api.identify_plant(b'photo one')
+        self.assertEqual(self.api.client.post.call_count, 3)
+    
+    def test_failures_are_not_cached(self):
+        """Test a failed call is retried on the next upload."""
+        self.api.client.post.side_effect = requests.exceptions.ConnectionError('down')
+        self.assertEqual(self.api.identify_and_map(b'photo'), (None, None))
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+if __name__ == "__main__":
+    unittest.main()
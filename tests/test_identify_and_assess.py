@@ -0,0 +1,78 @@
+import base64
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from PIL import Image
+import requests
+import api.image_prep
+from api.plant_id import identify_and_assess_plant
+
+IDENTIFY_RESPONSE = {'suggestions': [{'plant_name': "Ficus lyrata", 'probability': 0.88,
+                                      'plant_details': {'common_names': ["Fiddle-leaf fig"]}}]}
+HEALTH_RESPONSE = {'health_assessment': {'is_healthy': False, 'diseases': [
+    {'name': "Root rot", 'probability': 0.7, 'treatment': {'overview': "Repot in dry soil"}}]}}
+
+@mock.patch.dict('os.environ', {'PLANT_ID_API_KEY': 'test-key', 'IDENTIFICATION_CACHE_DISABLED': '1'})
+class IdentifyAndAssessTests(unittest.TestCase):
+    def setUp(self):
+        """Write a photo and answer both Plant.id endpoints from one mock client."""
+        self.directory = tempfile.mkdtemp()
+        self.image_path = os.path.join(self.directory, 'ficus.jpg')
+        Image.new('RGB', (2400, 1800), (40, 120, 60)).save(self.image_path, 'JPEG')
+        
+        # Each call waits for the other, so they only complete if sent concurrently
+        self.both_in_flight = threading.Barrier(2, timeout=5)
+        self.client = mock.Mock()
+        self.client.post.side_effect = self.post
+        patches = [mock.patch('api.plant_id.get_client', return_value=self.client),
+                   mock.patch('api.plant_health.client', self.client),
+                   mock.patch('api.plant_health.PLANT_ID_API_KEY', 'test-key')]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def post(self, path, json=None, **kwargs):
+        self.both_in_flight.wait()
+        response = mock.Mock()
+        response.json.return_value = IDENTIFY_RESPONSE if path == '/identify' else HEALTH_RESPONSE
+        return response
+    
+    def test_one_encode_and_concurrent_calls(self):
+        """Test both calls get the same prepared image and are in flight together."""
+        with mock.patch('api.plant_id.encode_image', wraps=api.image_prep.encode_image) as encode:
+            result, plant_data, health_result = identify_and_assess_plant(self.image_path)
+        
+        self.assertEqual(encode.call_count, 1)
+        self.assertEqual(result, IDENTIFY_RESPONSE)
+        self.assertEqual(plant_data['scientific_name'], "Ficus lyrata")
+        self.assertEqual(health_result, HEALTH_RESPONSE)
+        
+        bodies = {call.args[0]: call.kwargs['json'] for call in self.client.post.call_args_list}
+        self.assertEqual(bodies['/identify']['images'], bodies['/health_assessment']['images'])
+        with Image.open(io.BytesIO(base64.b64decode(bodies['/identify']['images'][0]))) as image:
+            self.assertEqual(max(image.size), api.image_prep.DEFAULT_MAX_EDGE)
+    
+    def test_health_failure_keeps_identification(self):
+        """Test a failed health assessment is reported without losing the identification."""
+        def post(path, json=None, **kwargs):
+            if path == '/health_assessment':
+                raise requests.exceptions.ConnectionError('reset')
+            response = mock.Mock()
+            response.json.return_value = IDENTIFY_RESPONSE
+            return response
+        self.client.post.side_effect = post
+        
+        result, plant_data, health_result = identify_and_assess_plant(self.image_path)
+        self.assertEqual(result, IDENTIFY_RESPONSE)
+        self.assertEqual(plant_data['scientific_name'], "Ficus lyrata")
+        self.assertIn('error', health_result)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from PIL import Image
+from image_hash import (ImageMatchIndex, MultiIndexHash, dhash, hamming, hash_file,
+                        MATCH_DISTANCE)
+from benchmarks.image_hash_benchmark import make_photo
+
+class DHashTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.photo = make_photo(random.Random(1))
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_resized_and_recompressed_copies_match(self):
+        """Test a downscaled, recompressed copy stays within the match distance."""
+        original = os.path.join(self.directory, 'original.png')
+        copy = os.path.join(self.directory, 'copy.jpg')
+        self.photo.save(original)
+        self.photo.resize((320, 240), Image.LANCZOS).save(copy, 'JPEG', quality=50)
+        
+        distance = hamming(int(hash_file(original), 16), int(hash_file(copy), 16))
+        self.assertLessEqual(distance, MATCH_DISTANCE)
+    
+    def test_unrelated_photos_differ(self):
+        """Test different photos are far apart."""
+        other = make_photo(random.Random(2))
+        self.assertGreater(hamming(dhash(self.photo), dhash(other)), MATCH_DISTANCE)
+    
+    def test_unreadable_file(self):
+        """Test a file that is not an image has no hash."""
+        path = os.path.join(self.directory, 'notes.jpg')
+        with open(path, 'wb') as f:
+            f.write(b'not an image')
+        self.assertIsNone(hash_file(path))
+
+class MultiIndexHashTests(unittest.TestCase):
+    def test_matches_a_linear_scan(self):
+        """Test radius lookups find exactly what a full scan finds."""
+        rng = random.Random(3)
+        stored = [rng.getrandbits(64) for _ in range(2000)]
+        # Near neighbours of a few stored hashes, at every distance up to 8
+        for distance in range(9):
+            value = stored[distance]
+            for bit in rng.sample(range(64), distance):
+                value ^= 1 << bit
+            stored.append(value)
+        
+        index = MultiIndexHash()
+        for position, value in enumerate(stored):
+            index.add(value, position)
+        
+        for radius in (0, 3, 6, 8):
+            for query in stored[:9]:
+                expected = sorted(position for position, value in enumerate(stored)
+                                  if hamming(query, value) <= radius)
+                found = sorted(position for _, position in index.search(query, radius))
+                self.assertEqual(found, expected)
+
+class ImageMatchIndexTests(unittest.TestCase):
+    def test_find_closest_first(self):
+        """Test lookups return earlier uploads closest first and count hits."""
+        index = ImageMatchIndex(max_distance=4)
+        index.build([(1, 'ffff0000ffff0000'), (2, 'ffff0000ffff0003'), (3, None)],
+                    [(7, '0123456789abcdef')])
+        index.add('identification', '00000000ffffffff', 4)
+        
+        self.assertEqual(index.find('identification', 'ffff0000ffff0001'), [1, 2])
+        self.assertEqual(index.find('health', '0123456789abcdef'), [7])
+        self.assertEqual(index.find('health', 'ffff0000ffff0000'), [])
+        self.assertEqual(index.find('identification', None), [])
+        
+        stats = index.stats()
+        self.assertEqual((stats['identifications'], stats['hits'], stats['misses']), (3, 2, 1))
+    
+    def test_committed_uploads_and_rebuild(self):
+        """Test committed uploads are indexed once and a stale index rebuilds."""
+        now = [0.0]
+        index = ImageMatchIndex(max_distance=4, max_age=300, clock=lambda: now[0])
+        index.apply_changes('identification', {1: 'ffff0000ffff0000'})  # not built yet: ignored
+        self.assertFalse(index.built)
+        
+        index.build([(1, 'ffff0000ffff0000')], [])
+        index.apply_changes('identification', {1: 'ffff0000ffff0000', 2: 'ffff0000ffff0001'})
+        index.apply_changes('health', {7: None, 8: '0123456789abcdef'})
+        self.assertEqual(index.find('identification', 'ffff0000ffff0000'), [1, 2])
+        self.assertEqual(index.find('health', '0123456789abcdef'), [8])
+        
+        rebuilds = []
+        index.build_from_db = lambda: rebuilds.append(now[0])
+        index.ensure_built()
+        now[0] = 301.0
+        index.ensure_built()
+        self.assertEqual(rebuilds, [301.0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import base64
+import io
+import unittest
+from unittest import mock
+from PIL import Image
+from api.image_prep import EXIF_ORIENTATION, prepare_image
+from api.plant_id import PlantDotIDAPI
+
+def encode(image, image_format='JPEG', **options):
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+def gradient(size):
+    """Return an RGB image with detail in both directions."""
+    image = Image.linear_gradient('L').resize(size)
+    return Image.merge('RGB', (image, image.transpose(Image.ROTATE_90).resize(size), image))
+
+class PrepareImageTests(unittest.TestCase):
+    def test_downscales_to_max_edge(self):
+        """Test a large photo is shrunk to the max edge, keeping its aspect ratio."""
+        original = encode(gradient((4000, 3000)), quality=95)
+        prepared = prepare_image(original, max_edge=1000, quality=80)
+        
+        self.assertLess(len(prepared), len(original))
+        with Image.open(io.BytesIO(prepared)) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (1000, 750))
+    
+    def test_applies_exif_orientation(self):
+        """Test a photo taken on its side is sent upright."""
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = 6  # rotate 90 degrees clockwise to view
+        original = encode(gradient((300, 200)), exif=exif)
+        
+        with Image.open(io.BytesIO(prepare_image(original, max_edge=1000))) as image:
+            self.assertEqual(image.size, (200, 300))
+            self.assertEqual(image.getexif().get(EXIF_ORIENTATION, 1), 1)
+    
+    def test_webp_and_small_images(self):
+        """Test the WebP option, and that small upright JPEGs are sent unchanged."""
+        with Image.open(io.BytesIO(prepare_image(encode(gradient((2000, 1000))),
+                                                 max_edge=500, image_format='webp'))) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (500, 250)))
+        
+        small = encode(gradient((400, 300)), quality=60)
+        self.assertEqual(prepare_image(small, max_edge=1000, quality=85), small)
+    
+    def test_undecodable_data_is_sent_unchanged(self):
+        """Test data Pillow cannot read is passed through for the API to judge."""
+        self.assertEqual(prepare_image(b'not an image'), b'not an image')
+    
+    @mock.patch.dict('os.environ', {'PLANT_ID_MAX_EDGE': '800'})
+    def test_plant_id_uploads_prepared_image(self):
+        """Test the identify request carries the downscaled image."""
+        api = PlantDotIDAPI(api_key='test-key', cache=False)
+        api.client = mock.Mock()
+        api.client.post.return_value.json.return_value = {'suggestions': []}
+        
+        api.identify_plant(encode(gradient((3200, 2400)), quality=95))
+        
+        body = api.client.post.call_args.kwargs['json']
+        with Image.open(io.BytesIO(base64.b64decode(body['images'][0]))) as image:
+            self.assertEqual(image.size, (800, 600))
+
+if __name__ == "__main__":
+    unittest.main()
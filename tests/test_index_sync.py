@@ -0,0 +1,61 @@
+import unittest
+from flask import Flask
+from sqlalchemy import event
+from model import db, CatalogSyncRun
+import index_sync
+
+class OnCommitTests(unittest.TestCase):
+    def setUp(self):
+        """Watch sync runs in an in-memory SQLite database, recording what is published."""
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        CatalogSyncRun.__table__.create(db.engine)
+        
+        self.published = []
+        listeners = index_sync.on_commit('test_runs', CatalogSyncRun,
+                                         lambda run: run.status, self.published.append)
+        for name, listener in zip(('after_flush', 'after_commit', 'after_rollback'), listeners):
+            self.addCleanup(event.remove, db.session, name, listener)
+    
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+    
+    def test_commits_are_published(self):
+        """Test rows added, changed and deleted directly on the session are reported."""
+        run = CatalogSyncRun(status='running')
+        db.session.add(run)
+        db.session.commit()
+        run.status = 'succeeded'
+        db.session.commit()
+        db.session.delete(run)
+        db.session.commit()
+        self.assertEqual(self.published, [{1: 'running'}, {1: 'succeeded'}, {1: None}])
+    
+    def test_rollbacks_are_dropped(self):
+        """Test a rolled back transaction or savepoint publishes nothing of its own."""
+        db.session.add(CatalogSyncRun(status='rolled back'))
+        db.session.flush()
+        db.session.rollback()
+        
+        db.session.add(CatalogSyncRun(status='kept'))
+        with db.session.begin_nested():
+            db.session.add(CatalogSyncRun(status='released'))
+        try:
+            with db.session.begin_nested():
+                db.session.add(CatalogSyncRun(status='failed'))
+                db.session.flush()
+                raise ValueError('upsert failed')
+        except ValueError:
+            pass
+        self.assertEqual(self.published, [])
+        db.session.commit()
+        
+        self.assertEqual(len(self.published), 1)
+        self.assertEqual(sorted(self.published[0].values()), ['kept', 'released'])
+
+if __name__ == "__main__":
+    unittest.main()
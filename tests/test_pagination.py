@@ -0,0 +1,79 @@
+import unittest
+from pagination import cursor_source, encode_cursor, decode_cursor, make_page, paginate_list
+from facets import first_ids
+
+class PaginationTests(unittest.TestCase):
+    def test_cursor_round_trip(self):
+        """Test cursors decode back to the encoded sort key."""
+        cursor = encode_cursor(["Rosa canina", 42])
+        self.assertNotIn("Rosa", cursor)
+        self.assertEqual(decode_cursor(cursor, 2), ["Rosa canina", 42])
+    
+    def test_bad_cursor_starts_over(self):
+        """Test malformed or mismatched cursors are ignored."""
+        self.assertIsNone(decode_cursor(None, 2))
+        self.assertIsNone(decode_cursor("not a cursor!", 2))
+        self.assertIsNone(decode_cursor(encode_cursor([1]), 2))
+    
+    def test_cursor_value_types_and_ranges(self):
+        """Test cursors with wrongly typed or out-of-range values are ignored."""
+        self.assertEqual(decode_cursor(encode_cursor(["Rosa canina", 42]), 2, (str, int)),
+                         ["Rosa canina", 42])
+        self.assertIsNone(decode_cursor(encode_cursor(["x"]), 1, (int,)))
+        self.assertIsNone(decode_cursor(encode_cursor([True]), 1, (int,)))
+        self.assertIsNone(decode_cursor(encode_cursor([-1]), 1, (int,)))
+        self.assertIsNone(decode_cursor(encode_cursor([10 ** 12]), 1, (int,)))
+        self.assertIsNone(decode_cursor(encode_cursor([42, 42]), 2, (str, int)))
+        self.assertIsNone(decode_cursor(encode_cursor([None, 42]), 2, (str, int)))
+    
+    def test_cursors_from_another_list_are_ignored(self):
+        """Test a tagged cursor only seeks in the list it came from."""
+        catalog = encode_cursor(["Aloe", 7], source='catalog')
+        self.assertEqual(cursor_source(catalog), 'catalog')
+        self.assertEqual(decode_cursor(catalog, 2, (str, int), source='catalog'), ["Aloe", 7])
+        self.assertIsNone(decode_cursor(catalog, 2, (str, int), source='plants'))
+        self.assertIsNone(decode_cursor(encode_cursor(["Aloe", 7]), 2, (str, int), source='plants'))
+        self.assertIsNone(cursor_source(encode_cursor(["Aloe", 7])))
+        self.assertIsNone(cursor_source("not a cursor!"))
+        
+        _, next_cursor = make_page([1, 2, 3], 2, key=lambda n: (n,), source='plants')
+        self.assertEqual(decode_cursor(next_cursor, 1, source='plants'), [2])
+    
+    def test_make_page(self):
+        """Test the extra row only signals that a next page exists."""
+        page, next_cursor = make_page([1, 2, 3], 2, key=lambda n: (n,))
+        self.assertEqual(page, [1, 2])
+        self.assertEqual(decode_cursor(next_cursor, 1), [2])
+        self.assertEqual(make_page([1, 2], 2, key=lambda n: (n,)), ([1, 2], None))
+    
+    def test_paginate_list(self):
+        """Test walking a cached list page by page."""
+        items = [{'source': 'local', 'id': i} for i in range(5)]
+        key = lambda item: (item['source'], item['id'])
+        
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = paginate_list(items, cursor, 2, key)
+            seen.extend(item['id'] for item in page)
+            if not cursor:
+                break
+        self.assertEqual(seen, [0, 1, 2, 3, 4])
+        
+        # An item dropped from a refreshed list does not restart the pages
+        gone = encode_cursor(['local', 99])
+        self.assertEqual(paginate_list(items, gone, 2, key), ([], None))
+        self.assertEqual(paginate_list(items, "not a cursor!", 2, key), ([], None))
+    
+    def test_first_ids(self):
+        """Test reading a page of ids from a facet bitmap."""
+        bitmap = sum(1 << i for i in (3, 5, 8, 13, 21))
+        self.assertEqual(first_ids(bitmap, 2), [3, 5])
+        self.assertEqual(first_ids(bitmap, 2, after=5), [8, 13])
+        self.assertEqual(first_ids(bitmap, 10, after=21), [])
+        # Ids past the highest set bit never build a mask that large
+        self.assertEqual(first_ids(bitmap, 10, after=10 ** 12), [])
+        self.assertEqual(first_ids(bitmap, 2, after=-5), [3, 5])
+
+if __name__ == '__main__':
+    unittest.main()
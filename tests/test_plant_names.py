@@ -0,0 +1,40 @@
+import unittest
+from types import SimpleNamespace
+import crud
+
+class AddPlantNamesTests(unittest.TestCase):
+    def setUp(self):
+        """Use a plant-like object with a snake plant common name."""
+        self.plant = SimpleNamespace(common_name="Snake Plant", names=[])
+    
+    def test_adds_normalized_names(self):
+        """Test names are stored with a normalized lookup key."""
+        added = crud.add_plant_names(self.plant, ["Mother-in-law's Tongue", "  Sansevière  "],
+                                     source='plant_id')
+        
+        self.assertEqual([name.name for name in added], ["Mother-in-law's Tongue", "Sansevière"])
+        self.assertEqual([name.normalized_name for name in added],
+                         ["mother-in-law's tongue", "sanseviere"])
+        self.assertEqual(added[0].source, 'plant_id')
+        self.assertEqual(self.plant.names, added)
+    
+    def test_skips_duplicates_and_blanks(self):
+        """Test known names, repeats and blanks are not added twice."""
+        crud.add_plant_names(self.plant, ["Mother-in-law's tongue"], source='plant_id')
+        added = crud.add_plant_names(self.plant, ["MOTHER-IN-LAW'S TONGUE", "snake plant", "", None,
+                                                  "Viper's bowstring hemp", "viper's bowstring hemp"],
+                                     source='perenual')
+        
+        self.assertEqual([name.name for name in added], ["Viper's bowstring hemp"])
+        self.assertEqual(len(self.plant.names), 2)
+    
+    def test_languages_are_separate(self):
+        """Test the same name can be recorded in another language."""
+        crud.add_plant_names(self.plant, ["Sansevieria"], source='trefle', language='en')
+        added = crud.add_plant_names(self.plant, ["Sansevieria"], source='trefle', language='fr')
+        
+        self.assertEqual(len(added), 1)
+        self.assertEqual(added[0].language, 'fr')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import threading
+import time
+import unittest
+from unittest import mock
+import plant_service
+import trefle_api
+from plant_service import PlantService
+
+class FakeTrefle:
+    """Search hits with slow detail lookups, recording how many run at once."""
+    
+    def __init__(self, count, delay=0.1, failing=()):
+        self.count = count
+        self.delay = delay
+        self.failing = failing
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+    
+    def search_plants(self, query):
+        return {'data': [{'id': plant_id, 'scientific_name': f"Ficus species{plant_id}"}
+                         for plant_id in range(1, self.count + 1)]}
+    
+    def get_plant_by_id(self, plant_id):
+        with self.lock:
+            self.calls.append(plant_id)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        if plant_id in self.failing:
+            raise RuntimeError('connection reset')
+        return {'data': {'image_url': f"https://example.com/{plant_id}.jpg"}}
+
+@mock.patch.object(plant_service, 'Plant')
+@mock.patch.object(plant_service, 'db')
+class SearchAndCreatePlantsTests(unittest.TestCase):
+    def setUp(self):
+        self.plants = []
+    
+    def new_plant(self, Plant):
+        """Make Plant() return a fresh mock with no stored care details."""
+        Plant.query.filter_by.return_value.first.return_value = None
+        def create():
+            plant = mock.Mock(care_details=True)
+            self.plants.append(plant)
+            return plant
+        Plant.side_effect = create
+    
+    def test_details_fetched_concurrently_and_committed_once(self, db, Plant):
+        """Test detail lookups overlap up to the worker bound and share one commit."""
+        self.new_plant(Plant)
+        trefle = FakeTrefle(8)
+        
+        start = time.perf_counter()
+        plants = PlantService(trefle).search_and_create_plants('ficus', limit=8)
+        elapsed = time.perf_counter() - start
+        
+        self.assertEqual(len(plants), 8)
+        self.assertEqual(sorted(trefle.calls), list(range(1, 9)))
+        self.assertEqual(trefle.max_in_flight, PlantService.DETAIL_WORKERS)
+        self.assertLess(elapsed, 8 * trefle.delay * 0.6)
+        self.assertEqual(db.session.begin_nested.call_count, 8)
+        self.assertEqual(db.session.commit.call_count, 1)
+        self.assertEqual(plants[2].image_url, "https://example.com/3.jpg")
+    
+    def test_failures_only_skip_their_plant(self, db, Plant):
+        """Test a failed lookup or upsert does not lose the rest of the batch."""
+        self.new_plant(Plant)
+        trefle = FakeTrefle(4, delay=0, failing={2})
+        original = PlantService._create_or_update_plant_from_trefle
+        def upsert(service, trefle_data, *args, **kwargs):
+            if trefle_data['id'] == 3:
+                raise ValueError('value too long for type character varying(100)')
+            return original(service, trefle_data, *args, **kwargs)
+        
+        with mock.patch.object(PlantService, '_create_or_update_plant_from_trefle', upsert):
+            plants = PlantService(trefle).search_and_create_plants('ficus')
+        
+        self.assertEqual([plant.scientific_name for plant in plants],
+                         ["Ficus species1", "Ficus species2", "Ficus species4"])
+        # The failed lookup is saved without details rather than fetched again
+        self.assertEqual(sorted(trefle.calls), [1, 2, 3, 4])
+        self.assertIsInstance(plants[1].image_url, mock.Mock)
+        self.assertEqual(db.session.commit.call_count, 1)
+    
+    def test_trefle_api_service_shares_the_prefetch(self, db, Plant):
+        """Test the PlantService in trefle_api.py fetches details through the same helper."""
+        self.new_plant(Plant)
+        trefle = FakeTrefle(6)
+        with mock.patch.object(trefle_api, 'Plant', Plant), mock.patch.object(trefle_api, 'db', db):
+            plants = trefle_api.PlantService(trefle).search_and_create_plants('ficus')
+        
+        self.assertEqual(len(plants), 6)
+        self.assertEqual(trefle.max_in_flight, trefle_api.PlantService.DETAIL_WORKERS)
+        self.assertEqual(db.session.commit.call_count, 1)
+    
+    def test_slow_lookups_miss_the_shared_deadline(self, db, Plant):
+        """Test plants whose lookups outlast the deadline are saved without details."""
+        self.new_plant(Plant)
+        trefle = FakeTrefle(2, delay=0.05)
+        slow = trefle.get_plant_by_id
+        trefle.get_plant_by_id = lambda plant_id: slow(plant_id) if plant_id == 1 else time.sleep(1)
+        service = PlantService(trefle)
+        service.DETAIL_DEADLINE = 0.3
+        
+        start = time.perf_counter()
+        plants = service.search_and_create_plants('ficus')
+        
+        self.assertLess(time.perf_counter() - start, 0.9)
+        self.assertEqual(len(plants), 2)
+        self.assertEqual(plants[0].image_url, "https://example.com/1.jpg")
+        self.assertIsInstance(plants[1].image_url, mock.Mock)
+
+if __name__ == "__main__":
+    unittest.main()
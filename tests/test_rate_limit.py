@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import unittest
+from api.http_client import ProviderClient
+from api.rate_limit import (Limit, QuotaExhausted, RateLimited, RateLimiter, batch_priority,
+                            current_mode, BATCH, INTERACTIVE)
+from benchmarks.http_pool_benchmark import start_stub
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.now += seconds
+
+class RateLimiterTests(unittest.TestCase):
+    def setUp(self):
+        """Use a fresh state file with a fake clock: 60/minute, burst 5, 20 a day."""
+        self.directory = tempfile.mkdtemp()
+        self.clock = FakeClock()
+        self.limits = {'perenual': Limit(rate_per_minute=60, burst=5, daily_quota=20)}
+        self.limiter = RateLimiter(os.path.join(self.directory, 'limits.sqlite3'), self.limits,
+                                   clock=self.clock, sleep=self.clock.sleep)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_burst_then_fail_fast(self):
+        """Test the burst is available at once and the next call fails fast."""
+        for _ in range(5):
+            self.limiter.acquire('perenual', 'key')
+        with self.assertRaises(RateLimited) as raised:
+            self.limiter.acquire('perenual', 'key')
+        self.assertAlmostEqual(raised.exception.retry_after, 1.0)
+        
+        self.clock.now += 1
+        self.limiter.acquire('perenual', 'key')
+    
+    def test_blocking_waits_for_refill(self):
+        """Test blocking callers wait exactly as long as the refill needs."""
+        for _ in range(7):
+            self.limiter.acquire('perenual', 'key', block=True)
+        self.assertAlmostEqual(self.clock.now, 1002.0)
+        self.assertEqual(self.limiter.stats()['acquired'], 7)
+    
+    def test_batch_leaves_reserve_for_interactive(self):
+        """Test batch calls stop short of the burst, leaving tokens for users."""
+        with batch_priority(block=False):
+            self.assertEqual(current_mode(), (BATCH, False))
+            for _ in range(4):
+                self.limiter.acquire('perenual', 'key')
+            with self.assertRaises(RateLimited):
+                self.limiter.acquire('perenual', 'key')
+        self.assertEqual(current_mode(), (INTERACTIVE, False))
+        self.limiter.acquire('perenual', 'key')
+    
+    def test_daily_quota(self):
+        """Test the daily quota holds back batch calls first, then everyone."""
+        with batch_priority():
+            for _ in range(16):
+                self.limiter.acquire('perenual', 'key')
+            with self.assertRaises(QuotaExhausted):
+                self.limiter.acquire('perenual', 'key')
+        for _ in range(4):
+            self.limiter.acquire('perenual', 'key', block=True)
+        with self.assertRaises(QuotaExhausted):
+            self.limiter.acquire('perenual', 'key', block=True)
+        
+        self.clock.now += 24 * 3600
+        self.limiter.acquire('perenual', 'key')
+        self.assertEqual(self.limiter.status('perenual', 'key')['used_today'], 1)
+    
+    def test_buckets_per_key_and_shared_across_instances(self):
+        """Test keys have separate buckets and another process sees the same state."""
+        for _ in range(5):
+            self.limiter.acquire('perenual', 'key')
+        self.limiter.acquire('perenual', 'other-key')
+        
+        other = RateLimiter(self.limiter.path, self.limits, clock=self.clock)
+        with self.assertRaises(RateLimited):
+            other.acquire('perenual', 'key')
+        other.acquire('trefle', 'key')  # no configured limit
+    
+    def test_backoff_after_429(self):
+        """Test a 429 pauses the bucket for the Retry-After period."""
+        self.limiter.acquire('perenual', 'key')
+        self.limiter.backoff('perenual', 'key', retry_after=30)
+        with self.assertRaises(RateLimited) as raised:
+            self.limiter.acquire('perenual', 'key')
+        self.assertAlmostEqual(raised.exception.retry_after, 30)
+
+class LimitedClientTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.server = start_stub()
+        self.clock = FakeClock()
+        self.limiter = RateLimiter(os.path.join(self.directory, 'limits.sqlite3'),
+                                   {'stub': Limit(rate_per_minute=60, burst=2, daily_quota=None)},
+                                   clock=self.clock)
+        self.client = ProviderClient('stub', f"http://127.0.0.1:{self.server.server_address[1]}",
+                                     cache=False, limiter=self.limiter)
+    
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+    
+    def test_requests_take_tokens_per_key(self):
+        """Test client requests are limited per API key found in the params."""
+        self.client.get_json('/species-list', params={'key': 'a'})
+        self.client.get_json('/species-list', params={'key': 'a'})
+        with self.assertRaises(RateLimited):
+            self.client.get_json('/species-list', params={'key': 'a'})
+        self.client.get_json('/species-list', params={'key': 'b'})
+
+if __name__ == "__main__":
+    unittest.main()
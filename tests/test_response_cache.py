@@ -0,0 +1,222 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest import mock
+from api.circuit_breaker import CircuitBreaker
+from api.http_client import ProviderClient
+from api.response_cache import ResponseCache, make_key
+from benchmarks import fake_providers
+from benchmarks.http_pool_benchmark import start_stub
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+class ResponseCacheTests(unittest.TestCase):
+    def setUp(self):
+        """Use a fresh cache file with a fake clock."""
+        self.directory = tempfile.mkdtemp()
+        self.clock = FakeClock()
+        self.cache = ResponseCache(os.path.join(self.directory, 'cache.sqlite3'),
+                                   stale_ttl=100, clock=self.clock)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_keys_ignore_api_keys_and_order(self):
+        """Test API keys and parameter order do not split entries."""
+        self.assertEqual(make_key('trefle', '/plants', {'page': 1, 'token': 'a'}),
+                         make_key('trefle', '/plants', {'token': 'b', 'page': 1}))
+        self.assertNotEqual(make_key('trefle', '/plants', {'page': 1}),
+                            make_key('trefle', '/plants', {'page': 2}))
+    
+    def test_fresh_stale_and_expired(self):
+        """Test entries are fresh for the TTL, then stale, then gone."""
+        self.cache.set('trefle', '/plants/1', {}, {'data': {'id': 1}}, ttl=60)
+        self.assertEqual(self.cache.get('trefle', '/plants/1', {}), ({'data': {'id': 1}}, True))
+        
+        self.clock.now += 61
+        self.assertEqual(self.cache.get('trefle', '/plants/1', {}), ({'data': {'id': 1}}, False))
+        
+        self.clock.now += 100
+        self.assertIsNone(self.cache.get('trefle', '/plants/1', {}))
+        self.assertEqual(self.cache.stats()['stale_hits'], 1)
+    
+    def test_shared_between_instances(self):
+        """Test a second cache on the same file sees the entries, like another worker."""
+        self.cache.set('perenual', '/species-list', {'page': 1}, {'data': []}, ttl=60)
+        other = ResponseCache(self.cache.path, clock=self.clock)
+        self.assertEqual(other.get('perenual', '/species-list', {'page': 1}).body, {'data': []})
+    
+    def test_lru_eviction(self):
+        """Test the least recently used entries go first when over the size bound."""
+        cache = ResponseCache(self.cache.path, max_bytes=250, clock=self.clock)
+        body = {'data': 'x' * 90}
+        cache.set('trefle', '/a', {}, body, ttl=60)
+        self.clock.now += 120
+        cache.set('trefle', '/b', {}, body, ttl=600)
+        self.clock.now += 120
+        cache.get('trefle', '/a', {})  # /a is now more recently used than /b
+        self.clock.now += 120
+        cache.set('trefle', '/c', {}, body, ttl=600)
+        
+        self.assertIsNone(cache.get('trefle', '/b', {}))
+        self.assertIsNotNone(cache.get('trefle', '/c', {}))
+        self.assertGreater(cache.stats()['evictions'], 0)
+    
+    def test_evicts_on_a_write_cadence(self):
+        """Test writes under the bound only evict every EVICT_EVERY writes, using the stale_until index."""
+        self.cache.set('trefle', '/old', {}, {}, ttl=1)
+        self.clock.now += 200
+        with mock.patch('api.response_cache.EVICT_EVERY', 3):
+            self.cache.set('trefle', '/a', {}, {}, ttl=60)
+            self.assertEqual(self.cache.stats()['entries'], 2)  # /old is dead but not yet removed
+            self.cache.set('trefle', '/b', {}, {}, ttl=60)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+        self.assertEqual(self.cache.stats()['entries'], 2)
+        
+        plan = ' '.join(row[-1] for row in self.cache._connection().execute(
+            "EXPLAIN QUERY PLAN DELETE FROM responses WHERE stale_until <= 0"))
+        self.assertIn('ix_responses_stale_until', plan)
+    
+    def test_validators_and_touch(self):
+        """Test validators are stored with the body and touch restarts the TTL."""
+        self.cache.set('trefle', '/plants/1', {}, {'data': {'id': 1}}, ttl=60,
+                       etag='"abc"', last_modified='Tue, 13 Oct 2026 02:00:00 GMT')
+        self.assertEqual(self.cache.validators('trefle', '/plants/1', {}),
+                         ('"abc"', 'Tue, 13 Oct 2026 02:00:00 GMT'))
+        self.assertEqual(self.cache.validators('trefle', '/plants/2', {}), (None, None))
+        
+        self.clock.now += 61
+        self.assertTrue(self.cache.touch('trefle', '/plants/1', {}, ttl=60))
+        self.assertEqual(self.cache.get('trefle', '/plants/1', {}), ({'data': {'id': 1}}, True))
+        self.assertFalse(self.cache.touch('trefle', '/plants/2', {}, ttl=60))
+    
+    def test_adds_validator_columns_to_old_files(self):
+        """Test a cache file from before validators were stored is upgraded in place."""
+        path = os.path.join(self.directory, 'old.sqlite3')
+        connection = sqlite3.connect(path)
+        connection.executescript(
+            "CREATE TABLE responses (key TEXT PRIMARY KEY, provider TEXT NOT NULL, "
+            "endpoint TEXT NOT NULL, body TEXT NOT NULL, size INTEGER NOT NULL, "
+            "fetched_at REAL NOT NULL, expires_at REAL NOT NULL, stale_until REAL NOT NULL, "
+            "accessed_at REAL NOT NULL);")
+        connection.execute("INSERT INTO responses VALUES (?, 'trefle', '/a', '{}', 2, 1000, 2000, 3000, 1000)",
+                           (make_key('trefle', '/a', {}),))
+        connection.commit()
+        connection.close()
+        
+        cache = ResponseCache(path, clock=self.clock)
+        self.assertEqual(cache.get('trefle', '/a', {}).body, {})
+        self.assertEqual(cache.validators('trefle', '/a', {}), (None, None))
+        cache.set('trefle', '/b', {}, {}, ttl=60, etag='"b"')
+        self.assertEqual(cache.validators('trefle', '/b', {}), ('"b"', None))
+
+class CachedClientTests(unittest.TestCase):
+    def setUp(self):
+        """Point a client with its own cache at a local stub server."""
+        self.directory = tempfile.mkdtemp()
+        self.clock = FakeClock()
+        self.cache = ResponseCache(os.path.join(self.directory, 'cache.sqlite3'), clock=self.clock)
+        self.server = start_stub()
+        self.requests = 0
+        handler = self.server.RequestHandlerClass
+        original = handler.do_GET
+        
+        def counting_get(handler_self):
+            self.requests += 1
+            original(handler_self)
+        
+        handler.do_GET = counting_get
+        self.addCleanup(setattr, handler, 'do_GET', original)
+        self.client = ProviderClient('stub', f"http://127.0.0.1:{self.server.server_address[1]}",
+                                     cache=self.cache)
+    
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+    
+    def test_fresh_hits_skip_the_provider(self):
+        """Test a cached response is served without a request."""
+        first = self.client.get_json('/species-list', params={'page': 1}, ttl=60)
+        second = self.client.get_json('/species-list', params={'page': 1}, ttl=60)
+        self.assertEqual(first, second)
+        self.assertEqual(self.requests, 1)
+    
+    def test_stale_hits_refresh_in_background(self):
+        """Test a stale response is returned at once and refreshed behind it."""
+        self.client.get_json('/species-list', ttl=60)
+        self.clock.now += 61
+        
+        body = self.client.get_json('/species-list', ttl=60)
+        self.assertEqual(body['data'][0]['common_name'], 'Snake Plant')
+        for _ in range(100):
+            if self.requests == 2 and self.cache.get('stub', '/species-list').fresh:
+                break
+            time.sleep(0.02)
+        self.assertEqual(self.requests, 2)
+        self.assertTrue(self.cache.get('stub', '/species-list').fresh)
+    
+    def test_without_ttl_is_uncached(self):
+        """Test calls without a TTL always reach the provider."""
+        self.client.get_json('/species-list')
+        self.client.get_json('/species-list')
+        self.assertEqual(self.requests, 2)
+
+class ConditionalRequestTests(unittest.TestCase):
+    def setUp(self):
+        """Point a cached client at the fake Perenual, which sends validators."""
+        self.directory = tempfile.mkdtemp()
+        self.clock = FakeClock()
+        self.cache = ResponseCache(os.path.join(self.directory, 'cache.sqlite3'), clock=self.clock)
+        self.server = fake_providers.start(seed=1, catalog_size=50)
+        self.client = ProviderClient('perenual', self.server.base_url('perenual'), retries=0,
+                                     cache=self.cache, limiter=False,
+                                     breaker=CircuitBreaker('perenual'))
+        self.params = {'key': 'x', 'page': 1}
+    
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+    
+    def statuses(self):
+        return self.server.stats()['perenual']['/species-list']
+    
+    def test_revalidate_gets_not_modified(self):
+        """Test an expired entry is revalidated with a 304 and its TTL restarted."""
+        first = self.client.get_json('/species-list', params=self.params, ttl=60)
+        self.clock.now += 61
+        
+        second = self.client.get_json('/species-list', params=self.params, ttl=60, revalidate=True)
+        self.assertEqual(second, first)
+        self.assertEqual(self.statuses(), {'200': 1, '304': 1})
+        self.assertTrue(self.cache.get('perenual', '/species-list', self.params).fresh)
+        stats = self.cache.stats()
+        self.assertEqual((stats['revalidations'], stats['not_modified']), (1, 1))
+    
+    def test_background_refresh_is_conditional(self):
+        """Test the refresh behind a stale hit sends validators too."""
+        self.client.get_json('/species-list', params=self.params, ttl=60)
+        self.clock.now += 61
+        
+        body = self.client.get_json('/species-list', params=self.params, ttl=60)
+        self.assertEqual(len(body['data']), 30)
+        for _ in range(100):
+            if self.cache.stats()['not_modified'] == 1:
+                break
+            time.sleep(0.02)
+        self.assertEqual(self.statuses(), {'200': 1, '304': 1})
+        self.assertTrue(self.cache.get('perenual', '/species-list', self.params).fresh)
+
+if __name__ == "__main__":
+    unittest.main()
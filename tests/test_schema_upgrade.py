@@ -0,0 +1,39 @@
+import os
+import re
+import runpy
+import unittest
+from unittest import mock
+import model
+from model import db, SCHEMA_UPGRADES
+
+ADD_COLUMN = re.compile(r"ALTER TABLE (\w+) ADD COLUMN IF NOT EXISTS (\w+) ")
+CREATE_INDEX = re.compile(r"CREATE INDEX IF NOT EXISTS (\w+) ON (\w+) ")
+CREATE_EXTENSION = re.compile(r"CREATE EXTENSION IF NOT EXISTS \w+$")
+
+class SchemaUpgradeTests(unittest.TestCase):
+    def test_upgrades_match_the_models(self):
+        """Test every added column and index is one the models declare."""
+        for statement in SCHEMA_UPGRADES:
+            if CREATE_EXTENSION.match(statement):
+                continue
+            column = ADD_COLUMN.match(statement)
+            index = CREATE_INDEX.match(statement)
+            self.assertTrue(column or index, statement)
+            if column:
+                table, name = column.groups()
+                self.assertIn(name, db.metadata.tables[table].c, statement)
+            else:
+                name, table = index.groups()
+                self.assertIn(name, {i.name for i in db.metadata.tables[table].indexes}, statement)
+    
+    def test_script_upgrades_the_app_database(self):
+        """Test `python model.py` creates and upgrades tables through the app's engine."""
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'model.py')
+        with mock.patch.object(model.db, 'create_all') as create_all, \
+                mock.patch.object(model, 'upgrade_schema') as upgrade_schema:
+            runpy.run_path(path, run_name='__main__')
+        create_all.assert_called_once_with()
+        upgrade_schema.assert_called_once_with()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import threading
+import time
+import unittest
+from unittest import mock
+from flask import Flask
+from model import db, SearchQueryLog, SearchPrefetch
+from search_log import (SearchLogBuffer, prefetch_zero_result_queries, rank_queries,
+                        zero_result_queries)
+
+class SearchLogTests(unittest.TestCase):
+    def setUp(self):
+        """Use an in-memory SQLite database holding only the search log."""
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        SearchQueryLog.__table__.create(db.engine)
+        SearchPrefetch.__table__.create(db.engine)
+        # A huge interval keeps the flush thread from writing during the test
+        self.buffer = SearchLogBuffer(flush_size=1000, flush_interval=3600)
+    
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+    
+    def test_rows_are_written_in_one_flush(self):
+        """Test searches are buffered until flushed."""
+        self.buffer.record("Snake  Plant", 'browse', 5, 5)
+        self.buffer.record("monstera", 'search', 0, 0)
+        self.buffer.record("   ", 'search', 0, 0)
+        
+        self.assertEqual(SearchQueryLog.query.count(), 0)
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(SearchQueryLog.query.count(), 2)
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(SearchQueryLog.query.first().normalized_query, "snake plant")
+    
+    def test_oldest_rows_dropped_when_full(self):
+        """Test the buffer stays bounded."""
+        buffer = SearchLogBuffer(flush_size=1000, flush_interval=3600, max_buffered=2)
+        for query in ("a", "b", "c"):
+            buffer.record(query, 'search', 1, 1)
+        self.assertEqual(len(buffer), 2)
+        self.assertEqual(buffer.dropped, 1)
+    
+    def test_rankings(self):
+        """Test queries are ranked by frequency and by local misses."""
+        for _ in range(3):
+            self.buffer.record("rose", 'search', 4, 4)
+        for _ in range(2):
+            self.buffer.record("mother-in-law's tongue", 'search', 2, 0)
+        self.buffer.record("xyz", 'browse', 0, 0)
+        self.buffer.flush()
+        
+        ranking = rank_queries()
+        self.assertEqual([stats['query'] for stats in ranking],
+                         ["rose", "mother-in-law's tongue", "xyz"])
+        self.assertEqual(ranking[2]['zero_results'], 1)
+        
+        misses = zero_result_queries(min_searches=2)
+        self.assertEqual(misses, [{'query': "mother-in-law's tongue", 'searches': 2,
+                                   'zero_results': 0, 'local_misses': 2}])
+    
+    @mock.patch('search_log.crud.search_plants', return_value=[])
+    def test_failed_prefetch_is_recorded(self, search_plants):
+        """Test a provider error is stored as a failed attempt and not retried on the next run."""
+        for _ in range(3):
+            self.buffer.record("xyz", 'search', 0, 0)
+        self.buffer.flush()
+        
+        with mock.patch('api.quantitative_plant.search_plants',
+                        side_effect=RuntimeError('connection reset')) as search_trefle:
+            self.assertEqual(prefetch_zero_result_queries(), [("xyz", 'failed', 0)])
+            self.assertEqual(prefetch_zero_result_queries(), [])
+        self.assertEqual(search_trefle.call_count, 1)
+        
+        db.session.expunge_all()
+        prefetch = db.session.get(SearchPrefetch, "xyz")
+        self.assertEqual((prefetch.status, prefetch.imported), ('failed', 0))
+        self.assertIsNotNone(prefetch.attempted_at)
+    
+    @mock.patch('search_log.crud.search_plants', return_value=[])
+    def test_prefetch_fetches_details_together(self, search_plants):
+        """Test the matches' Trefle details are fetched concurrently, once each."""
+        for _ in range(3):
+            self.buffer.record("ficus", 'search', 0, 0)
+        self.buffer.flush()
+        lock = threading.Lock()
+        calls, in_flight, most = [], [0], [0]
+        
+        def get_plant_details(plant_id):
+            with lock:
+                calls.append(plant_id)
+                in_flight[0] += 1
+                most[0] = max(most[0], in_flight[0])
+            time.sleep(0.05)
+            with lock:
+                in_flight[0] -= 1
+            return {'data': {'id': plant_id}}
+        
+        def import_trefle_plant(trefle_id, scientific_name=None):
+            from api.quantitative_plant import get_plant_details as memoized
+            return memoized(trefle_id)
+        
+        search = {'data': [{'id': plant_id, 'scientific_name': f"Ficus {plant_id}"}
+                           for plant_id in (1, 2, 3)]}
+        with mock.patch('api.quantitative_plant.search_plants', return_value=search), \
+                mock.patch('api.quantitative_plant.TREFLE_API_KEY', 'key'), \
+                mock.patch('api.quantitative_plant.client.get_json',
+                           side_effect=lambda url, **kwargs: get_plant_details(int(url.rsplit('/', 1)[1]))), \
+                mock.patch('data_merger.import_trefle_plant', import_trefle_plant):
+            self.assertEqual(prefetch_zero_result_queries(), [("ficus", 'imported', 3)])
+        self.assertEqual(sorted(calls), [1, 2, 3])
+        self.assertEqual(most[0], 3)
+
+if __name__ == "__main__":
+    unittest.main()
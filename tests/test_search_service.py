@@ -0,0 +1,153 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from flask import Flask
+from sqlalchemy import event
+from model import db, PlantName
+from search_service import TTLCache, FederatedSearchService, normalize_query
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+class TTLCacheTests(unittest.TestCase):
+    def test_expiry(self):
+        """Test entries expire after the TTL."""
+        clock = FakeClock()
+        cache = TTLCache(maxsize=10, ttl=60, clock=clock)
+        cache.set("rose", [1])
+        self.assertEqual(cache.get("rose"), [1])
+        clock.now = 61
+        self.assertIsNone(cache.get("rose"))
+        self.assertEqual(len(cache), 0)
+    
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted when full."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+    
+    def test_stats(self):
+        """Test the hit ratio is reported."""
+        cache = TTLCache()
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("missing")
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_ratio'], 0.5)
+
+class FederatedSearchTests(unittest.TestCase):
+    def setUp(self):
+        """Patch the database and Trefle lookups."""
+        care = SimpleNamespace(sunlight_requirements=["Full sun"], watering_frequency="Weekly",
+                               difficulty_level="Easy")
+        self.local_plants = [
+            SimpleNamespace(plant_id=1, scientific_name="Rosa canina", common_name="Dog Rose",
+                            image_url=None, care_details=care),
+        ]
+        self.trefle_response = {'data': [
+            {'id': 10, 'scientific_name': "Rosa canina", 'common_name': "Dog rose"},
+            {'id': 11, 'scientific_name': "Rosa rugosa", 'common_name': "Beach rose"},
+            {'id': 12, 'scientific_name': "Rosa rugosa", 'common_name': "Duplicate"},
+        ]}
+        
+        patches = [
+            mock.patch('search_service.crud.search_plants', return_value=self.local_plants),
+            mock.patch('search_service.crud.full_text_search_plants', return_value=[]),
+            mock.patch('api.quantitative_plant.search_plants', return_value=self.trefle_response),
+        ]
+        self.search_local, self.search_full_text, self.search_trefle = [p.start() for p in patches]
+        for p in patches:
+            self.addCleanup(p.stop)
+        
+        self.service = FederatedSearchService()
+    
+    def test_merge_and_dedup(self):
+        """Test API results are merged without duplicate scientific names."""
+        results = self.service.search("rose")
+        self.assertEqual([r['scientific_name'] for r in results], ["Rosa canina", "Rosa rugosa"])
+        self.assertTrue(results[0]['in_database'])
+        self.assertEqual(results[0]['care_details']['watering_frequency'], "Weekly")
+        self.assertEqual(results[1]['api_source'], 'trefle')
+        self.search_local.assert_called_once_with("rose", limit=100, with_care_details=True)
+    
+    def test_repeated_search_is_cached(self):
+        """Test a repeated search does not touch the database or Trefle."""
+        self.service.search("Rose")
+        self.service.search("  rose ")
+        self.assertEqual(self.search_local.call_count, 1)
+        self.assertEqual(self.search_trefle.call_count, 1)
+        self.assertEqual(self.service.stats()['hit_ratio'], 0.5)
+    
+    def test_failed_provider_is_not_cached(self):
+        """Test results are not cached when Trefle fails."""
+        self.search_trefle.return_value = {'error': "timeout"}
+        self.service.search("rose")
+        self.service.search("rose")
+        self.assertEqual(self.search_trefle.call_count, 2)
+    
+    def test_unavailable_provider_is_cached_briefly(self):
+        """Test local-only results are cached for a short TTL while Trefle is not configured."""
+        clock = FakeClock()
+        self.service.cache = TTLCache(ttl=300, clock=clock)
+        self.search_trefle.return_value = {'error': "API key not configured"}
+        results = self.service.search("rose")
+        self.service.search("rose")
+        self.assertEqual([r['scientific_name'] for r in results], ["Rosa canina"])
+        self.assertEqual(self.search_local.call_count, 1)
+        
+        clock.now = 31
+        self.service.search("rose")
+        self.assertEqual(self.search_local.call_count, 2)
+    
+    def test_open_circuit_is_cached_briefly(self):
+        """Test local-only results are cached without calling Trefle while its circuit is open."""
+        with mock.patch('api.circuit_breaker.is_available', return_value=False):
+            self.service.search("rose")
+            self.service.search("rose")
+        self.search_trefle.assert_not_called()
+        self.assertEqual(self.search_local.call_count, 1)
+    
+    def test_committed_plants_invalidate_the_cache(self):
+        """Test a plant or name committed anywhere in this process clears cached searches."""
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(app)
+        context = app.app_context()
+        context.push()
+        self.addCleanup(context.pop)
+        self.addCleanup(db.session.remove)
+        PlantName.__table__.create(db.engine)
+        listeners = self.service.invalidate_on_commit('test_search_results')
+        for name, listener in zip(('after_flush', 'after_commit', 'after_rollback'), listeners):
+            self.addCleanup(event.remove, db.session, name, listener)
+        
+        self.service.search("rose")
+        db.session.add(PlantName(plant_id=1, name="Dog Rose", normalized_name="dog rose"))
+        db.session.commit()
+        self.service.search("rose")
+        self.assertEqual(self.search_local.call_count, 2)
+    
+    def test_enough_local_names_skip_trefle(self):
+        """Test Trefle is never called when the name search meets the threshold."""
+        service = FederatedSearchService(api_threshold=1)
+        results = service.search("rose")
+        self.assertEqual([r['scientific_name'] for r in results], ["Rosa canina"])
+        self.search_trefle.assert_not_called()
+        self.search_full_text.assert_not_called()
+    
+    def test_normalize_query(self):
+        """Test query normalization."""
+        self.assertEqual(normalize_query("  Snake   PLANT "), "snake plant")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from flask import Flask
+from sqlalchemy import event, exc
+from sqlalchemy.orm import Session
+from model import db, Plant
+import crud
+import search_vectors
+
+class ListenerScopeTests(unittest.TestCase):
+    def test_only_the_app_session_is_watched(self):
+        """Test the refresh hooks are registered on db.session, not on every Session."""
+        for name, listener in (('after_flush', search_vectors._collect_changed_plants),
+                               ('before_commit', search_vectors._refresh_changed_plants),
+                               ('after_rollback', search_vectors._discard_changed_plants)):
+            self.assertTrue(event.contains(db.session, name, listener))
+            self.assertFalse(event.contains(Session, name, listener))
+
+class FullTextSearchTests(unittest.TestCase):
+    def setUp(self):
+        """Create plants in the PostgreSQL test database, skipping without one."""
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql:///rootly_test'
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        try:
+            db.create_all()
+        except exc.OperationalError as e:
+            self.context.pop()
+            self.skipTest(f"PostgreSQL test database unavailable: {e}")
+        
+        self.name_match = crud.create_plant("Fern One", common_name="Maidenhair")
+        self.care_match = crud.create_plant("Calathea orbifolia", common_name="Prayer Plant")
+        crud.create_plant_care_details(self.care_match.plant_id, soil_preferences="Fern mix")
+        self.description_match = crud.create_plant("Pilea peperomioides",
+                                                   description="Often grown next to a fern.")
+    
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+    
+    def test_names_rank_above_care_above_description(self):
+        """Test the A/B/C weights order name, care and description matches."""
+        results = crud.full_text_search_plants("fern")
+        self.assertEqual([plant.plant_id for plant in results],
+                         [self.name_match.plant_id, self.care_match.plant_id,
+                          self.description_match.plant_id])
+    
+    def test_commits_refresh_changed_plants(self):
+        """Test plants, care details and health issues committed later are searchable."""
+        plant = Plant(scientific_name="Dracaena trifasciata", common_name="Snake Plant")
+        db.session.add(plant)
+        db.session.commit()
+        self.assertEqual([p.plant_id for p in crud.full_text_search_plants("snake")], [plant.plant_id])
+        
+        crud.create_plant_health_issue(plant.plant_id, "Root rot", symptoms="Mushy leaves")
+        self.assertEqual([p.plant_id for p in crud.full_text_search_plants("mushy")], [plant.plant_id])
+        
+        plant.common_name = "Mother-in-law's Tongue"
+        db.session.commit()
+        self.assertEqual(crud.full_text_search_plants("snake"), [])
+    
+    def test_rolled_back_changes_are_not_refreshed(self):
+        """Test a rollback forgets the plants it changed."""
+        db.session.add(Plant(scientific_name="Ficus lyrata"))
+        db.session.flush()
+        db.session.rollback()
+        self.assertNotIn(search_vectors._PENDING_KEY, db.session.info)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from api.http_client import ProviderClient
+from api.response_cache import ResponseCache
+from api.single_flight import SingleFlight
+from benchmarks.http_pool_benchmark import start_stub
+
+def run_together(count, target):
+    """Call target(i) from `count` threads at once and return their results."""
+    results = [None] * count
+    barrier = threading.Barrier(count)
+    
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = target(i)
+        except Exception as e:
+            results[i] = e
+    
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+class SingleFlightTests(unittest.TestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        """Test concurrent callers for one key get one call's result."""
+        flights = SingleFlight()
+        executions = []
+        
+        def lookup():
+            executions.append(1)
+            time.sleep(0.2)
+            return {'data': {'id': 1}}
+        
+        results = run_together(8, lambda i: flights.do('plant-1', lookup))
+        self.assertEqual(len(executions), 1)
+        self.assertTrue(all(result == {'data': {'id': 1}} for result in results))
+        self.assertEqual(flights.stats()['coalesced'], 7)
+        
+        # Later calls run again
+        flights.do('plant-1', lookup)
+        self.assertEqual(len(executions), 2)
+    
+    def test_errors_reach_every_waiter(self):
+        """Test a failed call raises in every coalesced caller."""
+        flights = SingleFlight()
+        
+        def lookup():
+            time.sleep(0.2)
+            raise ValueError('provider down')
+        
+        results = run_together(4, lambda i: flights.do('plant-1', lookup))
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(flights.stats()['executed'], 1)
+
+class CoalescedClientTests(unittest.TestCase):
+    def setUp(self):
+        """Point clients at a slow stub server that counts requests."""
+        self.directory = tempfile.mkdtemp()
+        self.server = start_stub(delay=0.2)
+        self.requests = 0
+        handler = self.server.RequestHandlerClass
+        original = handler.do_GET
+        
+        def counting_get(handler_self):
+            self.requests += 1
+            original(handler_self)
+        
+        handler.do_GET = counting_get
+        self.addCleanup(setattr, handler, 'do_GET', original)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+    
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+    
+    def test_concurrent_misses_make_one_request(self):
+        """Test a burst of identical uncached lookups reaches the provider once."""
+        client = ProviderClient('stub', self.base_url, cache=False, limiter=False)
+        results = run_together(6, lambda i: client.get_json('/plants/1', params={'token': 'x'}))
+        client.close()
+        self.assertEqual(self.requests, 1)
+        self.assertTrue(all(result['data'][0]['common_name'] == 'Snake Plant' for result in results))
+    
+    def test_process_lock_shares_through_the_cache(self):
+        """Test clients that share a cache file and lock directory, like two workers, fetch once."""
+        cache_path = os.path.join(self.directory, 'cache.sqlite3')
+        lock_dir = os.path.join(self.directory, 'locks')
+        clients = [ProviderClient('stub', self.base_url, cache=ResponseCache(cache_path),
+                                  limiter=False, lock_dir=lock_dir) for _ in range(2)]
+        run_together(2, lambda i: clients[i].get_json('/plants/1', ttl=60))
+        self.assertEqual(self.requests, 1)
+        for client in clients:
+            client.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import io
+import unittest
+from flask import Flask
+from sqlalchemy import text
+from model import db, GbifTaxon
+from taxonomy import ResolvedTaxon, clear_cache, normalize_scientific_name, parse_backbone, resolve
+
+HEADER = ("taxonID\tdatasetID\tparentNameUsageID\tacceptedNameUsageID\tscientificName\t"
+          "canonicalName\ttaxonRank\ttaxonomicStatus\tkingdom\n")
+
+def backbone(*rows):
+    """Return a Taxon.tsv-like file with the given rows."""
+    return io.StringIO(HEADER + ''.join('\t'.join(row) + '\n' for row in rows))
+
+class NormalizeScientificNameTests(unittest.TestCase):
+    def test_strips_author_citations(self):
+        """Test author citations do not change the key."""
+        self.assertEqual(normalize_scientific_name("Dracaena trifasciata (Prain) Mabb."),
+                         "dracaena trifasciata")
+        self.assertEqual(normalize_scientific_name("Monstera deliciosa Liebm."),
+                         "monstera deliciosa")
+        self.assertEqual(normalize_scientific_name("  Dracaena   trifasciata "),
+                         "dracaena trifasciata")
+    
+    def test_keeps_infraspecific_ranks(self):
+        """Test subspecies and varieties keep their epithet and a single marker spelling."""
+        self.assertEqual(normalize_scientific_name("Ficus elastica var. decora Guillaumin"),
+                         "ficus elastica var. decora")
+        self.assertEqual(normalize_scientific_name("Olea europaea ssp. cuspidata"),
+                         "olea europaea subsp. cuspidata")
+    
+    def test_drops_hybrid_sign(self):
+        """Test hybrids match with or without the sign."""
+        self.assertEqual(normalize_scientific_name("Mentha × piperita L."), "mentha piperita")
+        self.assertEqual(normalize_scientific_name("Mentha ×piperita"), "mentha piperita")
+    
+    def test_empty_names(self):
+        """Test missing names give an empty key."""
+        self.assertEqual(normalize_scientific_name(None), '')
+        self.assertEqual(normalize_scientific_name('  '), '')
+
+class ParseBackboneTests(unittest.TestCase):
+    def test_keeps_plant_species_and_links_synonyms(self):
+        """Test only plant species rows are kept and synonyms point at the accepted taxon."""
+        rows = list(parse_backbone(backbone(
+            ("2", "", "1", "", "Dracaena trifasciata (Prain) Mabb.", "Dracaena trifasciata",
+             "SPECIES", "ACCEPTED", "Plantae"),
+            ("3", "", "1", "2", "Sansevieria trifasciata Prain", "Sansevieria trifasciata",
+             "SPECIES", "SYNONYM", "Plantae"),
+            ("4", "", "1", "", "Dracaena L.", "Dracaena", "GENUS", "ACCEPTED", "Plantae"),
+            ("5", "", "1", "", "Apis mellifera L.", "Apis mellifera", "SPECIES", "ACCEPTED",
+             "Animalia"),
+        )))
+        
+        self.assertEqual([row['taxon_id'] for row in rows], [2, 3])
+        self.assertIsNone(rows[0]['accepted_taxon_id'])
+        self.assertEqual(rows[1]['accepted_taxon_id'], 2)
+        self.assertEqual(rows[1]['normalized_name'], "sansevieria trifasciata")
+        self.assertEqual(rows[1]['taxonomic_status'], "synonym")
+    
+    def test_rejects_other_files(self):
+        """Test a file without the backbone columns is refused."""
+        with self.assertRaises(ValueError):
+            list(parse_backbone(io.StringIO("id\tname\n1\tRose\n")))
+
+class ResolveTests(unittest.TestCase):
+    def setUp(self):
+        """Resolve against an in-memory SQLite backbone."""
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        GbifTaxon.__table__.create(db.engine)
+        clear_cache()
+        self.addCleanup(clear_cache)
+    
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+    
+    def test_misses_are_not_cached(self):
+        """Test a name missing before the backbone is loaded resolves once it is."""
+        self.assertIsNone(resolve("Dracaena trifasciata", gbif_id=2))
+        db.session.add_all([
+            GbifTaxon(taxon_id=1, canonical_name="Dracaena trifasciata",
+                      normalized_name="dracaena trifasciata", taxonomic_status='accepted'),
+            GbifTaxon(taxon_id=2, accepted_taxon_id=1, canonical_name="Sansevieria trifasciata",
+                      normalized_name="sansevieria trifasciata", taxonomic_status='synonym'),
+        ])
+        db.session.commit()
+        expected = ResolvedTaxon(1, "Dracaena trifasciata")
+        self.assertEqual(resolve("Dracaena trifasciata (Prain) Mabb."), expected)
+        self.assertEqual(resolve(gbif_id=2), expected)
+    
+    def test_failed_query_rolls_back(self):
+        """Test a database error ends the transaction instead of leaving it aborted."""
+        db.session.execute(text("DROP TABLE gbif_taxa"))
+        self.assertIsNone(resolve("Dracaena trifasciata"))
+        self.assertIsNone(db.session().get_transaction())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import json
+import unittest
+from unittest import mock
+from api import quantitative_plant
+from api.quantitative_plant import details_memo, get_growth_data, get_plant_details
+from benchmarks.fake_providers import Catalog, load_fixtures
+import data_merger
+
+class TrefleDetailsTests(unittest.TestCase):
+    def setUp(self):
+        """Answer Trefle detail calls from the fixtures, counting each outbound call."""
+        catalog = Catalog(load_fixtures())
+        self.get_json = mock.Mock(side_effect=lambda url, **kwargs: json.loads(
+            json.dumps(catalog.trefle_plant(int(url.rsplit('/', 1)[1])))))
+        patches = [mock.patch.object(quantitative_plant.client, 'get_json', self.get_json),
+                   mock.patch.object(quantitative_plant, 'TREFLE_API_KEY', 'test-token')]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+    
+    def test_growth_data_from_fetched_details(self):
+        """Test growth data is read from details the caller already has."""
+        details = get_plant_details(182512)
+        growth = get_growth_data(182512, plant_details=details)
+        
+        self.assertEqual(self.get_json.call_count, 1)
+        self.assertEqual((growth['light'], growth['temperature_minimum_deg_c']), (5, 10))
+    
+    def test_memo_fetches_each_plant_once(self):
+        """Test lookups inside a memo block share one call per plant, and outside do not."""
+        with details_memo():
+            get_plant_details(182512)
+            get_growth_data(182512)
+            with details_memo():
+                get_plant_details(182512)
+            get_plant_details(190500)
+        self.assertEqual(self.get_json.call_count, 2)
+        
+        get_plant_details(182512)
+        self.assertEqual(self.get_json.call_count, 3)
+    
+    @mock.patch('taxonomy.find_plant', return_value=(None, None))
+    @mock.patch.object(data_merger, 'crud')
+    def test_import_makes_one_detail_call(self, crud, find_plant):
+        """Test importing a Trefle plant and merging its data each fetch its details once."""
+        crud.create_plant.return_value = mock.Mock(plant_id=7)
+        
+        plant = data_merger.import_trefle_plant(190500)
+        self.assertEqual(plant.plant_id, 7)
+        self.assertEqual(self.get_json.call_count, 1)
+        care = crud.db.session.add.call_args.args[0]
+        self.assertEqual(care.temperature_range, "13°C to 30°C")
+        
+        self.get_json.reset_mock()
+        plant_data, care_data = data_merger.merge_plant_data("Ficus lyrata", trefle_id=126957)
+        self.assertEqual(self.get_json.call_count, 1)
+        self.assertIn('trefle', plant_data['data_sources'])
+        self.assertEqual(care_data['difficulty_level'], 'Intermediate')
+
+if __name__ == "__main__":
+    unittest.main()
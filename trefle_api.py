@@ -3,6 +3,9 @@ import requests
 import os
 from typing import Dict, List, Optional
 from datetime import datetime
+from api.http_client import get_client
+from api.response_cache import DAY
+from plant_service import DETAIL_WORKERS, save_trefle_search
 
 class TrefleAPI:
     """Service class for interacting with the Trefle API."""
@@ -10,7 +13,7 @@ class TrefleAPI:
     def __init__(self, api_token: str = None):
         self.base_url = "https://trefle.io/api/v1"
         self.api_token = api_token or os.getenv('TREFLE_API_TOKEN')
-        self.session = requests.Session()
+        self.client = get_client('trefle', self.base_url)
         
         if not self.api_token:
             raise ValueError("Trefle API token is required. Set TREFLE_API_TOKEN environment variable.")
@@ -21,12 +24,9 @@ class TrefleAPI:
             params = {}
         
         params['token'] = self.api_token
-        url = f"{self.base_url}{endpoint}"
         
         try:
-            response = self.session.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
+            return self.client.get_json(endpoint, params=params, ttl=DAY)
         except requests.exceptions.RequestException as e:
             print(f"Error making request to Trefle API: {e}")
             return None
@@ -80,26 +80,30 @@ from model import Plant, PlantCareDetails, db
 class PlantService:
     """Service for managing plant data with Trefle API integration."""
     
+    DETAIL_WORKERS = DETAIL_WORKERS
+    # Seconds to wait for a search's detail lookups together; None for the fan-out default
+    DETAIL_DEADLINE = None
+    
     def __init__(self, trefle_api: TrefleAPI):
         self.trefle_api = trefle_api
     
     def search_and_create_plants(self, query: str, limit: int = 10) -> List[Plant]:
-        """Search Trefle API and create/update plants in database."""
-        results = self.trefle_api.search_plants(query)
-        
-        if not results or 'data' not in results:
-            return []
-        
-        plants = []
-        for plant_data in results['data'][:limit]:
-            plant = self._create_or_update_plant_from_trefle(plant_data)
-            if plant:
-                plants.append(plant)
-        
-        return plants
+        """Search Trefle API and create/update plants in database (see save_trefle_search)."""
+        return save_trefle_search(
+            self.trefle_api, query, limit,
+            lambda plant_data, detailed_data: self._create_or_update_plant_from_trefle(
+                plant_data, detailed_data, commit=False),
+            self.DETAIL_WORKERS, self.DETAIL_DEADLINE)
     
-    def _create_or_update_plant_from_trefle(self, trefle_data: Dict) -> Plant:
-        """Create or update a plant from Trefle API data."""
+    def _create_or_update_plant_from_trefle(self, trefle_data: Dict, detailed_data: Dict = None,
+                                            commit: bool = True) -> Plant:
+        """Create or update a plant from Trefle API data.
+        
+        Args:
+            trefle_data: A plant from a Trefle search
+            detailed_data: Its Trefle details if already fetched; fetched otherwise
+            commit: Commit the change; the caller commits when False
+        """
         scientific_name = trefle_data.get('scientific_name')
         if not scientific_name:
             return None
@@ -119,10 +123,13 @@ class PlantService:
         plant.last_updated = datetime.utcnow()
         
         # Get detailed information if available
-        if 'id' in trefle_data:
+        if detailed_data is None and 'id' in trefle_data:
             detailed_data = self.trefle_api.get_plant_by_id(trefle_data['id'])
-            if detailed_data and 'data' in detailed_data:
-                self._update_plant_with_details(plant, detailed_data['data'])
+        if detailed_data and 'data' in detailed_data:
+            self._update_plant_with_details(plant, detailed_data['data'])
+        
+        if not commit:
+            return plant
         
         try:
             db.session.commit()